@@ -100,6 +100,53 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Local memory by default, set CACHE_BACKEND/CACHE_LOCATION to share
+# the cache between workers in production (e.g. memcached).
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Stats responses are served from cache for this many seconds, then
+# served stale while being recomputed in the background.
+STATS_CACHE_FRESH_SECONDS = int(
+    os.environ.get('STATS_CACHE_FRESH_SECONDS', 30)
+)
+STATS_CACHE_STALE_SECONDS = int(
+    os.environ.get('STATS_CACHE_STALE_SECONDS', 60 * 60)
+)
+
+# Lifetime stats are read from a materialized view refreshed by
+# refresh_stats_views, and computed live once it is older than this.
+STATS_VIEW_MAX_AGE_SECONDS = int(
+    os.environ.get('STATS_VIEW_MAX_AGE_SECONDS', 2 * 60 * 60)
+)
+
+# Focus sessions older than this are folded into daily aggregates by
+# compact_focus_sessions and no longer stored individually.
+FOCUS_SESSION_RETENTION_DAYS = int(
+    os.environ.get('FOCUS_SESSION_RETENTION_DAYS', 2 * 365)
+)
+
+# Reject events overlapping the owner's other events instead of only
+# reporting the conflicts
+EVENTS_REJECT_CONFLICTS = os.environ.get(
+    'EVENTS_REJECT_CONFLICTS', 'false'
+).lower() in ('1', 'true', 'yes')
+
+# Directory of the columnar analytics mirror filled by sync_analytics.
+# Optional, needs the duckdb package; admin analytics are off when unset.
+ANALYTICS_STORE_PATH = os.environ.get('ANALYTICS_STORE_PATH')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,78 @@
+"""
+Conditional GET for calendar ranges.
+
+A listing of events is unchanged as long as the latest updated_at and
+the number of the events it depends on are, and no event was deleted.
+The ETag costs one aggregate over the (owner, date) index and a primary
+key lookup, and a 304 skips loading and serializing events.
+
+There is no Last-Modified: an event moved out of a range leaves the
+latest updated_at of the range as it was, only the count tells.
+"""
+import hashlib
+from functools import wraps
+
+from django.db import connection
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+
+from core.models import Event, EventDeletions
+from calendars.recurrence import expand_filter, window
+
+
+def record_deletions(user, count=1):
+    """Count deleted events of a user, invalidating their ETags"""
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            INSERT INTO core_eventdeletions (user_id, count, deleted_at)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (user_id) DO UPDATE
+            SET count = core_eventdeletions.count + EXCLUDED.count,
+                deleted_at = EXCLUDED.deleted_at
+        ''', [user.id, count, timezone.now()])
+
+
+def validators(request, start, end):
+    """Return the ETag of a range of events"""
+    totals = Event.objects.filter(
+        expand_filter(start, end), owner=request.user
+    ).aggregate(updated_at=Max('updated_at'), count=Count('id'))
+    deletions = EventDeletions.objects.filter(
+        user=request.user
+    ).values_list('count', flat=True).first() or 0
+
+    # The window depends on today when the range is open
+    key = ':'.join(str(part) for part in (
+        request.get_full_path(),
+        *window(start, end),
+        totals['updated_at'] and totals['updated_at'].isoformat(),
+        totals['count'],
+        deletions,
+    ))
+    return 'W/"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+
+def conditional(get):
+    """Answer a GET of a calendar view with 304 when nothing changed.
+
+    The view's get_date_range(request) returns the (start, end) of the
+    events it lists, either of which may be None.
+    """
+    @wraps(get)
+    def wrapper(self, request, *args, **kwargs):
+        etag = validators(request, *self.get_date_range(request))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = get(self, request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            # Cached by the client, and always revalidated
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Authorization'])
+        return response
+    return wrapper
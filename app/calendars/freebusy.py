@@ -0,0 +1,107 @@
+"""
+Free/busy times of a user's calendar.
+
+Events are loaded as (date, start_time, end_time) tuples in the order of
+the (owner, date, start_time) index, merged into busy intervals in a
+single sweep, and the free times are the gaps between them.
+"""
+import heapq
+from datetime import datetime, time, timedelta
+
+from core.models import Event
+from calendars.overlaps import event_period
+from calendars.recurrence import occurrences, single_events
+
+
+def day_bounds(start_date, end_date):
+    """Return the datetimes from the start of start_date to end_date's end"""
+    return (
+        datetime.combine(start_date, time.min),
+        datetime.combine(end_date + timedelta(days=1), time.min),
+    )
+
+
+def event_rows(user, start_date, end_date):
+    """Yield (date, start_time, end_time) of a user's events by start.
+
+    Events of the day before start_date are included, as they may cross
+    midnight into the range.
+    """
+    queryset = Event.objects.filter(owner=user)
+    first_day = start_date - timedelta(days=1)
+    rows = single_events(
+        queryset, first_day, end_date
+    ).order_by('date', 'start_time').values_list(
+        'date', 'start_time', 'end_time'
+    )
+    recurring = sorted(
+        (day, master.start_time, master.end_time)
+        for master, day in occurrences(queryset, first_day, end_date)
+    )
+    return heapq.merge(rows.iterator(), recurring)
+
+
+def merge_busy(rows, start, end):
+    """Merge event rows sorted by start into busy (start, end) intervals.
+
+    Intervals are clipped to start and end, and touching or overlapping
+    events make up a single interval.
+    """
+    busy = []
+    for day, start_time, end_time in rows:
+        event_start, event_end = event_period(day, start_time, end_time)
+        event_start, event_end = max(event_start, start), min(event_end, end)
+        if event_start >= event_end:
+            continue
+        if busy and event_start <= busy[-1][1]:
+            busy[-1][1] = max(busy[-1][1], event_end)
+        else:
+            busy.append([event_start, event_end])
+    return [tuple(interval) for interval in busy]
+
+
+def _within_hours(start, end, hours):
+    """Yield the parts of [start, end) inside daily (from, to) hours.
+
+    A to time of None is the end of the day.
+    """
+    if hours is None:
+        yield start, end
+        return
+    day = start.date()
+    while datetime.combine(day, time.min) < end:
+        next_day = day + timedelta(days=1)
+        gap_start = max(start, datetime.combine(day, hours[0]))
+        gap_end = min(end, datetime.combine(next_day, time.min))
+        if hours[1] is not None:
+            gap_end = min(gap_end, datetime.combine(day, hours[1]))
+        if gap_start < gap_end:
+            yield gap_start, gap_end
+        day = next_day
+
+
+def free_gaps(busy, start, end, min_length=timedelta(0), hours=None):
+    """Return the free (start, end) gaps between merged busy intervals.
+
+    Gaps shorter than min_length are left out. With hours, a pair of
+    times (the second may be None for midnight), only the free time
+    between them on each day is returned.
+    """
+    gaps = []
+    cursor = start
+    for busy_start, busy_end in busy + [(end, end)]:
+        if busy_start > cursor:
+            gaps.extend(
+                gap for gap in _within_hours(cursor, busy_start, hours)
+                if gap[1] - gap[0] >= min_length
+            )
+        cursor = max(cursor, busy_end)
+    return gaps
+
+
+def free_busy(user, start_date, end_date, min_length=timedelta(0),
+              hours=None):
+    """Return the busy intervals and free gaps of a user's days"""
+    start, end = day_bounds(start_date, end_date)
+    busy = merge_busy(event_rows(user, start_date, end_date), start, end)
+    return busy, free_gaps(busy, start, end, min_length, hours)
@@ -0,0 +1,373 @@
+"""
+iCalendar (RFC 5545) export and import of events.
+
+Events are written as floating local times, the way they are stored.
+Recurring events are exported as one VEVENT with an RRULE, and changed
+occurrences as VEVENTs with the same UID and a RECURRENCE-ID. Imported
+files are read line by line, so a large file is never held in memory.
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+import re
+
+from django.utils import timezone
+
+from core.models import Event
+from calendars.serializers import EventCreateSerializer
+
+
+PRODID = '-//Fokuso//Fokuso API//EN'
+UID_DOMAIN = 'fokuso'
+FREQUENCIES = {
+    'daily': 'DAILY',
+    'weekly': 'WEEKLY',
+    'monthly': 'MONTHLY',
+}
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+DURATION = re.compile(
+    r'^\+?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$'
+)
+
+
+class ICalError(ValueError):
+    """A VEVENT that cannot be imported"""
+
+
+def escape(text):
+    """Escape a TEXT value"""
+    return (
+        text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def unescape(text):
+    """Unescape a TEXT value"""
+    return re.sub(
+        r'\\([\\;,nN])',
+        lambda match: '\n' if match.group(1) in 'nN' else match.group(1),
+        text,
+    )
+
+
+def fold(line):
+    """Fold a content line into lines of at most 75 octets, with CRLF"""
+    parts = []
+    current, size = '', 0
+    for char in line:
+        length = len(char.encode('utf-8'))
+        if size + length > 75:
+            parts.append(current)
+            current, size = ' ', 1
+        current += char
+        size += length
+    parts.append(current)
+    return '\r\n'.join(parts) + '\r\n'
+
+
+def local(day, time):
+    """Format a floating local date-time"""
+    return datetime.combine(day, time).strftime('%Y%m%dT%H%M%S')
+
+
+def uid(event_id):
+    """Return the UID of an event"""
+    return f'event-{event_id}@{UID_DOMAIN}'
+
+
+def rrule(event):
+    """Return the RRULE value of a recurring event"""
+    parts = [f'FREQ={FREQUENCIES[event.recurrence]}']
+    if event.recurrence_interval > 1:
+        parts.append(f'INTERVAL={event.recurrence_interval}')
+    if event.recurrence == 'weekly' and event.recurrence_days:
+        parts.append('BYDAY=' + ','.join(
+            WEEKDAYS[day] for day in sorted(set(event.recurrence_days))
+        ))
+    if event.recurrence_count is not None:
+        parts.append(f'COUNT={event.recurrence_count}')
+    if event.recurrence_until is not None:
+        # Floating as DTSTART, to the end of the last day
+        parts.append(f'UNTIL={event.recurrence_until:%Y%m%d}T235959')
+    return ';'.join(parts)
+
+
+def vevent(event, stamp):
+    """Yield the content lines of an event"""
+    start = datetime.combine(event.date, event.start_time)
+    end = start + timedelta(minutes=event.duration)
+    parent = event.recurrence_parent
+    yield 'BEGIN:VEVENT'
+    yield f'UID:{uid(parent.id if parent else event.id)}'
+    yield f'DTSTAMP:{stamp}'
+    yield f'DTSTART:{start:%Y%m%dT%H%M%S}'
+    yield f'DTEND:{end:%Y%m%dT%H%M%S}'
+    yield f'SUMMARY:{escape(event.title)}'
+    if event.description:
+        yield f'DESCRIPTION:{escape(event.description)}'
+    yield f'CATEGORIES:{event.event_type.upper()}'
+    if event.recurrence:
+        yield f'RRULE:{rrule(event)}'
+        for day in event.recurrence_exceptions:
+            yield 'EXDATE:' + local(
+                date.fromisoformat(day), event.start_time
+            )
+    if parent is not None:
+        yield 'RECURRENCE-ID:' + local(
+            event.original_date, parent.start_time
+        )
+    yield 'END:VEVENT'
+
+
+def export(queryset, chunk_size=500):
+    """Yield an iCalendar file of an Event queryset, line by line.
+
+    Events are read in chunks through a server-side cursor.
+    """
+    stamp = timezone.now().astimezone(dt_timezone.utc).strftime(
+        '%Y%m%dT%H%M%SZ'
+    )
+    yield fold('BEGIN:VCALENDAR')
+    yield fold('VERSION:2.0')
+    yield fold(f'PRODID:{PRODID}')
+    yield fold('CALSCALE:GREGORIAN')
+    events = queryset.select_related('recurrence_parent').order_by(
+        'date', 'start_time', 'id'
+    )
+    for event in events.iterator(chunk_size=chunk_size):
+        for line in vevent(event, stamp):
+            yield fold(line)
+    yield fold('END:VCALENDAR')
+
+
+def content_lines(lines):
+    """Unfold an iterable of text lines into content lines"""
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t'):
+            if current is not None:
+                current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def parse_line(line):
+    """Split a content line into its name, parameters and value"""
+    quoted = False
+    for index, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif char == ':' and not quoted:
+            head, value = line[:index], line[index + 1:]
+            break
+    else:
+        raise ICalError(f'Malformed line: {line[:40]}')
+
+    name, *params = head.split(';')
+    params = dict(
+        param.split('=', 1) for param in params if '=' in param
+    )
+    return name.upper(), params, value
+
+
+def vevents(lines):
+    """Yield the properties of each VEVENT in an iCalendar file.
+
+    Properties are a dict of name to a list of (params, value).
+    """
+    properties = None
+    depth = 0
+    for line in content_lines(lines):
+        name, params, value = parse_line(line)
+        if name == 'BEGIN':
+            if value.upper() == 'VEVENT':
+                properties = {}
+            elif properties is not None:
+                depth += 1  # VALARM and other nested components
+        elif name == 'END':
+            if depth:
+                depth -= 1
+            elif value.upper() == 'VEVENT' and properties is not None:
+                yield properties
+                properties = None
+        elif properties is not None and not depth:
+            properties.setdefault(name, []).append((params, value))
+
+
+def parse_datetime(params, value):
+    """Parse a DATE-TIME as a local date and time.
+
+    UTC times are converted to the current time zone, times with a TZID
+    or floating are kept as written. All-day DATE values are rejected.
+    """
+    if params.get('VALUE', '').upper() == 'DATE' or len(value) == 8:
+        raise ICalError('All-day events are not supported.')
+    try:
+        moment = datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S')
+    except ValueError:
+        raise ICalError(f'Invalid date-time: {value}')
+    if value.endswith('Z'):
+        moment = timezone.localtime(
+            moment.replace(tzinfo=dt_timezone.utc)
+        ).replace(tzinfo=None)
+    return moment
+
+
+def parse_duration(value):
+    """Parse a positive DURATION"""
+    match = DURATION.match(value)
+    if not match or not any(match.groups()):
+        raise ICalError(f'Invalid duration: {value}')
+    weeks, days, hours, minutes, seconds = (
+        int(part or 0) for part in match.groups()
+    )
+    return timedelta(
+        weeks=weeks, days=days, hours=hours, minutes=minutes,
+        seconds=seconds,
+    )
+
+
+def parse_rrule(value):
+    """Return the recurrence fields of an RRULE"""
+    rule = dict(
+        part.split('=', 1) for part in value.upper().split(';') if '=' in part
+    )
+    frequencies = {freq: name for name, freq in FREQUENCIES.items()}
+    if rule.get('FREQ') not in frequencies:
+        raise ICalError(f"Unsupported recurrence: {rule.get('FREQ')}")
+    unsupported = set(rule) - {
+        'FREQ', 'INTERVAL', 'BYDAY', 'COUNT', 'UNTIL', 'WKST'
+    }
+    if unsupported:
+        raise ICalError(
+            f"Unsupported recurrence parts: {', '.join(sorted(unsupported))}"
+        )
+
+    fields = {'recurrence': frequencies[rule['FREQ']]}
+    try:
+        if 'INTERVAL' in rule:
+            fields['recurrence_interval'] = int(rule['INTERVAL'])
+        if 'COUNT' in rule:
+            fields['recurrence_count'] = int(rule['COUNT'])
+        if 'UNTIL' in rule:
+            fields['recurrence_until'] = datetime.strptime(
+                rule['UNTIL'][:8], '%Y%m%d'
+            ).date()
+        if 'BYDAY' in rule:
+            fields['recurrence_days'] = [
+                WEEKDAYS.index(day) for day in rule['BYDAY'].split(',')
+            ]
+    except ValueError:
+        raise ICalError(f'Unsupported recurrence: {value}')
+    return fields
+
+
+def event_data(properties):
+    """Convert the properties of a VEVENT to EventCreateSerializer data"""
+    def first(name, default=None):
+        values = properties.get(name)
+        return values[0] if values else (None, default)
+
+    if 'RECURRENCE-ID' in properties:
+        raise ICalError('Changed occurrences are not supported.')
+    if 'DTSTART' not in properties:
+        raise ICalError('DTSTART is required.')
+
+    start = parse_datetime(*first('DTSTART'))
+    if 'DTEND' in properties:
+        end = parse_datetime(*first('DTEND'))
+    elif 'DURATION' in properties:
+        end = start + parse_duration(first('DURATION')[1])
+    else:
+        raise ICalError('DTEND or DURATION is required.')
+    if end - start > timedelta(days=1):
+        raise ICalError('Events longer than a day are not supported.')
+
+    categories = [
+        category.strip().lower()
+        for _, value in properties.get('CATEGORIES', [])
+        for category in value.split(',')
+    ]
+    types = dict(Event.EVENT_TYPE_CHOICES)
+    data = {
+        'title': unescape(first('SUMMARY', '')[1]),
+        'description': unescape(first('DESCRIPTION', '')[1]),
+        'date': start.date(),
+        'start_time': start.time(),
+        'end_time': end.time(),
+        'event_type': next(
+            (category for category in categories if category in types),
+            'other'
+        ),
+    }
+    if 'RRULE' in properties:
+        data.update(parse_rrule(first('RRULE')[1]))
+        data['recurrence_exceptions'] = [
+            parse_exdate(params, value).isoformat()
+            for params, values in properties.get('EXDATE', [])
+            for value in values.split(',')
+        ]
+    return data
+
+
+def parse_exdate(params, value):
+    """Parse the date of an EXDATE, which may be a DATE"""
+    if params.get('VALUE', '').upper() == 'DATE' or len(value) == 8:
+        try:
+            return datetime.strptime(value, '%Y%m%d').date()
+        except ValueError:
+            raise ICalError(f'Invalid date: {value}')
+    return parse_datetime(params, value).date()
+
+
+def import_events(lines, context, chunk_size=500, max_events=5000):
+    """Create the VEVENTs of an iCalendar file for the request's user.
+
+    Each event is validated by EventCreateSerializer, valid events are
+    written with one bulk_create per chunk_size events. Returns the
+    number created and the errors of the others, by position in the
+    file. Raises ICalError for files with more than max_events events.
+    """
+    user = context['request'].user
+    created, errors, chunk = 0, [], []
+
+    def flush():
+        Event.objects.bulk_create(chunk)
+        chunk.clear()
+
+    for position, properties in enumerate(vevents(lines), 1):
+        if position > max_events:
+            raise ICalError(
+                f'Files may have at most {max_events} events.'
+            )
+        event_uid = properties.get('UID', [(None, None)])[0][1]
+        try:
+            data = event_data(properties)
+        except ICalError as error:
+            errors.append({
+                'event': position,
+                'uid': event_uid,
+                'errors': {'non_field_errors': [str(error)]},
+            })
+            continue
+
+        serializer = EventCreateSerializer(data=data, context=context)
+        if not serializer.is_valid():
+            errors.append({
+                'event': position,
+                'uid': event_uid,
+                'errors': serializer.errors,
+            })
+            continue
+
+        chunk.append(Event(owner=user, **serializer.validated_data))
+        created += 1
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return created, errors
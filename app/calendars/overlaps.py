@@ -0,0 +1,303 @@
+"""
+Overlap queries on events.
+
+core_event.period is a tsrange generated by Postgres from date,
+start_time and end_time, indexed with GiST together with owner_id, so
+overlaps of single events are found in the database instead of
+comparing every pair. The period of a recurring event only covers its
+first occurrence: its occurrences are expanded and swept in Python.
+"""
+from datetime import date, datetime, timedelta
+
+from django.contrib.postgres.fields import DateTimeRangeField
+from django.db import connection
+from django.db.models import BooleanField, Func
+
+from calendars.recurrence import (
+    occurrence,
+    occurrence_dates,
+    occurrences,
+    single_events,
+    window,
+)
+from core.models import Event, GeneratedColumn
+
+
+def event_period(day, start_time, end_time):
+    """Return the start and end datetimes of an event, as in period"""
+    start = datetime.combine(day, start_time)
+    end = datetime.combine(day, end_time)
+    # Handle events that cross midnight
+    if end < start:
+        end += timedelta(days=1)
+    return start, end
+
+
+class Overlaps(Func):
+    """Whether the period of an event overlaps [start, end)"""
+    output_field = BooleanField()
+
+    def __init__(self, start, end):
+        super().__init__(GeneratedColumn('period', DateTimeRangeField()))
+        self.start, self.end = start, end
+
+    def as_sql(self, compiler, connection):
+        period, params = compiler.compile(self.source_expressions[0])
+        return f'{period} && tsrange(%s, %s)', [*params, self.start, self.end]
+
+
+def overlapping(queryset, start, end):
+    """Filter an Event queryset to events overlapping [start, end)"""
+    return queryset.filter(Overlaps(start, end))
+
+
+def overlapping_pairs(periods):
+    """Yield the pairs of keys of (key, start, end) periods that overlap.
+
+    Periods are swept by start, each compared only with the ones that
+    have not ended yet.
+    """
+    ongoing = []
+    for key, start, end in sorted(periods, key=lambda period: period[1]):
+        ongoing = [other for other in ongoing if other[2] > start]
+        for other in ongoing:
+            yield other[0], key
+        ongoing.append((key, start, end))
+
+
+def single_periods(queryset, start, end):
+    """Return (event, start, end) of single events overlapping [start, end)"""
+    return [
+        (event, *event_period(event.date, event.start_time, event.end_time))
+        for event in overlapping(single_events(queryset), start, end)
+    ]
+
+
+def occurrence_periods(queryset, start, end):
+    """Return (occurrence, start, end) of recurring events in [start, end).
+
+    Occurrences share the id of their recurring event.
+    """
+    periods = []
+    # An occurrence of the day before may run past midnight
+    days = start.date() - timedelta(days=1), end.date()
+    for master, day in occurrences(queryset, *days):
+        period = event_period(day, master.start_time, master.end_time)
+        if period[0] < end and start < period[1]:
+            periods.append((occurrence(master, day), *period))
+    return periods
+
+
+def event_periods(events):
+    """Return (position, event, start, end) of the time events take up.
+
+    position is the index of the event in events. A recurring event
+    takes up its occurrences in the window from its first one, or today
+    if later, except those replaced by a stored override.
+    """
+    masters = [event.pk for event in events if event.recurrence and event.pk]
+    overridden = set(Event.objects.filter(
+        recurrence_parent__in=masters
+    ).values_list('recurrence_parent_id', 'original_date')) if masters \
+        else set()
+
+    periods = []
+    for position, event in enumerate(events):
+        if not event.recurrence:
+            periods.append((position, event, *event_period(
+                event.date, event.start_time, event.end_time
+            )))
+            continue
+        days = window(max(event.date, date.today()))
+        for day in occurrence_dates(event, *days):
+            if (event.pk, day) not in overridden:
+                periods.append((
+                    position,
+                    occurrence(event, day),
+                    *event_period(day, event.start_time, event.end_time),
+                ))
+    return periods
+
+
+def stored_conflicts(periods, queryset, occurrences_only=False):
+    """Map the periods' events to the stored events of a queryset they overlap.
+
+    Returns a dict of the index of each of the periods to the events
+    overlapping it, occurrences included. With occurrences_only, single
+    events are assumed compared already.
+    """
+    if not periods:
+        return {}
+    start = min(period[1] for period in periods)
+    end = max(period[2] for period in periods)
+    stored = occurrence_periods(queryset, start, end)
+    if not occurrences_only:
+        stored += single_periods(queryset, start, end)
+    if not stored:
+        return {}
+
+    conflicts = {}
+    for first, second in overlapping_pairs([
+        *((('own', index), period[1], period[2])
+          for index, period in enumerate(periods)),
+        *((('stored', index), period[1], period[2])
+          for index, period in enumerate(stored)),
+    ]):
+        if first[0] == second[0]:
+            continue
+        own, other = (first, second) if first[0] == 'own' else (second, first)
+        event = stored[other[1]][0]
+        if event.id != periods[own[1]][0].id:
+            conflicts.setdefault(own[1], []).append(event)
+    return conflicts
+
+
+def conflicts_by_event(events):
+    """Map the ids of events to the ids of the owner's others they overlap.
+
+    Overlaps of single events are found in one query, the occurrences
+    of recurring events are swept per owner. The others are ordered by
+    the date and start time of the overlapping event or occurrence.
+    """
+    ids = [event.id for event in events]
+    found = {event_id: {} for event_id in ids}
+    if not ids:
+        return {}
+    singles = [event.id for event in events if not event.recurrence]
+    if singles:
+        with connection.cursor() as cursor:
+            cursor.execute('''
+                SELECT a.id, b.id, b.date, b.start_time
+                FROM core_event a
+                JOIN core_event b
+                  ON b.owner_id = a.owner_id
+                 AND b.id <> a.id
+                 AND b.recurrence = ''
+                 AND b.period && a.period
+                WHERE a.id = ANY(%s)
+            ''', [singles])
+            for event_id, other_id, day, start_time in cursor.fetchall():
+                found[event_id][other_id] = (day, start_time, other_id)
+
+    for owner_id in {event.owner_id for event in events}:
+        owned = [event for event in events if event.owner_id == owner_id]
+        periods = [period[1:] for period in event_periods(owned)]
+        conflicts = stored_conflicts(
+            periods,
+            Event.objects.filter(owner_id=owner_id),
+            occurrences_only=not any(event.recurrence for event in owned),
+        )
+        for index, others in conflicts.items():
+            event_id = periods[index][0].id
+            for other in others:
+                key = (other.date, other.start_time, other.id)
+                found[event_id][other.id] = min(
+                    found[event_id].get(other.id, key), key
+                )
+
+    return {
+        event_id: sorted(others, key=others.get)
+        for event_id, others in found.items()
+    }
+
+
+def unsaved_conflicts(events, others):
+    """Find what events saved together would overlap.
+
+    events are the new or changed events, others a queryset of the
+    stored events left as they are. Returns per event a tuple of the
+    sorted ids of the others and the sorted positions in events of the
+    ones it would overlap. An override replaces the occurrence on its
+    original date.
+    """
+    replaced = {
+        (event.recurrence_parent_id, event.original_date)
+        for event in events if event.recurrence_parent_id is not None
+    }
+
+    def kept(event):
+        return not event.recurrence or (event.id, event.date) not in replaced
+
+    periods = [
+        period for period in event_periods(events) if kept(period[1])
+    ]
+    stored, batch = [set() for _ in events], [set() for _ in events]
+    for index, overlapped in stored_conflicts(
+        [period[1:] for period in periods], others
+    ).items():
+        stored[periods[index][0]].update(
+            other.id for other in overlapped if kept(other)
+        )
+    for first, second in overlapping_pairs(
+        (index, period[2], period[3]) for index, period in enumerate(periods)
+    ):
+        first, second = periods[first][0], periods[second][0]
+        if first != second:
+            batch[first].add(second)
+            batch[second].add(first)
+    return [(sorted(ids), sorted(positions))
+            for ids, positions in zip(stored, batch)]
+
+
+def conflict_map(user, start_date, end_date):
+    """Return a user's events overlapping others, with the ids they overlap.
+
+    A list of (event, sorted ids) by date and start time, of the
+    overlaps that fall in the days from start_date to end_date.
+    Occurrences of recurring events are listed each on its own day.
+    """
+    window = (
+        datetime.combine(start_date, datetime.min.time()),
+        datetime.combine(end_date + timedelta(days=1), datetime.min.time()),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT a.id, b.id
+            FROM core_event a
+            JOIN core_event b
+              ON b.owner_id = a.owner_id
+             AND b.id <> a.id
+             AND b.recurrence = ''
+             AND b.period && a.period
+            WHERE a.owner_id = %s
+              AND a.recurrence = ''
+              AND a.period && tsrange(%s, %s)
+              AND (a.period * b.period) && tsrange(%s, %s)
+        ''', [user.id, *window, *window])
+        pairs = cursor.fetchall()
+
+    events = Event.objects.with_duration().filter(owner=user)
+    conflicts = {}
+    for event_id, other_id in pairs:
+        conflicts.setdefault(event_id, set()).add(other_id)
+    listed = {
+        (event.id, event.date): event
+        for event in events.filter(id__in=conflicts)
+    }
+    conflicts = {key: conflicts[key[0]] for key in listed}
+
+    # Occurrences, against each other and the single events
+    periods = occurrence_periods(events, *window)
+    if periods:
+        periods += single_periods(events, *window)
+    keyed = {(period[0].id, period[0].date): period for period in periods}
+    for first, second in overlapping_pairs(
+        (key, start, end) for key, (_, start, end) in keyed.items()
+    ):
+        pair = keyed[first], keyed[second]
+        if first[0] == second[0] or not any(
+            event.recurrence for event, *_ in pair
+        ):
+            continue
+        # Only the part of the overlap in the days counts
+        if max(period[1] for period in pair) >= window[1] \
+                or min(period[2] for period in pair) <= window[0]:
+            continue
+        for key, other in [(first, second), (second, first)]:
+            listed.setdefault(key, keyed[key][0])
+            conflicts.setdefault(key, set()).add(other[0])
+
+    return sorted(
+        ((listed[key], sorted(others)) for key, others in conflicts.items()),
+        key=lambda item: (item[0].date, item[0].start_time, item[0].id),
+    )
@@ -0,0 +1,113 @@
+"""
+Planning open todos into free calendar time.
+
+Earliest deadline first: the free gaps are walked in time order and each
+is filled with the most urgent todos that fit, taken from a heap ordered
+by due date and priority.
+"""
+import heapq
+from datetime import datetime, time, timedelta
+
+from core.models import Event, Todo
+from calendars.freebusy import free_busy
+
+
+PRIORITY_RANK = {'high': 0, 'medium': 1, 'low': 2}
+
+
+def plannable_todos(user, since, todo_ids=None):
+    """Return a user's open todos with an estimate and nothing planned.
+
+    Todos with an event on or after since are already planned.
+    """
+    todos = Todo.objects.filter(
+        owner=user,
+        completed=False,
+        estimated_minutes__gt=0,
+    ).exclude(events__date__gte=since)
+    if todo_ids is not None:
+        todos = todos.filter(id__in=todo_ids)
+    return list(todos)
+
+
+def schedule(todos, gaps, first_day):
+    """Place todos into free (start, end) gaps, most urgent first.
+
+    Returns the (todo, start, end) placements in time order and the
+    todos that did not fit. A todo is only placed before the end of its
+    due date, unless it was already overdue on first_day.
+    """
+    heap = []
+    for index, todo in enumerate(todos):
+        deadline = None
+        if todo.due_date is not None and todo.due_date >= first_day:
+            deadline = datetime.combine(
+                todo.due_date + timedelta(days=1), time.min
+            )
+        urgency = (
+            todo.due_date or datetime.max.date(),
+            PRIORITY_RANK.get(todo.priority, 1),
+            index,
+        )
+        heap.append((urgency, deadline, todo))
+    heapq.heapify(heap)
+
+    placed, unplaced = [], []
+    for gap_start, gap_end in gaps:
+        cursor = gap_start
+        too_long = []
+        while heap and cursor < gap_end:
+            entry = heapq.heappop(heap)
+            _, deadline, todo = entry
+            end = cursor + timedelta(minutes=todo.estimated_minutes)
+            if deadline is not None and end > deadline:
+                # Later gaps only end later
+                unplaced.append(todo)
+            elif end > gap_end:
+                too_long.append(entry)
+            else:
+                placed.append((todo, cursor, end))
+                cursor = end
+        for entry in too_long:
+            heapq.heappush(heap, entry)
+        if not heap:
+            break
+
+    unplaced.extend(entry[2] for entry in sorted(heap))
+    return placed, unplaced
+
+
+def plan(user, start_date, end_date, hours, not_before=None,
+         todo_ids=None):
+    """Propose events for a user's open todos in free time.
+
+    Returns unsaved events, linked to their todos, and the todos that
+    could not be placed from start_date to end_date inside the daily
+    hours, or before not_before.
+    """
+    todos = plannable_todos(user, start_date, todo_ids)
+    if not todos:
+        return [], []
+
+    _, gaps = free_busy(user, start_date, end_date, hours=hours)
+    if not_before is not None:
+        gaps = [
+            (max(start, not_before), end)
+            for start, end in gaps if end > not_before
+        ]
+
+    placed, unplaced = schedule(todos, gaps, start_date)
+    events = [
+        Event(
+            owner=user,
+            todo=todo,
+            title=todo.title,
+            description=todo.description,
+            date=start.date(),
+            start_time=start.time(),
+            end_time=end.time(),
+            event_type='focus',
+        )
+        for todo, start, end in placed
+    ]
+    return events, unplaced
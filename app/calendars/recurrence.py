@@ -0,0 +1,189 @@
+"""
+Lazy expansion of recurring events.
+
+A recurring event is a single row whose date is its first occurrence.
+Occurrences are never stored: they are generated, only inside the window
+a view asks for, when events are listed. Cancelled occurrences are listed
+in recurrence_exceptions, a changed occurrence is a separate event
+pointing back with recurrence_parent and original_date.
+"""
+import calendar
+import copy
+from datetime import date, timedelta
+
+from django.db.models import Q
+
+from core.models import Event
+
+
+# Days of occurrences listed when a view is not given an end date
+DEFAULT_WINDOW_DAYS = 90
+
+
+def _daily(event, start):
+    """Yield (index, day) of a daily rule, skipping ahead to start"""
+    interval = event.recurrence_interval
+    index = max(0, -(-(start - event.date).days // interval))
+    day = event.date + timedelta(days=index * interval)
+    while True:
+        yield index, day
+        index += 1
+        day += timedelta(days=interval)
+
+
+def _weekly(event, start):
+    """Yield (index, day) of a weekly rule, skipping ahead to start"""
+    interval = event.recurrence_interval
+    weekdays = sorted(set(event.recurrence_days)) or [event.date.weekday()]
+    first_monday = event.date - timedelta(days=event.date.weekday())
+    # Days of the first week before date are not occurrences
+    skipped = sum(1 for day in weekdays if day < event.date.weekday())
+
+    weeks = max(0, (start - first_monday).days // 7 // interval)
+    index = weeks * len(weekdays) - skipped if weeks else 0
+    while True:
+        monday = first_monday + timedelta(weeks=weeks * interval)
+        for weekday in weekdays:
+            day = monday + timedelta(days=weekday)
+            if day < event.date:
+                continue
+            yield index, day
+            index += 1
+        weeks += 1
+
+
+def _monthly(event, start):
+    """Yield (index, day) of a monthly rule on the day of month of date.
+
+    As with RRULE, months without that day (e.g. the 31st) are skipped.
+    """
+    interval = event.recurrence_interval
+    index = 0
+    months = 0
+    while True:
+        total = event.date.month - 1 + months * interval
+        year, month = event.date.year + total // 12, total % 12 + 1
+        if year > date.max.year:
+            return
+        if event.date.day <= calendar.monthrange(year, month)[1]:
+            yield index, date(year, month, event.date.day)
+            index += 1
+        months += 1
+
+
+RULES = {
+    'daily': _daily,
+    'weekly': _weekly,
+    'monthly': _monthly,
+}
+
+
+def occurrence_dates(event, start, end):
+    """Yield the dates of an event's occurrences from start to end"""
+    if not event.recurrence:
+        if start <= event.date <= end:
+            yield event.date
+        return
+
+    last = min(end, event.recurrence_until or end)
+    exceptions = set(event.recurrence_exceptions)
+    for index, day in RULES[event.recurrence](event, start):
+        if day > last:
+            return
+        if event.recurrence_count is not None \
+                and index >= event.recurrence_count:
+            return
+        if day >= start and day.isoformat() not in exceptions:
+            yield day
+
+
+def occurrence(event, day):
+    """Return an unsaved copy of a recurring event on another day"""
+    event = copy.copy(event)
+    event.date = day
+    return event
+
+
+def _may_occur(start, end):
+    """Q of recurring events that may occur from start to end"""
+    return ~Q(recurrence='') & Q(date__lte=end) & (
+        Q(recurrence_until__isnull=True) | Q(recurrence_until__gte=start)
+    )
+
+
+def recurring_in_window(queryset, start, end):
+    """Filter an Event queryset to recurring events that may occur"""
+    return queryset.filter(_may_occur(start, end))
+
+
+def window(start=None, end=None):
+    """Return the days recurring events are expanded in for a view.
+
+    From start (today if None) to end (DEFAULT_WINDOW_DAYS later if None).
+    """
+    start = start or date.today()
+    return start, end or start + timedelta(days=DEFAULT_WINDOW_DAYS)
+
+
+def occurrences(queryset, start, end):
+    """Yield (event, day) for occurrences of recurring events in a queryset.
+
+    Occurrences replaced by an override event are left out, the
+    override is a single event of its own.
+    """
+    masters = list(recurring_in_window(queryset, start, end))
+    if not masters:
+        return
+    # Moved overrides still replace their original occurrence
+    overridden = set(Event.objects.filter(
+        recurrence_parent__in=masters,
+        original_date__gte=start,
+        original_date__lte=end,
+    ).values_list('recurrence_parent_id', 'original_date'))
+    for master in masters:
+        for day in occurrence_dates(master, start, end):
+            if (master.id, day) not in overridden:
+                yield master, day
+
+
+def single_events(queryset, start=None, end=None):
+    """Filter an Event queryset to single events, on optional bounds"""
+    queryset = queryset.filter(recurrence='')
+    if start is not None:
+        queryset = queryset.filter(date__gte=start)
+    if end is not None:
+        queryset = queryset.filter(date__lte=end)
+    return queryset
+
+
+def expand(queryset, start=None, end=None):
+    """Return the events of a queryset from start to end, by date and time.
+
+    Single events are filtered on the given bounds, either of which may
+    be None. Recurring events are expanded into their occurrences in
+    window(start, end).
+    """
+    events = list(single_events(queryset, start, end))
+    events.extend(
+        occurrence(master, day)
+        for master, day in occurrences(queryset, *window(start, end))
+    )
+    events.sort(key=lambda event: (event.date, event.start_time, event.id))
+    return events
+
+
+def expand_filter(start=None, end=None):
+    """Return a Q of the events expand() from start to end depends on.
+
+    These are the single events in the bounds, the recurring events
+    that may occur in the window and the overrides of their occurrences.
+    """
+    singles = Q(recurrence='')
+    if start is not None:
+        singles &= Q(date__gte=start)
+    if end is not None:
+        singles &= Q(date__lte=end)
+    window_start, window_end = window(start, end)
+    return singles | _may_occur(window_start, window_end) | Q(
+        original_date__gte=window_start, original_date__lte=window_end
+    )
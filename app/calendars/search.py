@@ -0,0 +1,87 @@
+"""
+Event search.
+
+Title and description have pg_trgm GIN indexes on the bare columns,
+which serve the ILIKE filters as well as the similarity used to rank
+matches.
+"""
+from django.db.models import (
+    CharField,
+    F,
+    FloatField,
+    Func,
+    Max,
+    Q,
+    TextField,
+    Value,
+)
+from django.db.models.functions import Greatest
+from django.db.models.lookups import IContains
+
+
+@CharField.register_lookup
+@TextField.register_lookup
+class ILikeContains(IContains):
+    """icontains as column ILIKE pattern.
+
+    icontains compares UPPER(column), which indexes on the column
+    cannot serve.
+    """
+    lookup_name = 'ilike_contains'
+
+    def as_sql(self, compiler, connection):
+        lhs_sql, lhs_params = self.process_lhs(compiler, connection)
+        rhs_sql, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs_sql} ILIKE {rhs_sql}', [*lhs_params, *rhs_params]
+
+
+class WordSimilarity(Func):
+    """pg_trgm word_similarity of text to the closest part of a field"""
+    function = 'word_similarity'
+    output_field = FloatField()
+
+    def __init__(self, text, field):
+        super().__init__(Value(text), F(field))
+
+
+def matching(queryset, text):
+    """Filter an Event queryset to events containing text"""
+    return queryset.filter(
+        Q(title__ilike_contains=text) | Q(description__ilike_contains=text)
+    )
+
+
+def relevance(text):
+    """Return an expression ranking how well an event matches text.
+
+    A match in the title counts twice as much as one in the description.
+    """
+    return Greatest(
+        WordSimilarity(text, 'title'),
+        WordSimilarity(text, 'description') * Value(0.5),
+    )
+
+
+def search(queryset, text):
+    """Filter an Event queryset to matches of text, annotated relevance"""
+    return matching(queryset, text).annotate(relevance=relevance(text))
+
+
+def rank(events):
+    """Sort events annotated by search() by relevance.
+
+    The sort is stable, so events keep their order among equals.
+    """
+    events.sort(key=lambda event: -event.relevance)
+    return events
+
+
+def title_suggestions(queryset, text, limit):
+    """Return distinct titles of events containing text, best first"""
+    return list(queryset.filter(
+        title__ilike_contains=text
+    ).order_by().values('title').annotate(
+        relevance=Max(WordSimilarity(text, 'title'))
+    ).order_by('-relevance', 'title').values_list(
+        'title', flat=True
+    )[:limit])
@@ -1,14 +1,147 @@
 """
 Serializers for the Calendars API.
 """
+from django.conf import settings
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_field
 from core.models import Event
-from datetime import datetime
+from datetime import date, datetime, time, timedelta
+import copy
+
+from calendars.overlaps import (
+    conflicts_by_event,
+    unsaved_conflicts,
+)
+
+
+RECURRENCE_FIELDS = [
+    'recurrence',
+    'recurrence_interval',
+    'recurrence_days',
+    'recurrence_until',
+    'recurrence_count',
+    'recurrence_exceptions',
+    'recurrence_parent',
+    'original_date',
+]
+
+
+def check_conflicts(serializer, data):
+    """Reject an event overlapping the owner's others, if configured.
+
+    With EVENTS_REJECT_CONFLICTS off overlaps are allowed, and reported
+    in the conflicts field of the saved event. The occurrences of
+    recurring events are compared, an override replacing the one on its
+    original date. Events changed in a batch are checked together by
+    the view instead.
+    """
+    if not settings.EVENTS_REJECT_CONFLICTS \
+            or serializer.context.get('batch'):
+        return
+
+    instance = serializer.instance
+    if instance is not None:
+        event = copy.copy(instance)
+        others = Event.objects.filter(owner=instance.owner).exclude(
+            id=instance.id
+        )
+    else:
+        event = Event()
+        others = Event.objects.filter(
+            owner=serializer.context['request'].user
+        )
+    for name in ['date', 'start_time', 'end_time', *RECURRENCE_FIELDS]:
+        if name in data:
+            setattr(event, name, data[name])
+    if None in (event.date, event.start_time, event.end_time):
+        return
+
+    [(conflicts, _)] = unsaved_conflicts([event], others)
+    if conflicts:
+        raise serializers.ValidationError(
+            "Event overlaps other events: "
+            f"{', '.join(str(id) for id in conflicts)}."
+        )
+
+
+def validate_recurrence(serializer, data):
+    """Validate a recurrence rule, or an override of an occurrence"""
+    instance = serializer.instance
+
+    def value(name):
+        return data.get(name, getattr(instance, name, None))
+
+    errors = {}
+    recurrence = value('recurrence') or ''
+    interval = value('recurrence_interval')
+    if interval is not None and interval < 1:
+        errors['recurrence_interval'] = 'Must be at least 1.'
+
+    days = value('recurrence_days') or []
+    if not isinstance(days, list) or any(
+        type(day) is not int or not 0 <= day <= 6 for day in days
+    ):
+        errors['recurrence_days'] = (
+            'Must be a list of weekdays from 0 (Monday) to 6 (Sunday).'
+        )
+    elif days and recurrence != 'weekly':
+        errors['recurrence_days'] = 'Only weekly events repeat on weekdays.'
+
+    until = value('recurrence_until')
+    if until and value('date') and until < value('date'):
+        errors['recurrence_until'] = 'Must not be before date.'
+
+    exceptions = value('recurrence_exceptions') or []
+    try:
+        if not isinstance(exceptions, list):
+            raise TypeError
+        exceptions = sorted({
+            date.fromisoformat(day).isoformat() for day in exceptions
+        })
+    except (TypeError, ValueError):
+        errors['recurrence_exceptions'] = (
+            'Must be a list of dates in YYYY-MM-DD format.'
+        )
+    else:
+        if 'recurrence_exceptions' in data:
+            data['recurrence_exceptions'] = exceptions
+
+    parent = value('recurrence_parent')
+    if parent is not None:
+        owner = instance.owner if instance is not None \
+            else serializer.context['request'].user
+        if parent.owner_id != owner.id or not parent.recurrence:
+            errors['recurrence_parent'] = (
+                'Must be one of your recurring events.'
+            )
+        if recurrence:
+            errors['recurrence'] = 'An override of an occurrence cannot recur.'
+        if value('original_date') is None:
+            errors['original_date'] = 'Required with recurrence_parent.'
+    elif value('original_date') is not None:
+        errors['original_date'] = 'Only overrides have an original date.'
+
+    if errors:
+        raise serializers.ValidationError(errors)
+
+
+class EventConflictsListSerializer(serializers.ListSerializer):
+    """Looks the conflicts of all the events up in one query"""
+
+    def to_representation(self, data):
+        events = list(data.all() if hasattr(data, 'all') else data)
+        self.context.setdefault('conflicts', {}).update(
+            conflicts_by_event(events)
+        )
+        return super().to_representation(events)
 
 
 class EventSerializer(serializers.ModelSerializer):
-    """Serializer for Event objects"""
+    """Serializer for Event objects.
+
+    conflicts are read from the conflicts context, a dict of event id to
+    conflicting ids, else looked up for the event.
+    """
 
     @extend_schema_field(serializers.CharField)
     def get_time(self, obj):
@@ -20,13 +153,22 @@ class EventSerializer(serializers.ModelSerializer):
         read_only=True
     )
 
-    @extend_schema_field(serializers.IntegerField)
-    def get_duration(self, obj):
-        return obj.duration
-
-    duration = serializers.SerializerMethodField()
+    # Read from the duration_minutes column
+    duration = serializers.IntegerField(read_only=True)
     type = serializers.CharField(source='event_type')
 
+    @extend_schema_field(serializers.ListField(
+        child=serializers.IntegerField()
+    ))
+    def get_conflicts(self, obj):
+        conflicts = self.context.get('conflicts')
+        if conflicts is None or obj.id not in conflicts:
+            conflicts = conflicts_by_event([obj])
+        return conflicts[obj.id]
+
+    # Ids of the owner's other events overlapping this one
+    conflicts = serializers.SerializerMethodField()
+
     class Meta:
         model = Event
         fields = [
@@ -41,6 +183,9 @@ class EventSerializer(serializers.ModelSerializer):
             'event_type',
             'type',
             'duration',
+            *RECURRENCE_FIELDS,
+            'conflicts',
+            'todo',
             'created_at',
             'updated_at'
         ]
@@ -50,13 +195,20 @@ class EventSerializer(serializers.ModelSerializer):
             'updated_at',
             'time',
             'endTime',
-            'duration'
+            'duration',
+            'conflicts',
+            'todo'
         ]
+        list_serializer_class = EventConflictsListSerializer
 
     def validate(self, data):
         """Validate that end_time is after start_time"""
         start_time = data.get('start_time')
         end_time = data.get('end_time')
+        # A partial update may move only one end of the event
+        if self.instance is not None and (start_time or end_time):
+            start_time = start_time or self.instance.start_time
+            end_time = end_time or self.instance.end_time
 
         if start_time and end_time:
             # Convert to datetime for comparison
@@ -74,6 +226,8 @@ class EventSerializer(serializers.ModelSerializer):
                     "End time must be after start time."
                 )
 
+        validate_recurrence(self, data)
+        check_conflicts(self, data)
         return data
 
 
@@ -93,7 +247,8 @@ class EventCreateSerializer(serializers.ModelSerializer):
             'start_time',
             'end_time',
             'event_type',
-            'type'
+            'type',
+            *RECURRENCE_FIELDS
         ]
 
     def validate(self, data):
@@ -116,6 +271,8 @@ class EventCreateSerializer(serializers.ModelSerializer):
                     "End time must be after start time."
                 )
 
+        validate_recurrence(self, data)
+        check_conflicts(self, data)
         return data
 
 
@@ -132,12 +289,15 @@ class EventListSerializer(serializers.ModelSerializer):
         read_only=True
     )
 
-    @extend_schema_field(serializers.IntegerField)
-    def get_duration(self, obj):
-        return obj.duration
-
-    duration = serializers.SerializerMethodField()
+    # Read from the duration_minutes column
+    duration = serializers.IntegerField(read_only=True)
     type = serializers.CharField(source='event_type')
+    # Occurrences of a recurring event share its id
+    recurringEventId = serializers.IntegerField(
+        source='recurring_event_id',
+        read_only=True,
+        allow_null=True
+    )
 
     class Meta:
         model = Event
@@ -148,10 +308,69 @@ class EventListSerializer(serializers.ModelSerializer):
             'time',
             'endTime',
             'type',
-            'duration'
+            'duration',
+            'recurringEventId'
         ]
 
 
+class PlanSerializer(serializers.Serializer):
+    """Options for planning todos into free time"""
+    max_days = 31
+
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    day_start = serializers.TimeField(default=time(9, 0))
+    day_end = serializers.TimeField(default=time(17, 0))
+    todos = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        allow_empty=False
+    )
+    create = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        """Default to the coming week and check the range"""
+        data.setdefault('start_date', date.today())
+        data.setdefault(
+            'end_date', data['start_date'] + timedelta(days=6)
+        )
+        if data['start_date'] > data['end_date']:
+            raise serializers.ValidationError(
+                "start_date must not be after end_date."
+            )
+        if (data['end_date'] - data['start_date']).days >= self.max_days:
+            raise serializers.ValidationError(
+                f"Range must be at most {self.max_days} days."
+            )
+        if data['day_start'] >= data['day_end']:
+            raise serializers.ValidationError(
+                "day_start must be before day_end."
+            )
+        return data
+
+
+class BulkEventSerializer(serializers.Serializer):
+    """Creates, partial updates and deletes of events, applied together.
+
+    Each create is validated by EventCreateSerializer and each update,
+    which also carries the id of its event, by EventSerializer.
+    """
+    create = serializers.ListField(
+        child=serializers.DictField(), required=False, default=list
+    )
+    update = serializers.ListField(
+        child=serializers.DictField(), required=False, default=list
+    )
+    delete = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list
+    )
+
+
+class EventImportSerializer(serializers.Serializer):
+    """An uploaded iCalendar file"""
+    file = serializers.FileField()
+
+
 class EventsGroupedSerializer(serializers.Serializer):
     """Serializer for grouped events response"""
     pass  # This will be a dict with date keys and event arrays as values
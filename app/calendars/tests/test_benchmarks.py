@@ -0,0 +1,104 @@
+"""
+Benchmarks for the calendar endpoints.
+
+Skipped unless RUN_BENCHMARKS is set, e.g.:
+
+    RUN_BENCHMARKS=1 python manage.py test calendars.tests.test_benchmarks
+"""
+import os
+import time as timer
+from collections import defaultdict
+from datetime import date, time, timedelta
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Event
+from calendars.recurrence import single_events
+from calendars.views import EventsGroupedByDateView
+
+
+GROUPED_EVENTS_URL = reverse('calendars:events-grouped')
+
+
+class ModelInstanceGroupedView(EventsGroupedByDateView):
+    """EventsGroupedByDateView as it was, building model instances"""
+
+    def get(self, request):
+        queryset = single_events(
+            Event.objects.filter(owner=request.user),
+            *self.get_date_range(request)
+        )
+        grouped_events = defaultdict(list)
+        for event in queryset.order_by('date', 'start_time'):
+            grouped_events[event.date.strftime('%Y-%m-%d')].append({
+                'id': event.id,
+                'title': event.title,
+                'time': event.time,
+                'endTime': event.end_time_formatted,
+                'type': event.event_type,
+                'duration': event.duration,
+            })
+        return Response(dict(grouped_events))
+
+
+def get_rendered(view, user, params):
+    """Run a GET through a view, including rendering the response"""
+    request = APIRequestFactory().get(GROUPED_EVENTS_URL, params)
+    force_authenticate(request, user=user)
+    return view(request).render()
+
+
+def best_of(repeat, func):
+    """Return the fastest of several runs of func, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = timer.perf_counter()
+        func()
+        timings.append(timer.perf_counter() - start)
+    return min(timings)
+
+
+@skipUnless(os.environ.get('RUN_BENCHMARKS'), 'Set RUN_BENCHMARKS to run')
+class EventsGroupedBenchmark(TestCase):
+    """Time the grouped events endpoint on a 10k event range"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'bench@example.com', 'testpass123'
+        )
+        first_day = date(2025, 1, 1)
+        Event.objects.bulk_create([
+            Event(
+                owner=cls.user,
+                title=f'Event {i}',
+                date=first_day + timedelta(days=i % 365),
+                start_time=time(i % 24, 0),
+                end_time=time((i + 1) % 24, 30),
+                event_type='study',
+            )
+            for i in range(10000)
+        ])
+
+    def test_grouped_events_speedup(self):
+        """Test the values() path beats building model instances"""
+        params = {'start_date': '2025-01-01', 'end_date': '2025-12-31'}
+        views = [
+            EventsGroupedByDateView.as_view(),
+            ModelInstanceGroupedView.as_view(),
+        ]
+
+        fast, old = (
+            best_of(5, lambda: get_rendered(view, self.user, params))
+            for view in views
+        )
+
+        self.assertLess(fast, old, (
+            f'10k events grouped: model instances {old * 1000:.0f} ms, '
+            f'values() {fast * 1000:.0f} ms'
+        ))
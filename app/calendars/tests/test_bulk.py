@@ -0,0 +1,267 @@
+"""
+Tests for bulk event changes.
+"""
+from datetime import date, time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Event, EventDeletions
+
+
+BULK_URL = reverse('calendars:event-bulk')
+DAY = date(2025, 6, 2)
+
+
+def detail_url(event_id):
+    """Return event detail URL"""
+    return reverse('calendars:event-detail', args=[event_id])
+
+
+def create_user(**params):
+    """Create and return a sample user"""
+    defaults = {
+        'email': 'user@example.com',
+        'password': 'testpass123',
+        'name': 'Test User',
+    }
+    defaults.update(params)
+    return get_user_model().objects.create_user(**defaults)
+
+
+def create_event(user, **params):
+    """Create and return a sample event"""
+    defaults = {
+        'title': 'Sample Event',
+        'date': DAY,
+        'start_time': time(9, 0),
+        'end_time': time(10, 0),
+        'event_type': 'focus',
+    }
+    defaults.update(params)
+    return Event.objects.create(owner=user, **defaults)
+
+
+class BulkEventTests(TestCase):
+    """Test creating, updating and deleting events together"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+        self.first = create_event(self.user)
+        self.second = create_event(self.user, title='Second')
+        self.third = create_event(self.user, title='Third')
+
+    def test_bulk_changes(self):
+        """Test all changes are applied with a fixed number of queries"""
+        updated_at = self.first.updated_at
+        payload = {
+            'create': [
+                {'title': 'New', 'date': '2025-06-03',
+                 'start_time': '14:00', 'end_time': '15:00'},
+                {'title': 'Newer', 'date': '2025-06-04',
+                 'start_time': '14:00', 'end_time': '14:30',
+                 'type': 'study'},
+            ],
+            'update': [
+                {'id': self.first.id, 'date': '2025-06-05',
+                 'start_time': '11:00', 'end_time': '12:30'},
+                {'id': self.second.id, 'end_time': '11:00'},
+            ],
+            'delete': [self.third.id],
+        }
+
+        # Events to change, insert, update, delete with its cascade and
+        # the deletion counter, in a transaction
+        with self.assertNumQueries(9):
+            res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [event['title'] for event in res.data['created']],
+            ['New', 'Newer'],
+        )
+        self.assertEqual(
+            [event['duration'] for event in res.data['updated']], [90, 120]
+        )
+        self.assertEqual(res.data['deleted'], 1)
+
+        first = Event.objects.with_duration().get(id=self.first.id)
+        self.assertEqual(first.date, date(2025, 6, 5))
+        self.assertEqual(first.duration_minutes, 90)
+        self.assertGreater(first.updated_at, updated_at)
+        self.assertFalse(Event.objects.filter(id=self.third.id).exists())
+        self.assertEqual(
+            Event.objects.get(title='Newer').event_type, 'study'
+        )
+        self.assertEqual(EventDeletions.objects.get(user=self.user).count, 1)
+
+    def test_invalid_change_applies_nothing(self):
+        """Test one invalid item rejects the whole request"""
+        other = create_event(create_user(email='other@example.com'))
+        payload = {
+            'create': [
+                {'title': 'Fine', 'date': '2025-06-03',
+                 'start_time': '14:00', 'end_time': '15:00'},
+            ],
+            'update': [
+                # Only the end, before the stored start
+                {'id': self.first.id, 'end_time': '08:00'},
+                {'id': other.id, 'title': 'Not mine'},
+            ],
+            'delete': [self.third.id, 999999],
+        }
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('create', res.data)
+        self.assertIn('non_field_errors', res.data['update'][0])
+        self.assertIn('id', res.data['update'][1])
+        self.assertEqual(res.data['delete'][0], {})
+        self.assertIn('id', res.data['delete'][1])
+        self.assertEqual(Event.objects.filter(owner=self.user).count(), 3)
+        self.assertEqual(Event.objects.get(id=other.id).title, 'Sample Event')
+
+    def test_update_and_delete_same_event(self):
+        """Test an event cannot be updated and deleted together"""
+        res = self.client.post(BULK_URL, {
+            'update': [{'id': self.first.id, 'title': 'Renamed'}],
+            'delete': [self.first.id],
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Event.objects.filter(id=self.first.id).exists())
+
+    def test_patch_checks_stored_start(self):
+        """Test a single PATCH of the end time checks the stored start"""
+        res = self.client.patch(
+            detail_url(self.first.id), {'end_time': '08:00'}, format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(EVENTS_REJECT_CONFLICTS=True)
+    def test_creates_overlapping_each_other_rejected(self):
+        """Test creates overlapping each other in one request are rejected"""
+        res = self.client.post(BULK_URL, {'create': [
+            {'title': 'Early', 'date': '2025-06-03',
+             'start_time': '14:00', 'end_time': '15:00'},
+            {'title': 'After', 'date': '2025-06-03',
+             'start_time': '15:30', 'end_time': '16:00'},
+            {'title': 'Late', 'date': '2025-06-03',
+             'start_time': '14:30', 'end_time': '15:30'},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data['create'][0]['non_field_errors'],
+            ['Overlaps create 2 of this request.'],
+        )
+        self.assertEqual(res.data['create'][1], {})
+        self.assertEqual(
+            res.data['create'][2]['non_field_errors'],
+            ['Overlaps create 0 of this request.'],
+        )
+        self.assertFalse(Event.objects.filter(date=date(2025, 6, 3)).exists())
+
+    @override_settings(EVENTS_REJECT_CONFLICTS=True)
+    def test_update_onto_create_rejected(self):
+        """Test an update moved onto a create of the request is rejected"""
+        res = self.client.post(BULK_URL, {
+            'create': [
+                {'title': 'New', 'date': '2025-06-03',
+                 'start_time': '14:00', 'end_time': '15:00'},
+            ],
+            'update': [
+                {'id': self.first.id, 'date': '2025-06-03',
+                 'start_time': '14:30', 'end_time': '15:30'},
+            ],
+            'delete': [self.second.id, self.third.id],
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data['create'][0]['non_field_errors'],
+            ['Overlaps update 0 of this request.'],
+        )
+        self.assertEqual(
+            res.data['update'][0]['non_field_errors'],
+            ['Overlaps create 0 of this request.'],
+        )
+        self.assertEqual(Event.objects.filter(owner=self.user).count(), 3)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.date, DAY)
+
+    @override_settings(EVENTS_REJECT_CONFLICTS=True)
+    def test_shift_adjacent_events(self):
+        """Test events are checked where the batch leaves the others"""
+        early = create_event(self.user, date=date(2025, 6, 5))
+        late = create_event(
+            self.user, date=date(2025, 6, 5),
+            start_time=time(10, 0), end_time=time(11, 0),
+        )
+        blocking = create_event(
+            self.user, date=date(2025, 6, 5),
+            start_time=time(11, 15), end_time=time(12, 0),
+        )
+
+        res = self.client.post(BULK_URL, {'update': [
+            {'id': early.id, 'start_time': '09:30', 'end_time': '10:30'},
+            {'id': late.id, 'start_time': '10:30', 'end_time': '11:30'},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['update'][0], {})
+        self.assertEqual(
+            res.data['update'][1]['non_field_errors'],
+            [f'Event overlaps other events: {blocking.id}.'],
+        )
+
+        res = self.client.post(BULK_URL, {
+            'update': [
+                {'id': early.id, 'start_time': '09:30', 'end_time': '10:30'},
+                {'id': late.id, 'start_time': '10:30', 'end_time': '11:30'},
+            ],
+            'delete': [blocking.id],
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        late.refresh_from_db()
+        self.assertEqual(late.start_time, time(10, 30))
+
+    @override_settings(EVENTS_REJECT_CONFLICTS=True)
+    def test_swap_event_dates(self):
+        """Test two events can trade places"""
+        monday = create_event(self.user, date=date(2025, 6, 9))
+        tuesday = create_event(self.user, date=date(2025, 6, 10))
+
+        res = self.client.post(BULK_URL, {'update': [
+            {'id': monday.id, 'date': '2025-06-10'},
+            {'id': tuesday.id, 'date': '2025-06-09'},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        monday.refresh_from_db()
+        self.assertEqual(monday.date, date(2025, 6, 10))
+
+    @override_settings(EVENTS_REJECT_CONFLICTS=True)
+    def test_delete_and_create_in_its_place(self):
+        """Test an event can be replaced by one created in its slot"""
+        old = create_event(self.user, date=date(2025, 6, 9))
+
+        res = self.client.post(BULK_URL, {
+            'create': [
+                {'title': 'Replacement', 'date': '2025-06-09',
+                 'start_time': '09:00', 'end_time': '10:00'},
+            ],
+            'delete': [old.id],
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            Event.objects.get(date=date(2025, 6, 9)).title, 'Replacement'
+        )
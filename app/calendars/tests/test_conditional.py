@@ -0,0 +1,155 @@
+"""
+Tests for conditional GETs of calendar views.
+"""
+from datetime import date, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Event, EventDeletions
+
+
+EVENTS_URL = reverse('calendars:event-list-create')
+GROUPED_EVENTS_URL = reverse('calendars:events-grouped')
+TODAY_EVENTS_URL = reverse('calendars:today-events')
+JUNE = {'start_date': '2025-06-01', 'end_date': '2025-06-30'}
+
+
+def detail_url(event_id):
+    """Return event detail URL"""
+    return reverse('calendars:event-detail', args=[event_id])
+
+
+def create_user(**params):
+    """Create and return a sample user"""
+    defaults = {
+        'email': 'user@example.com',
+        'password': 'testpass123',
+        'name': 'Test User',
+    }
+    defaults.update(params)
+    return get_user_model().objects.create_user(**defaults)
+
+
+def create_event(user, **params):
+    """Create and return a sample event"""
+    defaults = {
+        'title': 'Sample Event',
+        'date': date(2025, 6, 2),
+        'start_time': time(9, 0),
+        'end_time': time(10, 0),
+        'event_type': 'focus',
+    }
+    defaults.update(params)
+    return Event.objects.create(owner=user, **defaults)
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETags of calendar ranges"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+        self.event = create_event(self.user)
+
+    def etag(self, url, params=JUNE):
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res['ETag']
+
+    def test_not_modified_skips_events(self):
+        """Test a matching ETag is answered without loading events"""
+        for url in [EVENTS_URL, GROUPED_EVENTS_URL]:
+            etag = self.etag(url)
+
+            # The validators only
+            with self.assertNumQueries(2):
+                res = self.client.get(url, JUNE, HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(res['ETag'], etag)
+            self.assertEqual(res.content, b'')
+
+    def test_no_last_modified(self):
+        """Test an event moved out of the range is never answered 304.
+
+        The range's latest updated_at is the same after the move, so
+        only the ETag is sent.
+        """
+        other = create_event(self.user, date=date(2025, 6, 20))
+        res = self.client.get(EVENTS_URL, JUNE)
+        self.assertNotIn('Last-Modified', res)
+        etag = res['ETag']
+
+        # What Last-Modified would have been, the latest updated_at
+        since = http_date(other.updated_at.timestamp())
+
+        self.client.patch(
+            detail_url(other.id), {'date': '2025-07-20'}, format='json'
+        )
+
+        res = self.client.get(EVENTS_URL, JUNE, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([event['id'] for event in res.data], [self.event.id])
+        res = self.client.get(EVENTS_URL, JUNE, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_changes_in_range(self):
+        """Test updates, creates and deletes in the range change the ETag"""
+        etag = self.etag(EVENTS_URL)
+
+        self.client.patch(
+            detail_url(self.event.id), {'title': 'Renamed'}, format='json'
+        )
+        updated = self.etag(EVENTS_URL)
+        self.assertNotEqual(updated, etag)
+
+        other = create_event(self.user, date=date(2025, 6, 20))
+        created = self.etag(EVENTS_URL)
+        self.assertNotEqual(created, updated)
+
+        self.client.delete(detail_url(other.id))
+        self.assertNotEqual(self.etag(EVENTS_URL), created)
+        self.assertEqual(EventDeletions.objects.get(user=self.user).count, 1)
+
+    def test_changes_elsewhere(self):
+        """Test events outside the range and other users' are ignored"""
+        etag = self.etag(EVENTS_URL)
+
+        create_event(self.user, date=date(2025, 8, 1))
+        create_event(create_user(email='other@example.com'))
+
+        res = self.client.get(EVENTS_URL, JUNE, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_recurring_events(self):
+        """Test recurring events and moved occurrences change the ETag"""
+        weekly = create_event(
+            self.user, date=date(2025, 1, 6), recurrence='weekly',
+        )
+        etag = self.etag(GROUPED_EVENTS_URL)
+
+        # An occurrence in June moved to July
+        create_event(
+            self.user, recurrence_parent=weekly,
+            original_date=date(2025, 6, 9), date=date(2025, 7, 9),
+        )
+
+        self.assertNotEqual(self.etag(GROUPED_EVENTS_URL), etag)
+
+    def test_today_events(self):
+        """Test today's events are conditional as well"""
+        create_event(self.user, date=date.today())
+        etag = self.etag(TODAY_EVENTS_URL, {})
+
+        res = self.client.get(TODAY_EVENTS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        create_event(self.user, date=date.today() + timedelta(days=1))
+        res = self.client.get(TODAY_EVENTS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
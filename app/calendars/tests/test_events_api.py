@@ -1,19 +1,29 @@
 """
 Tests for the Events API.
 """
+from unittest import skipUnless
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
-from datetime import date, time
+from datetime import date, datetime, time, timedelta
 
 from core.models import Event
+from calendars.overlaps import overlapping
+from calendars.search import search
+from calendars.serializers import EventSerializer
 
 
 EVENTS_URL = reverse('calendars:event-list-create')
 GROUPED_EVENTS_URL = reverse('calendars:events-grouped')
 TODAY_EVENTS_URL = reverse('calendars:today-events')
+CONFLICTS_URL = reverse('calendars:event-conflicts')
+PLANNED_MINUTES_URL = reverse('calendars:planned-minutes')
+AUTOCOMPLETE_URL = reverse('calendars:event-autocomplete')
 
 
 def detail_url(event_id):
@@ -181,3 +191,451 @@ class PrivateEventApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Event.objects.filter(id=event.id).exists())
+
+
+class EventConflictTests(TestCase):
+    """Test overlap detection between events"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+        self.day = date(2025, 6, 2)
+
+    def test_conflicts_endpoint(self):
+        """Test only overlapping events in the range are returned"""
+        first = create_event(
+            self.user, date=self.day,
+            start_time=time(9, 0), end_time=time(10, 0),
+        )
+        second = create_event(
+            self.user, date=self.day,
+            start_time=time(9, 30), end_time=time(11, 0),
+        )
+        # Touching is not overlapping
+        create_event(
+            self.user, date=self.day,
+            start_time=time(11, 0), end_time=time(12, 0),
+        )
+        other_user = create_user(email='other@example.com')
+        create_event(
+            other_user, date=self.day,
+            start_time=time(9, 0), end_time=time(10, 0),
+        )
+
+        res = self.client.get(CONFLICTS_URL, {
+            'start_date': '2025-06-01',
+            'end_date': '2025-06-07',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([e['id'] for e in res.data], [first.id, second.id])
+        self.assertEqual(res.data[0]['conflictsWith'], [second.id])
+        self.assertEqual(res.data[1]['conflictsWith'], [first.id])
+
+        res = self.client.get(CONFLICTS_URL, {
+            'start_date': '2025-06-03',
+            'end_date': '2025-06-07',
+        })
+        self.assertEqual(res.data, [])
+
+    def test_conflict_across_midnight(self):
+        """Test an event crossing midnight conflicts with the next day"""
+        late = create_event(
+            self.user, date=self.day,
+            start_time=time(23, 0), end_time=time(1, 0),
+        )
+        early = create_event(
+            self.user, date=date(2025, 6, 3),
+            start_time=time(0, 30), end_time=time(2, 0),
+        )
+
+        res = self.client.get(CONFLICTS_URL, {
+            'start_date': '2025-06-03',
+            'end_date': '2025-06-03',
+        })
+
+        self.assertEqual([e['id'] for e in res.data], [late.id, early.id])
+
+    def test_conflicts_with_occurrences(self):
+        """Test occurrences of recurring events are checked on their day"""
+        weekly = create_event(
+            self.user, date=self.day, recurrence='weekly',
+            recurrence_exceptions=['2025-06-16'],
+        )
+        # On the second and the cancelled third occurrence
+        single = create_event(
+            self.user, date=date(2025, 6, 9),
+            start_time=time(9, 30), end_time=time(10, 30),
+        )
+        create_event(self.user, date=date(2025, 6, 16))
+
+        res = self.client.get(CONFLICTS_URL, {
+            'start_date': '2025-06-08',
+            'end_date': '2025-06-22',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(e['id'], e['date']) for e in res.data],
+            [(weekly.id, '2025-06-09'), (single.id, '2025-06-09')],
+        )
+        self.assertEqual(res.data[0]['recurringEventId'], weekly.id)
+        self.assertEqual(res.data[0]['conflictsWith'], [single.id])
+        self.assertEqual(res.data[1]['conflictsWith'], [weekly.id])
+        self.assertEqual(
+            EventSerializer(single).data['conflicts'], [weekly.id]
+        )
+
+    def test_invalid_range(self):
+        """Test invalid ranges are rejected"""
+        res = self.client.get(CONFLICTS_URL, {
+            'start_date': '2025-06-07',
+            'end_date': '2025-06-01',
+        })
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(CONFLICTS_URL, {
+            'start_date': '2025-01-01',
+            'end_date': '2026-06-01',
+        })
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_created_event_reports_conflicts(self):
+        """Test a created event lists the events it overlaps"""
+        existing = create_event(
+            self.user, date=self.day,
+            start_time=time(9, 0), end_time=time(10, 0),
+        )
+        payload = {
+            'title': 'Overlapping',
+            'date': '2025-06-02',
+            'start_time': '09:30',
+            'end_time': '10:30',
+        }
+
+        res = self.client.post(EVENTS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['conflicts'], [existing.id])
+
+    def test_serialized_events_look_conflicts_up_once(self):
+        """Test many events are serialized with one conflicts query"""
+        events = [
+            create_event(
+                self.user, date=self.day,
+                start_time=time(9, hour), end_time=time(10, hour),
+            )
+            for hour in range(4)
+        ]
+        create_event(self.user, date=self.day + timedelta(days=1))
+
+        with CaptureQueriesContext(connection) as context:
+            data = EventSerializer(events, many=True).data
+
+        # Overlapping single events and recurring ones that may occur
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertEqual(
+            data[0]['conflicts'], [event.id for event in events[1:]]
+        )
+
+    def test_overlapping_in_subquery(self):
+        """Test the period of the subquery's own events is compared"""
+        first = create_event(
+            self.user, date=self.day,
+            start_time=time(9, 0), end_time=time(10, 0),
+        )
+        create_event(
+            self.user, date=self.day,
+            start_time=time(11, 0), end_time=time(12, 0),
+        )
+        start = datetime.combine(self.day, time(9, 30))
+        end = datetime.combine(self.day, time(9, 45))
+
+        queryset = Event.objects.exclude(
+            id__in=overlapping(Event.objects.all(), start, end).values('id')
+        ).filter(owner=self.user)
+
+        self.assertIn('U0."period" &&', str(queryset.query))
+        self.assertNotIn(first, queryset)
+        self.assertEqual(queryset.count(), 1)
+
+    @override_settings(EVENTS_REJECT_CONFLICTS=True)
+    def test_conflicts_rejected_when_configured(self):
+        """Test overlapping events are rejected when configured"""
+        existing = create_event(
+            self.user, date=self.day,
+            start_time=time(9, 0), end_time=time(10, 0),
+        )
+        event = create_event(
+            self.user, date=self.day,
+            start_time=time(10, 0), end_time=time(11, 0),
+        )
+        payload = {
+            'title': 'Overlapping',
+            'date': '2025-06-02',
+            'start_time': '09:30',
+            'end_time': '10:30',
+        }
+
+        res = self.client.post(EVENTS_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data['non_field_errors'][0],
+            f'Event overlaps other events: {existing.id}, {event.id}.'
+        )
+
+        # Moving an event onto another one is rejected too
+        res = self.client.patch(
+            detail_url(event.id), {'start_time': '09:00'}, format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.patch(
+            detail_url(event.id), {'title': 'Renamed'}, format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(EVENTS_REJECT_CONFLICTS=True)
+    def test_occurrences_checked_when_configured(self):
+        """Test occurrences conflict, the one an override replaces not"""
+        weekly = create_event(self.user, date=self.day, recurrence='weekly')
+        payload = {
+            'title': 'Moved',
+            'date': '2025-06-02',
+            'start_time': '09:30',
+            'end_time': '10:30',
+            'recurrence_parent': weekly.id,
+            'original_date': '2025-06-02',
+        }
+
+        res = self.client.post(EVENTS_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res = self.client.post(EVENTS_URL, {
+            'title': 'Second week',
+            'date': '2025-06-09',
+            'start_time': '09:30',
+            'end_time': '10:30',
+        }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data['non_field_errors'][0],
+            f'Event overlaps other events: {weekly.id}.'
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', 'Requires PostgreSQL')
+    def test_overlap_query_uses_gist_index(self):
+        """Test overlaps are found through the GiST index"""
+        # A year of daily events, so one hour is a small part of it
+        Event.objects.bulk_create([
+            Event(
+                owner=self.user,
+                title='Daily',
+                date=date(2025, 1, 1) + timedelta(days=i),
+                start_time=time(9, 0),
+                end_time=time(10, 0),
+            )
+            for i in range(365)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_event')
+            cursor.execute(
+                'EXPLAIN SELECT id FROM core_event '
+                'WHERE owner_id = %s AND period && tsrange(%s, %s)',
+                [self.user.id, '2025-06-02 09:00', '2025-06-02 10:00'],
+            )
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+
+        self.assertIn('core_event_owner_period_gist', plan)
+
+
+class PlannedMinutesTests(TestCase):
+    """Test the stored duration and planned minutes aggregation"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+        self.monday = date(2025, 6, 2)
+
+    def test_duration_across_midnight(self):
+        """Test the generated column counts events past midnight"""
+        event = create_event(
+            self.user, date=self.monday,
+            start_time=time(23, 0), end_time=time(0, 30),
+        )
+        event = Event.objects.with_duration().get(id=event.id)
+        self.assertEqual(event.duration_minutes, 90)
+        self.assertEqual(event.duration, 90)
+
+    def test_duration_only_loaded_when_asked(self):
+        """Test duration_minutes is read from the queried table's alias"""
+        self.assertNotIn(
+            'duration_minutes', str(Event.objects.all().query)
+        )
+        long_event = create_event(
+            self.user, date=self.monday,
+            start_time=time(9, 0), end_time=time(11, 0),
+        )
+        create_event(self.user, date=self.monday)
+
+        # The subquery reads core_event under another alias
+        queryset = Event.objects.filter(id__in=Event.objects.with_duration(
+        ).filter(duration_minutes__gt=60).values('id'))
+
+        self.assertEqual(list(queryset), [long_event])
+
+    def test_duration_follows_update(self):
+        """Test the duration is current after the times change"""
+        event = create_event(self.user, date=self.monday)
+        res = self.client.patch(
+            detail_url(event.id), {'end_time': '11:15'}, format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['duration'], 135)
+
+    def test_planned_minutes_per_day(self):
+        """Test minutes are summed per type and day"""
+        create_event(self.user, date=self.monday, event_type='focus')
+        create_event(
+            self.user, date=self.monday, event_type='focus',
+            start_time=time(13, 0), end_time=time(13, 30),
+        )
+        create_event(
+            self.user, date=self.monday + timedelta(days=2),
+            event_type='meeting',
+        )
+        # Daily from Tuesday, 45 minutes
+        create_event(
+            self.user, date=self.monday + timedelta(days=1),
+            event_type='study', recurrence='daily',
+            start_time=time(18, 0), end_time=time(18, 45),
+        )
+        create_event(
+            create_user(email='other@example.com'), date=self.monday,
+        )
+
+        res = self.client.get(PLANNED_MINUTES_URL, {
+            'start_date': '2025-06-02', 'end_date': '2025-06-04',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['periods'], [
+            self.monday + timedelta(days=i) for i in range(3)
+        ])
+        self.assertEqual(res.data['plannedMinutes'], {
+            'focus': [90, 0, 0],
+            'meeting': [0, 0, 60],
+            'study': [0, 45, 45],
+        })
+
+    def test_planned_minutes_per_week(self):
+        """Test week buckets start on Monday"""
+        create_event(self.user, date=self.monday + timedelta(days=6))
+        create_event(self.user, date=self.monday + timedelta(days=7))
+
+        res = self.client.get(PLANNED_MINUTES_URL, {
+            'bucket': 'week',
+            'start_date': '2025-06-04',
+            'end_date': '2025-06-10',
+            'type': 'focus',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['periods'],
+            [self.monday, self.monday + timedelta(days=7)],
+        )
+        self.assertEqual(res.data['plannedMinutes'], {'focus': [60, 60]})
+
+    def test_planned_minutes_invalid_bucket(self):
+        """Test an unknown bucket is rejected"""
+        res = self.client.get(PLANNED_MINUTES_URL, {'bucket': 'year'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class EventSearchTests(TestCase):
+    """Test trigram indexed event search"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+
+    def test_search_ordered_by_relevance(self):
+        """Test title matches come before description matches"""
+        in_description = create_event(
+            self.user, title='Weekly sync',
+            description='Go through the budget review',
+            date=date.today(),
+        )
+        in_title = create_event(
+            self.user, title='Budget review',
+            date=date.today() + timedelta(days=1),
+        )
+        create_event(self.user, title='Standup')
+
+        res = self.client.get(EVENTS_URL, {'search': 'budget review'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [event['id'] for event in res.data],
+            [in_title.id, in_description.id],
+        )
+
+    def test_autocomplete_titles(self):
+        """Test autocomplete returns distinct matching titles"""
+        create_event(self.user, title='Physics lecture')
+        create_event(self.user, title='Physics lecture')
+        create_event(self.user, title='Physics lab')
+        create_event(self.user, title='Chemistry')
+        create_event(
+            create_user(email='other@example.com'), title='Physics exam',
+        )
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'physics lab'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, ['Physics lab'])
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'phys', 'limit': 5})
+
+        self.assertEqual(
+            sorted(res.data), ['Physics lab', 'Physics lecture']
+        )
+
+    def test_autocomplete_requires_text(self):
+        """Test q is required"""
+        res = self.client.get(AUTOCOMPLETE_URL)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Requires PostgreSQL')
+    def test_search_uses_trigram_index(self):
+        """Test substring search is served by the trigram index"""
+        Event.objects.bulk_create([
+            Event(
+                owner=self.user,
+                title=f'Session {i}',
+                date=date(2020, 1, 1) + timedelta(days=i),
+                start_time=time(9, 0),
+                end_time=time(10, 0),
+            )
+            for i in range(2000)
+        ])
+        create_event(self.user, title='Quarterly planning')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_event')
+            # Move the new rows out of the GIN pending list, as autovacuum
+            # would; a test sized table is still cheaper to scan
+            cursor.execute(
+                "SELECT gin_clean_pending_list('event_title_trgm_idx')"
+            )
+            cursor.execute(
+                "SELECT gin_clean_pending_list('event_description_trgm_idx')"
+            )
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = search(
+                Event.objects.filter(owner=self.user), 'Quarterly'
+            ).explain()
+
+        self.assertIn('event_title_trgm_idx', plan)
@@ -0,0 +1,146 @@
+"""
+Tests for free/busy times.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from calendars.freebusy import free_busy, free_gaps, merge_busy
+from core.models import Event
+
+
+FREE_BUSY_URL = reverse('calendars:free-busy')
+DAY = date(2025, 6, 2)  # A Monday
+
+
+def at(hour, minute=0, day=DAY):
+    """Return a datetime on a day"""
+    return datetime.combine(day, time(hour, minute))
+
+
+def create_user(**params):
+    """Create and return a sample user"""
+    defaults = {
+        'email': 'user@example.com',
+        'password': 'testpass123',
+        'name': 'Test User',
+    }
+    defaults.update(params)
+    return get_user_model().objects.create_user(**defaults)
+
+
+def create_event(user, **params):
+    """Create and return a sample event"""
+    defaults = {
+        'title': 'Meeting',
+        'date': DAY,
+        'start_time': time(9, 0),
+        'end_time': time(10, 0),
+        'event_type': 'meeting',
+    }
+    defaults.update(params)
+    return Event.objects.create(owner=user, **defaults)
+
+
+class SweepTests(SimpleTestCase):
+    """Test merging intervals and finding gaps"""
+
+    def test_merge_overlapping_and_touching(self):
+        """Test overlapping, nested and touching events merge"""
+        rows = [
+            (DAY, time(9, 0), time(10, 0)),
+            (DAY, time(9, 30), time(9, 45)),
+            (DAY, time(10, 0), time(11, 0)),
+            (DAY, time(13, 0), time(14, 0)),
+        ]
+        busy = merge_busy(rows, at(0), at(0, day=DAY + timedelta(days=1)))
+        self.assertEqual(busy, [(at(9), at(11)), (at(13), at(14))])
+
+    def test_merge_clips_to_range(self):
+        """Test events crossing midnight are clipped to the range"""
+        rows = [
+            (DAY - timedelta(days=1), time(23, 0), time(1, 0)),
+            (DAY, time(23, 30), time(0, 30)),
+        ]
+        busy = merge_busy(rows, at(0), at(0, day=DAY + timedelta(days=1)))
+        self.assertEqual(busy, [
+            (at(0), at(1)),
+            (at(23, 30), at(0, day=DAY + timedelta(days=1))),
+        ])
+
+    def test_gaps_min_length_and_hours(self):
+        """Test short gaps and time outside the hours are left out"""
+        busy = [(at(9), at(10)), (at(10, 10), at(12))]
+        gaps = free_gaps(
+            busy, at(0), at(0, day=DAY + timedelta(days=1)),
+            min_length=timedelta(minutes=15),
+            hours=(time(8, 0), time(18, 0)),
+        )
+        self.assertEqual(gaps, [(at(8), at(9)), (at(12), at(18))])
+
+
+class FreeBusyTests(TestCase):
+    """Test free/busy times of a user's calendar"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+
+    def test_single_events_in_one_query(self):
+        """Test busy times of single events take one query"""
+        create_event(self.user)
+        create_event(
+            self.user, start_time=time(9, 30), end_time=time(11, 0),
+        )
+
+        # The events and the recurring events that may occur
+        with self.assertNumQueries(2):
+            busy, free = free_busy(self.user, DAY, DAY)
+
+        self.assertEqual(busy, [(at(9), at(11))])
+        self.assertEqual(
+            free,
+            [(at(0), at(9)), (at(11), at(0, day=DAY + timedelta(days=1)))],
+        )
+
+    def test_free_busy_endpoint(self):
+        """Test recurring occurrences and options of the endpoint"""
+        create_event(self.user)
+        create_event(
+            self.user, date=DAY - timedelta(days=7), recurrence='weekly',
+            start_time=time(14, 0), end_time=time(15, 0),
+        )
+        create_event(
+            create_user(email='other@example.com'),
+            start_time=time(11, 0), end_time=time(12, 0),
+        )
+
+        res = self.client.get(FREE_BUSY_URL, {
+            'start_date': '2025-06-02',
+            'end_date': '2025-06-02',
+            'min_gap': 90,
+            'day_start': '08:00',
+            'day_end': '18:00',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['busy'], [
+            {'start': at(9), 'end': at(10)},
+            {'start': at(14), 'end': at(15)},
+        ])
+        self.assertEqual(res.data['free'], [
+            {'start': at(10), 'end': at(14), 'minutes': 240},
+            {'start': at(15), 'end': at(18), 'minutes': 180},
+        ])
+
+    def test_invalid_hours(self):
+        """Test day_start must be before day_end"""
+        res = self.client.get(FREE_BUSY_URL, {
+            'day_start': '18:00', 'day_end': '08:00',
+        })
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,261 @@
+"""
+Tests for iCalendar export and import.
+"""
+from datetime import date, time
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+
+from calendars.ical import fold, import_events
+from core.models import Event
+
+
+EXPORT_URL = reverse('calendars:event-export')
+IMPORT_URL = reverse('calendars:event-import')
+
+TIMETABLE = '''BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:-//University//Timetable//EN
+BEGIN:VTIMEZONE
+TZID:Europe/Warsaw
+BEGIN:STANDARD
+DTSTART:19701025T030000
+TZOFFSETFROM:+0200
+TZOFFSETTO:+0100
+END:STANDARD
+END:VTIMEZONE
+BEGIN:VEVENT
+UID:lecture-1@university
+DTSTART;TZID=Europe/Warsaw:20251006T081500
+DTEND;TZID=Europe/Warsaw:20251006T100000
+RRULE:FREQ=WEEKLY;BYDAY=MO,TH;UNTIL=20260130T235959Z
+EXDATE;TZID=Europe/Warsaw:20251103T081500
+SUMMARY:Linear algebra\\, lecture
+DESCRIPTION:Room 101\\nBring notes
+CATEGORIES:STUDY
+BEGIN:VALARM
+ACTION:DISPLAY
+DESCRIPTION:Reminder
+TRIGGER:-PT15M
+END:VALARM
+END:VEVENT
+BEGIN:VEVENT
+UID:exam-1@university
+DTSTART:20260202T090000Z
+DURATION:PT1H30M
+SUMMARY:Exam with a title long enough to be folded over several lines
+  of the file
+END:VEVENT
+BEGIN:VEVENT
+UID:broken@university
+DTSTART:20260203T120000
+DTEND:20260203T110000
+SUMMARY:Ends before it starts
+END:VEVENT
+BEGIN:VEVENT
+UID:holiday@university
+DTSTART;VALUE=DATE:20251224
+SUMMARY:Holiday
+END:VEVENT
+END:VCALENDAR
+'''.replace('\n', '\r\n')
+
+
+def create_user(**params):
+    """Create and return a sample user"""
+    defaults = {
+        'email': 'user@example.com',
+        'password': 'testpass123',
+        'name': 'Test User',
+    }
+    defaults.update(params)
+    return get_user_model().objects.create_user(**defaults)
+
+
+def create_event(user, **params):
+    """Create and return a sample event"""
+    defaults = {
+        'title': 'Lecture',
+        'date': date(2025, 6, 2),
+        'start_time': time(9, 0),
+        'end_time': time(10, 30),
+        'event_type': 'study',
+    }
+    defaults.update(params)
+    return Event.objects.create(owner=user, **defaults)
+
+
+def upload(content):
+    """Return an uploaded .ics file"""
+    return SimpleUploadedFile(
+        'calendar.ics', content.encode('utf-8'), 'text/calendar'
+    )
+
+
+class ICalExportTests(TestCase):
+    """Test exporting events"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+
+    def export(self):
+        res = self.client.get(EXPORT_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        return b''.join(res.streaming_content).decode('utf-8')
+
+    def test_export_events(self):
+        """Test single, recurring and changed events are exported"""
+        single = create_event(
+            self.user, title='Late shift', description='A, B; C\nD',
+            start_time=time(23, 0), end_time=time(1, 0),
+        )
+        weekly = create_event(
+            self.user, recurrence='weekly', recurrence_days=[0, 3],
+            recurrence_until=date(2025, 7, 31),
+            recurrence_exceptions=['2025-06-05'],
+        )
+        create_event(
+            self.user, recurrence_parent=weekly,
+            original_date=date(2025, 6, 9), date=date(2025, 6, 10),
+        )
+        create_event(create_user(email='other@example.com'))
+
+        content = self.export()
+
+        self.assertTrue(content.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(content.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(content.count('BEGIN:VEVENT'), 3)
+        self.assertIn(f'UID:event-{single.id}@fokuso\r\n', content)
+        self.assertIn('DTEND:20250603T010000\r\n', content)
+        self.assertIn('DESCRIPTION:A\\, B\\; C\\nD\r\n', content)
+        self.assertIn(
+            'RRULE:FREQ=WEEKLY;BYDAY=MO,TH;UNTIL=20250731T235959\r\n',
+            content,
+        )
+        self.assertIn('EXDATE:20250605T090000\r\n', content)
+        self.assertEqual(
+            content.count(f'UID:event-{weekly.id}@fokuso\r\n'), 2
+        )
+        self.assertIn('RECURRENCE-ID:20250609T090000\r\n', content)
+
+    def test_fold_long_lines(self):
+        """Test lines are folded at 75 octets, not inside characters"""
+        folded = fold('SUMMARY:' + 'ż' * 60)
+        lines = folded.split('\r\n')[:-1]
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        self.assertEqual(
+            ''.join(line[1:] if i else line for i, line in
+                    enumerate(lines)),
+            'SUMMARY:' + 'ż' * 60,
+        )
+
+    def test_export_round_trip(self):
+        """Test exported events import as the same events"""
+        create_event(self.user, title='Focus; deep', event_type='focus')
+        create_event(
+            self.user, recurrence='daily', recurrence_interval=2,
+            recurrence_count=5,
+        )
+        content = self.export()
+
+        other = create_user(email='other@example.com')
+        self.client.force_authenticate(user=other)
+        res = self.client.post(
+            IMPORT_URL, {'file': upload(content)}, format='multipart'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        fields = [
+            'title', 'date', 'start_time', 'end_time', 'event_type',
+            'recurrence', 'recurrence_interval', 'recurrence_count',
+        ]
+        self.assertEqual(
+            list(Event.objects.filter(owner=other).values(*fields)),
+            list(Event.objects.filter(owner=self.user).values(*fields)),
+        )
+
+
+class ICalImportTests(TestCase):
+    """Test importing events"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+
+    def test_import_timetable(self):
+        """Test valid events are created and invalid ones reported"""
+        res = self.client.post(
+            IMPORT_URL, {'file': upload(TIMETABLE)}, format='multipart'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(
+            [error['uid'] for error in res.data['errors']],
+            ['broken@university', 'holiday@university'],
+        )
+
+        lecture, exam = Event.objects.filter(owner=self.user)
+        self.assertEqual(lecture.title, 'Linear algebra, lecture')
+        self.assertEqual(lecture.description, 'Room 101\nBring notes')
+        self.assertEqual(lecture.event_type, 'study')
+        self.assertEqual(lecture.date, date(2025, 10, 6))
+        self.assertEqual(lecture.start_time, time(8, 15))
+        self.assertEqual(lecture.end_time, time(10, 0))
+        self.assertEqual(lecture.recurrence, 'weekly')
+        self.assertEqual(lecture.recurrence_days, [0, 3])
+        self.assertEqual(lecture.recurrence_until, date(2026, 1, 30))
+        self.assertEqual(lecture.recurrence_exceptions, ['2025-11-03'])
+        self.assertEqual(
+            exam.title,
+            'Exam with a title long enough to be folded over several '
+            'lines of the file',
+        )
+        self.assertEqual(exam.event_type, 'other')
+        self.assertEqual(exam.end_time, time(10, 30))
+
+    def test_import_in_chunks(self):
+        """Test events are written with one insert per chunk"""
+        content = 'BEGIN:VCALENDAR\r\n' + ''.join(
+            'BEGIN:VEVENT\r\n'
+            f'DTSTART:202506{day:02d}T090000\r\n'
+            f'DTEND:202506{day:02d}T100000\r\n'
+            f'SUMMARY:Event {day}\r\n'
+            'END:VEVENT\r\n'
+            for day in range(1, 6)
+        ) + 'END:VCALENDAR\r\n'
+        request = APIRequestFactory().post(IMPORT_URL)
+        request.user = self.user
+
+        with self.assertNumQueries(3):
+            created, errors = import_events(
+                content.splitlines(True), {'request': request}, chunk_size=2
+            )
+
+        self.assertEqual((created, errors), (5, []))
+        self.assertEqual(Event.objects.filter(owner=self.user).count(), 5)
+
+    def test_malformed_file_creates_nothing(self):
+        """Test a malformed file is rejected as a whole"""
+        content = TIMETABLE.replace(
+            'SUMMARY:Holiday', 'SUMMARY Holiday without a colon'
+        )
+        res = self.client.post(
+            IMPORT_URL, {'file': upload(content)}, format='multipart'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Event.objects.exists())
+
+    def test_file_required(self):
+        """Test a file must be uploaded"""
+        res = self.client.post(IMPORT_URL, {}, format='multipart')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,168 @@
+"""
+Tests for planning todos into free time.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from calendars.planning import schedule
+from core.models import Event, Todo
+
+
+PLAN_URL = reverse('calendars:plan-todos')
+
+
+def at(day, hour, minute=0):
+    """Return a datetime on a day"""
+    return datetime.combine(day, time(hour, minute))
+
+
+def create_user(**params):
+    """Create and return a sample user"""
+    defaults = {
+        'email': 'user@example.com',
+        'password': 'testpass123',
+        'name': 'Test User',
+    }
+    defaults.update(params)
+    return get_user_model().objects.create_user(**defaults)
+
+
+def create_todo(user, **params):
+    """Create and return a sample todo"""
+    defaults = {
+        'title': 'Write report',
+        'estimated_minutes': 60,
+    }
+    defaults.update(params)
+    return Todo.objects.create(owner=user, **defaults)
+
+
+class ScheduleTests(SimpleTestCase):
+    """Test the greedy scheduling of todos"""
+
+    day = date(2025, 6, 2)
+
+    def test_most_urgent_first(self):
+        """Test todos are placed by due date, then priority"""
+        later = Todo(id=1, estimated_minutes=60, due_date=self.day
+                     + timedelta(days=3), priority='high')
+        low = Todo(id=2, estimated_minutes=60, due_date=self.day,
+                   priority='low')
+        high = Todo(id=3, estimated_minutes=30, due_date=self.day,
+                    priority='high')
+
+        placed, unplaced = schedule(
+            [later, low, high],
+            [(at(self.day, 9), at(self.day, 12))],
+            self.day,
+        )
+
+        self.assertEqual(placed, [
+            (high, at(self.day, 9), at(self.day, 9, 30)),
+            (low, at(self.day, 9, 30), at(self.day, 10, 30)),
+            (later, at(self.day, 10, 30), at(self.day, 11, 30)),
+        ])
+        self.assertEqual(unplaced, [])
+
+    def test_long_todo_waits_for_a_larger_gap(self):
+        """Test a smaller todo fills a gap a more urgent one skips"""
+        long = Todo(id=1, estimated_minutes=120, priority='high')
+        short = Todo(id=2, estimated_minutes=30, priority='low')
+        gaps = [
+            (at(self.day, 9), at(self.day, 10)),
+            (at(self.day, 13), at(self.day, 17)),
+        ]
+
+        placed, unplaced = schedule([long, short], gaps, self.day)
+
+        self.assertEqual(placed, [
+            (short, at(self.day, 9), at(self.day, 9, 30)),
+            (long, at(self.day, 13), at(self.day, 15)),
+        ])
+
+    def test_deadline_and_overdue(self):
+        """Test todos are not placed after their due date"""
+        due = Todo(id=1, estimated_minutes=60, due_date=self.day)
+        overdue = Todo(id=2, estimated_minutes=60,
+                       due_date=self.day - timedelta(days=5))
+        gaps = [(at(self.day + timedelta(days=1), 9),
+                 at(self.day + timedelta(days=1), 17))]
+
+        placed, unplaced = schedule([due, overdue], gaps, self.day)
+
+        self.assertEqual([todo for todo, _, _ in placed], [overdue])
+        self.assertEqual(unplaced, [due])
+
+
+class PlanTodosTests(TestCase):
+    """Test the planning endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+        self.day = date.today() + timedelta(days=7)
+        self.options = {
+            'start_date': self.day.isoformat(),
+            'end_date': self.day.isoformat(),
+            'day_start': '09:00',
+            'day_end': '12:00',
+        }
+
+    def test_propose_around_events(self):
+        """Test todos are proposed in free time without saving"""
+        Event.objects.create(
+            owner=self.user, title='Standup', date=self.day,
+            start_time=time(9, 0), end_time=time(10, 0),
+        )
+        todo = create_todo(self.user, due_date=self.day)
+        too_long = create_todo(self.user, estimated_minutes=240)
+        create_todo(self.user, completed=True)
+        create_todo(self.user, estimated_minutes=None)
+
+        res = self.client.post(PLAN_URL, self.options, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['events']), 1)
+        proposed = res.data['events'][0]
+        self.assertIsNone(proposed['id'])
+        self.assertEqual(proposed['todo'], todo.id)
+        self.assertEqual(proposed['time'], '10:00')
+        self.assertEqual(proposed['endTime'], '11:00')
+        self.assertEqual(res.data['unscheduled'], [too_long.id])
+        self.assertEqual(Event.objects.count(), 1)
+
+    def test_create_in_one_query(self):
+        """Test planned events are saved together, and not planned twice"""
+        create_todo(self.user)
+        create_todo(self.user, title='Read paper', estimated_minutes=45)
+
+        # Todos, events, recurring events and one insert
+        with self.assertNumQueries(4):
+            res = self.client.post(
+                PLAN_URL, {**self.options, 'create': True}, format='json'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            Event.objects.filter(owner=self.user, todo__isnull=False)
+            .count(),
+            2,
+        )
+
+        res = self.client.post(PLAN_URL, self.options, format='json')
+
+        self.assertEqual(res.data, {'events': [], 'unscheduled': []})
+
+    def test_invalid_hours(self):
+        """Test day_start must be before day_end"""
+        res = self.client.post(
+            PLAN_URL, {'day_start': '17:00', 'day_end': '09:00'},
+            format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,266 @@
+"""
+Tests for recurring events.
+"""
+from datetime import date, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from calendars.recurrence import occurrence_dates
+from core.models import Event
+
+
+EVENTS_URL = reverse('calendars:event-list-create')
+GROUPED_EVENTS_URL = reverse('calendars:events-grouped')
+TODAY_EVENTS_URL = reverse('calendars:today-events')
+
+
+def create_user(**params):
+    """Create and return a sample user"""
+    defaults = {
+        'email': 'user@example.com',
+        'password': 'testpass123',
+        'name': 'Test User',
+    }
+    defaults.update(params)
+    return get_user_model().objects.create_user(**defaults)
+
+
+def create_event(user, **params):
+    """Create and return a sample event"""
+    defaults = {
+        'title': 'Study block',
+        'date': date(2025, 6, 2),  # A Monday
+        'start_time': time(9, 0),
+        'end_time': time(10, 0),
+        'event_type': 'study',
+    }
+    defaults.update(params)
+    return Event.objects.create(owner=user, **defaults)
+
+
+class OccurrenceDatesTests(TestCase):
+    """Test expanding recurrence rules"""
+
+    def rule(self, **params):
+        """Return an unsaved recurring event"""
+        defaults = {
+            'date': date(2025, 6, 2),
+            'start_time': time(9, 0),
+            'end_time': time(10, 0),
+            'recurrence': 'daily',
+        }
+        defaults.update(params)
+        return Event(**defaults)
+
+    def test_daily_with_interval(self):
+        """Test every other day inside the window"""
+        event = self.rule(recurrence_interval=2)
+
+        days = list(occurrence_dates(
+            event, date(2025, 6, 5), date(2025, 6, 10)
+        ))
+
+        self.assertEqual(
+            days, [date(2025, 6, 6), date(2025, 6, 8), date(2025, 6, 10)]
+        )
+
+    def test_weekly_on_weekdays_with_count(self):
+        """Test a count is over all occurrences, not those in the window"""
+        # Wednesday start, so Monday of the first week is not included
+        event = self.rule(
+            date=date(2025, 6, 4),
+            recurrence='weekly',
+            recurrence_days=[0, 2, 4],
+            recurrence_count=5,
+        )
+
+        days = list(occurrence_dates(
+            event, date(2025, 6, 9), date(2025, 12, 31)
+        ))
+
+        # 4th and 6th were the first two
+        self.assertEqual(days, [
+            date(2025, 6, 9), date(2025, 6, 11), date(2025, 6, 13),
+        ])
+
+    def test_monthly_skips_short_months(self):
+        """Test the 31st only occurs in months that have one"""
+        event = self.rule(date=date(2025, 1, 31), recurrence='monthly')
+
+        days = list(occurrence_dates(
+            event, date(2025, 1, 1), date(2025, 6, 30)
+        ))
+
+        self.assertEqual(days, [
+            date(2025, 1, 31), date(2025, 3, 31), date(2025, 5, 31),
+        ])
+
+    def test_until_and_exceptions(self):
+        """Test occurrences stop at until and skip exception dates"""
+        event = self.rule(
+            recurrence_until=date(2025, 6, 5),
+            recurrence_exceptions=['2025-06-03'],
+        )
+
+        days = list(occurrence_dates(
+            event, date(2025, 6, 1), date(2025, 6, 30)
+        ))
+
+        self.assertEqual(days, [
+            date(2025, 6, 2), date(2025, 6, 4), date(2025, 6, 5),
+        ])
+
+    def test_skipping_ahead_matches_expanding_from_start(self):
+        """Test a late window gives the occurrences of a full expansion"""
+        for rule in [
+            self.rule(recurrence_interval=3, recurrence_count=200),
+            self.rule(
+                recurrence='weekly',
+                recurrence_interval=2,
+                recurrence_days=[1, 3, 6],
+                recurrence_count=100,
+            ),
+        ]:
+            start, end = date(2025, 9, 1), date(2026, 3, 1)
+            everything = list(occurrence_dates(rule, rule.date, end))
+
+            self.assertEqual(
+                list(occurrence_dates(rule, start, end)),
+                [day for day in everything if day >= start],
+            )
+
+
+class RecurringEventApiTests(TestCase):
+    """Test recurring events in the calendar endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+
+    def test_create_weekly_event(self):
+        """Test creating a weekly event stores one row"""
+        payload = {
+            'title': 'Semester study block',
+            'date': '2025-06-02',
+            'start_time': '09:00',
+            'end_time': '10:00',
+            'recurrence': 'weekly',
+            'recurrence_days': [0, 3],
+            'recurrence_until': '2025-12-19',
+        }
+
+        res = self.client.post(EVENTS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Event.objects.count(), 1)
+        self.assertEqual(res.data['recurrence_days'], [0, 3])
+
+    def test_invalid_recurrence_rejected(self):
+        """Test invalid rules are rejected"""
+        base = {
+            'title': 'Study',
+            'date': '2025-06-02',
+            'start_time': '09:00',
+            'end_time': '10:00',
+        }
+        for rule in [
+            {'recurrence': 'daily', 'recurrence_interval': 0},
+            {'recurrence': 'daily', 'recurrence_days': [1]},
+            {'recurrence': 'weekly', 'recurrence_days': [7]},
+            {'recurrence': 'weekly', 'recurrence_until': '2025-06-01'},
+            {'recurrence': 'weekly', 'recurrence_exceptions': ['June 9']},
+            {'original_date': '2025-06-09'},
+        ]:
+            res = self.client.post(EVENTS_URL, {**base, **rule},
+                                   format='json')
+
+            self.assertEqual(
+                res.status_code, status.HTTP_400_BAD_REQUEST, rule
+            )
+
+    def test_list_expands_occurrences_in_range(self):
+        """Test occurrences are listed inside the requested range"""
+        weekly = create_event(self.user, recurrence='weekly')
+        single = create_event(
+            self.user, title='One-off', date=date(2025, 6, 10)
+        )
+
+        res = self.client.get(EVENTS_URL, {
+            'start_date': '2025-06-08',
+            'end_date': '2025-06-22',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(e['id'], e['date']) for e in res.data],
+            [
+                (weekly.id, '2025-06-09'),
+                (single.id, '2025-06-10'),
+                (weekly.id, '2025-06-16'),
+            ],
+        )
+        self.assertEqual(res.data[0]['recurringEventId'], weekly.id)
+        self.assertIsNone(res.data[1]['recurringEventId'])
+
+    def test_override_replaces_occurrence(self):
+        """Test a moved occurrence is listed on its new date only"""
+        weekly = create_event(
+            self.user,
+            recurrence='weekly',
+            recurrence_exceptions=['2025-06-16'],
+        )
+        res = self.client.post(EVENTS_URL, {
+            'title': 'Moved study block',
+            'date': '2025-06-10',
+            'start_time': '14:00',
+            'end_time': '15:00',
+            'recurrence_parent': weekly.id,
+            'original_date': '2025-06-09',
+        }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res = self.client.get(GROUPED_EVENTS_URL, {
+            'start_date': '2025-06-08',
+            'end_date': '2025-06-22',
+        })
+
+        self.assertEqual(sorted(res.data), ['2025-06-10'])
+        moved = res.data['2025-06-10'][0]
+        self.assertEqual(moved['title'], 'Moved study block')
+        self.assertEqual(moved['recurringEventId'], weekly.id)
+
+    def test_override_of_other_users_event_rejected(self):
+        """Test overrides must belong to one of the user's events"""
+        other = create_event(
+            create_user(email='other@example.com'), recurrence='daily'
+        )
+
+        res = self.client.post(EVENTS_URL, {
+            'title': 'Mine now',
+            'date': '2025-06-03',
+            'start_time': '09:00',
+            'end_time': '10:00',
+            'recurrence_parent': other.id,
+            'original_date': '2025-06-03',
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_today_includes_occurrence(self):
+        """Test today's events include occurrences of recurring events"""
+        daily = create_event(
+            self.user,
+            date=date.today() - timedelta(days=30),
+            recurrence='daily',
+        )
+
+        res = self.client.get(TODAY_EVENTS_URL)
+
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['id'], daily.id)
+        self.assertEqual(res.data[0]['date'], date.today().isoformat())
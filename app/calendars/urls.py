@@ -7,6 +7,14 @@ from calendars.views import (
     EventDetailView,
     EventsGroupedByDateView,
     TodayEventsView,
+    ConflictingEventsView,
+    PlannedMinutesView,
+    EventAutocompleteView,
+    FreeBusyView,
+    PlanTodosView,
+    EventExportView,
+    EventImportView,
+    BulkEventView,
 )
 
 app_name = 'calendars'
@@ -27,4 +35,44 @@ urlpatterns = [
         TodayEventsView.as_view(),
         name='today-events'
     ),
+    path(
+        'events/conflicts/',
+        ConflictingEventsView.as_view(),
+        name='event-conflicts'
+    ),
+    path(
+        'events/planned-minutes/',
+        PlannedMinutesView.as_view(),
+        name='planned-minutes'
+    ),
+    path(
+        'events/autocomplete/',
+        EventAutocompleteView.as_view(),
+        name='event-autocomplete'
+    ),
+    path(
+        'events/free-busy/',
+        FreeBusyView.as_view(),
+        name='free-busy'
+    ),
+    path(
+        'events/plan/',
+        PlanTodosView.as_view(),
+        name='plan-todos'
+    ),
+    path(
+        'events/export/',
+        EventExportView.as_view(),
+        name='event-export'
+    ),
+    path(
+        'events/import/',
+        EventImportView.as_view(),
+        name='event-import'
+    ),
+    path(
+        'events/bulk/',
+        BulkEventView.as_view(),
+        name='event-bulk'
+    ),
 ]
@@ -1,77 +1,181 @@
 """
 Views for the calendars app.
 """
+from collections import Counter
+import copy
+
 from rest_framework import generics, status
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Q
-from datetime import datetime, date
-from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, F, Func, Sum, Value
+from django.http import StreamingHttpResponse
+from django.db.models.functions import TruncDate, TruncWeek
+from datetime import datetime, date, timedelta
+from django.utils import timezone
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 
 from core.models import Event
+from calendars.conditional import conditional, record_deletions
+from calendars.freebusy import free_busy
+from calendars.ical import ICalError, export, import_events
+from calendars.overlaps import conflict_map, unsaved_conflicts
+from calendars.planning import plan
+from calendars.search import rank, search, title_suggestions
+from calendars.recurrence import (
+    expand,
+    occurrences,
+    single_events,
+    window,
+)
 from calendars.serializers import (
     EventSerializer,
     EventCreateSerializer,
+    BulkEventSerializer,
+    EventImportSerializer,
     EventListSerializer,
+    PlanSerializer,
 )
 
 
+def to_char(field, pattern):
+    """Format a date or time column in SQL"""
+    return Func(
+        F(field), Value(pattern), function='to_char', output_field=CharField()
+    )
+
+
+def date_range(params, default_start, default_days, max_days):
+    """Parse start_date and end_date query parameters.
+
+    end_date defaults to default_days after start_date. Raises ParseError
+    for malformed dates and ranges longer than max_days.
+    """
+    try:
+        start_date = default_start
+        if params.get('start_date'):
+            start_date = datetime.strptime(
+                params['start_date'], '%Y-%m-%d'
+            ).date()
+        end_date = start_date + timedelta(days=default_days)
+        if params.get('end_date'):
+            end_date = datetime.strptime(
+                params['end_date'], '%Y-%m-%d'
+            ).date()
+    except ValueError:
+        raise ParseError('Dates must be in YYYY-MM-DD format.')
+    if start_date > end_date:
+        raise ParseError('start_date must not be after end_date.')
+    if (end_date - start_date).days >= max_days:
+        raise ParseError(f'Range must be at most {max_days} days.')
+    return start_date, end_date
+
+
+def free_time_options(params):
+    """Parse min_gap, day_start and day_end query parameters.
+
+    Returns the minimum gap as a timedelta and the daily hours as a pair
+    of times, the second None for midnight, or None when neither
+    day_start nor day_end is given.
+    """
+    try:
+        min_gap = int(params.get('min_gap') or 0)
+    except ValueError:
+        raise ParseError('min_gap must be a number of minutes.')
+    if min_gap < 0:
+        raise ParseError('min_gap must not be negative.')
+
+    hours = None
+    if params.get('day_start') or params.get('day_end'):
+        try:
+            day_start = datetime.strptime(
+                params.get('day_start') or '00:00', '%H:%M'
+            ).time()
+            day_end = None
+            if params.get('day_end'):
+                day_end = datetime.strptime(
+                    params['day_end'], '%H:%M'
+                ).time()
+        except ValueError:
+            raise ParseError('Times must be in HH:MM format.')
+        if day_end is not None and day_start >= day_end:
+            raise ParseError('day_start must be before day_end.')
+        hours = (day_start, day_end)
+    return timedelta(minutes=min_gap), hours
+
+
 class EventListCreateView(generics.ListCreateAPIView):
     """List and create events for authenticated user"""
     permission_classes = [IsAuthenticated]
     authentication_classes = [TokenAuthentication]
 
-    def get_queryset(self):
-        """Get events for authenticated user with optional filtering"""
-        queryset = Event.objects.filter(owner=self.request.user)
-
-        # Filter by date range
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
+    def get_date_range(self, request):
+        """Return the start and end dates to list, either may be None"""
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
 
         if start_date:
             try:
                 start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(date__gte=start_date)
             except ValueError:
-                pass
+                start_date = None
 
         if end_date:
             try:
                 end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(date__lte=end_date)
             except ValueError:
-                pass
+                end_date = None
 
         # Filter by specific date
-        event_date = self.request.query_params.get('date')
+        event_date = request.query_params.get('date')
         if event_date:
             try:
                 event_date = datetime.strptime(
                     event_date, '%Y-%m-%d'
                 ).date()
-                queryset = queryset.filter(date=event_date)
+                start_date = max(start_date or event_date, event_date)
+                end_date = min(end_date or event_date, event_date)
             except ValueError:
                 pass
 
+        return start_date or None, end_date or None
+
+    def get_queryset(self):
+        """Get events for authenticated user with optional filtering.
+
+        Recurring events are expanded into their occurrences in the
+        requested date range, so this returns a list. With search it is
+        ordered by relevance, then by date.
+        """
+        queryset = Event.objects.with_duration().filter(
+            owner=self.request.user
+        )
+
         # Filter by event type
         event_type = self.request.query_params.get('type')
         if event_type:
             queryset = queryset.filter(event_type=event_type)
 
-        # Search in title and description
-        search = self.request.query_params.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search)
-            )
+        # Search in title and description, best matches first
+        text = self.request.query_params.get('search')
+        if text:
+            queryset = search(queryset, text)
+
+        events = expand(queryset, *self.get_date_range(self.request))
+        if text:
+            rank(events)
+        return events
 
-        return queryset.order_by('date', 'start_time')
+    @conditional
+    def get(self, request, *args, **kwargs):
+        """List events, or 304 when they did not change"""
+        return super().get(request, *args, **kwargs)
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -104,7 +208,225 @@ class EventDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         """Get events for authenticated user"""
-        return Event.objects.filter(owner=self.request.user)
+        return Event.objects.with_duration().filter(owner=self.request.user)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        record_deletions(self.request.user)
+
+
+@extend_schema(
+    summary="Create, update and delete events in bulk",
+    description=(
+        "Apply lists of creates, partial updates (each with the event id) "
+        "and deletes together. Every item is validated as by the single "
+        "event endpoints; if any is invalid nothing is applied and the "
+        "errors are returned by position."
+    ),
+    request=BulkEventSerializer,
+    responses={200: OpenApiTypes.OBJECT}
+)
+class BulkEventView(APIView):
+    """Apply many event changes in one transaction"""
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+    max_operations = 500
+
+    def post(self, request):
+        """Create, update and delete events of the authenticated user"""
+        serializer = BulkEventSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        creates, updates, deletes = (
+            serializer.validated_data[name]
+            for name in ['create', 'update', 'delete']
+        )
+        if len(creates) + len(updates) + len(deletes) > self.max_operations:
+            return Response(
+                {'detail': f'Send at most {self.max_operations} changes.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Conflicts are checked for the batch as a whole below
+        context = {'request': request, 'batch': True}
+        update_ids = [item.get('id') for item in updates]
+        repeated = {
+            id for id, count in Counter(update_ids).items() if count > 1
+        }
+        events = Event.objects.filter(owner=request.user).in_bulk(
+            [id for id in update_ids + deletes if isinstance(id, int)]
+        )
+
+        create_serializer = EventCreateSerializer(
+            data=creates, many=True, context=context
+        )
+        create_serializer.is_valid()
+        errors = {}
+        if any(create_serializer.errors):
+            errors['create'] = create_serializer.errors
+
+        update_errors, changes = [], []
+        for item, event_id in zip(updates, update_ids):
+            event = events.get(event_id)
+            if event is None or event_id in deletes \
+                    or event_id in repeated:
+                update_errors.append({'id': [
+                    'Must be one of your events, updated once and not '
+                    'deleted.'
+                ]})
+                continue
+            data = {name: value for name, value in item.items()
+                    if name != 'id'}
+            event_serializer = EventSerializer(
+                event, data=data, partial=True, context=context
+            )
+            if event_serializer.is_valid():
+                update_errors.append({})
+                changes.append((event, event_serializer.validated_data))
+            else:
+                update_errors.append(event_serializer.errors)
+        if any(update_errors):
+            errors['update'] = update_errors
+
+        delete_errors = [
+            {} if event_id in events else {'id': ['Not found.']}
+            for event_id in deletes
+        ]
+        if any(delete_errors):
+            errors['delete'] = delete_errors
+        if settings.EVENTS_REJECT_CONFLICTS and not errors:
+            errors = self.conflict_errors(
+                request.user, create_serializer.validated_data, changes,
+                deletes,
+            )
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            created = Event.objects.bulk_create([
+                Event(owner=request.user, **data)
+                for data in create_serializer.validated_data
+            ])
+
+            # bulk_update does not set auto_now fields
+            now = timezone.now()
+            fields = {'updated_at'}
+            for event, data in changes:
+                for name, value in data.items():
+                    setattr(event, name, value)
+                fields.update(data)
+                event.updated_at = now
+                # Postgres regenerates the column
+                event.__dict__.pop('duration_minutes', None)
+            updated = [event for event, _ in changes]
+            Event.objects.bulk_update(updated, sorted(fields))
+
+            deleted = 0
+            if deletes:
+                Event.objects.filter(
+                    owner=request.user, id__in=deletes
+                ).delete()
+                deleted = len(set(deletes))
+                record_deletions(request.user, deleted)
+
+        return Response({
+            'created': EventListSerializer(created, many=True).data,
+            'updated': EventListSerializer(updated, many=True).data,
+            'deleted': deleted,
+        }, status=status.HTTP_200_OK)
+
+    def conflict_errors(self, user, creates, changes, deletes):
+        """Return errors of changes overlapping the events after the batch.
+
+        Creates and updates are compared with each other and with the
+        stored events the batch neither updates nor deletes.
+        """
+        items = [('create', position) for position in range(len(creates))]
+        events = [Event(owner=user, **data) for data in creates]
+        for position, (event, data) in enumerate(changes):
+            event = copy.copy(event)
+            for name, value in data.items():
+                setattr(event, name, value)
+            items.append(('update', position))
+            events.append(event)
+        others = Event.objects.filter(owner=user).exclude(
+            id__in=[event.id for event, _ in changes] + deletes
+        )
+
+        errors = {}
+        for (kind, position), (ids, positions) in zip(
+            items, unsaved_conflicts(events, others)
+        ):
+            messages = []
+            if ids:
+                messages.append(
+                    "Event overlaps other events: "
+                    f"{', '.join(str(id) for id in ids)}."
+                )
+            if positions:
+                messages.append('Overlaps {} of this request.'.format(
+                    ', '.join(
+                        '{} {}'.format(*items[index]) for index in positions
+                    )
+                ))
+            if messages:
+                size = len(creates) if kind == 'create' else len(changes)
+                errors.setdefault(kind, [{} for _ in range(size)])[
+                    position
+                ] = {'non_field_errors': messages}
+        return errors
+
+
+@extend_schema(
+    summary="Autocomplete event titles",
+    description=(
+        "Return the distinct titles of events containing q, "
+        "most similar first"
+    ),
+    parameters=[
+        OpenApiParameter(
+            name='q',
+            type=OpenApiTypes.STR,
+            required=True,
+            description='Text to complete'
+        ),
+        OpenApiParameter(
+            name='limit',
+            type=OpenApiTypes.INT,
+            description='Number of titles, at most 50 (default 10)'
+        ),
+    ],
+    responses={200: OpenApiTypes.OBJECT}
+)
+class EventAutocompleteView(APIView):
+    """Return matching event titles only, for search suggestions"""
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request):
+        """Get title suggestions for the authenticated user"""
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response(
+                {'q': ['This parameter is required.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = int(
+                request.query_params.get('limit', self.default_limit)
+            )
+        except ValueError:
+            return Response(
+                {'limit': ['A valid integer is required.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, self.max_limit))
+
+        titles = title_suggestions(
+            Event.objects.filter(owner=request.user), text, limit
+        )
+        return Response(titles, status=status.HTTP_200_OK)
 
 
 @extend_schema(
@@ -142,50 +464,420 @@ class EventsGroupedByDateView(APIView):
     permission_classes = [IsAuthenticated]
     authentication_classes = [TokenAuthentication]
 
-    def get(self, request):
-        """Get events grouped by date for the authenticated user"""
-        queryset = Event.objects.filter(owner=request.user)
-
-        # Filter by date range if provided
+    def get_date_range(self, request):
+        """Return the start and end dates to list, either may be None"""
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
 
         if start_date:
             try:
                 start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(date__gte=start_date)
             except ValueError:
-                pass
+                start_date = None
 
         if end_date:
             try:
                 end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(date__lte=end_date)
             except ValueError:
-                pass
+                end_date = None
+
+        return start_date or None, end_date or None
+
+    @conditional
+    def get(self, request):
+        """Get events grouped by date for the authenticated user"""
+        queryset = Event.objects.with_duration().filter(owner=request.user)
+        start_date, end_date = self.get_date_range(request)
 
         # Filter by event type
         event_type = request.query_params.get('type')
         if event_type:
             queryset = queryset.filter(event_type=event_type)
 
-        events = queryset.order_by('date', 'start_time')
+        # Plain tuples with the strings and duration computed in SQL,
+        # this backs the month view and may cover thousands of events
+        rows = list(single_events(
+            queryset, start_date, end_date
+        ).annotate(
+            day=to_char('date', 'YYYY-MM-DD'),
+            start=to_char('start_time', 'HH24:MI'),
+            end=to_char('end_time', 'HH24:MI'),
+        ).order_by('date', 'start_time', 'id').values_list(
+            'day', 'start', 'id', 'title', 'end', 'event_type',
+            'duration_minutes',
+            'recurrence_parent_id',
+        ))
+
+        # Recurring events are expanded inside the range
+        recurring = [
+            (day.isoformat(), master.time, master.id, master.title,
+             master.end_time_formatted, master.event_type, master.duration,
+             master.id)
+            for master, day in occurrences(
+                queryset, *window(start_date, end_date)
+            )
+        ]
+        if recurring:
+            rows.extend(recurring)
+            rows.sort(key=lambda row: row[:3])
+
+        # Rows are sorted by day, so group in a single pass
+        grouped_events = {}
+        current_day = None
+        for (day, start, event_id, title, end, event_type, minutes,
+             recurring_event_id) in rows:
+            if day != current_day:
+                current_day = day
+                day_events = grouped_events[day] = []
+            day_events.append({
+                'id': event_id,
+                'title': title,
+                'time': start,
+                'endTime': end,
+                'type': event_type,
+                'duration': minutes,
+                'recurringEventId': recurring_event_id,
+            })
 
-        # Group events by date
-        grouped_events = defaultdict(list)
+        return Response(grouped_events, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    summary="Get conflicting events",
+    description=(
+        "Return the events that overlap another event in a date range, "
+        "each with the ids of the events it overlaps in conflictsWith"
+    ),
+    parameters=[
+        OpenApiParameter(
+            name='start_date',
+            type=OpenApiTypes.DATE,
+            description='First day to check (YYYY-MM-DD), default today'
+        ),
+        OpenApiParameter(
+            name='end_date',
+            type=OpenApiTypes.DATE,
+            description=(
+                'Last day to check (YYYY-MM-DD), default 30 days after '
+                'start_date'
+            )
+        ),
+    ],
+    responses={200: OpenApiTypes.OBJECT}
+)
+class ConflictingEventsView(APIView):
+    """Return overlapping events, found by an indexed query"""
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+    max_days = 366
+
+    def get(self, request):
+        """Get conflicting events for the authenticated user"""
+        start_date, end_date = date_range(
+            request.query_params, date.today(), 30, self.max_days
+        )
+
+        data = []
+        for event, conflicts in conflict_map(
+            request.user, start_date, end_date
+        ):
+            event_data = EventListSerializer(event).data
+            event_data['conflictsWith'] = conflicts
+            data.append(event_data)
+        return Response(data, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    summary="Get free and busy times",
+    description=(
+        "Return the merged busy intervals of a date range and the free "
+        "gaps between them"
+    ),
+    parameters=[
+        OpenApiParameter(
+            name='start_date',
+            type=OpenApiTypes.DATE,
+            description='First day (YYYY-MM-DD), default today'
+        ),
+        OpenApiParameter(
+            name='end_date',
+            type=OpenApiTypes.DATE,
+            description='Last day (YYYY-MM-DD), default 6 days after start'
+        ),
+        OpenApiParameter(
+            name='min_gap',
+            type=OpenApiTypes.INT,
+            description='Leave out free gaps shorter than this, in minutes'
+        ),
+        OpenApiParameter(
+            name='day_start',
+            type=OpenApiTypes.STR,
+            description='Only free time after this time of day (HH:MM)'
+        ),
+        OpenApiParameter(
+            name='day_end',
+            type=OpenApiTypes.STR,
+            description='Only free time before this time of day (HH:MM)'
+        ),
+    ],
+    responses={200: OpenApiTypes.OBJECT}
+)
+class FreeBusyView(APIView):
+    """Busy intervals and free gaps, merged in one sweep over events"""
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+    max_days = 366
+
+    def get(self, request):
+        """Get free and busy times of the authenticated user"""
+        start_date, end_date = date_range(
+            request.query_params, date.today(), 6, self.max_days
+        )
+        min_gap, hours = free_time_options(request.query_params)
+
+        busy, free = free_busy(
+            request.user, start_date, end_date, min_gap, hours
+        )
+        return Response({
+            'startDate': start_date,
+            'endDate': end_date,
+            'busy': [{'start': start, 'end': end} for start, end in busy],
+            'free': [
+                {
+                    'start': start,
+                    'end': end,
+                    'minutes': int((end - start).total_seconds()) // 60,
+                }
+                for start, end in free
+            ],
+        }, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    summary="Plan todos into free time",
+    description=(
+        "Propose focus events for open todos with an estimate, placed in "
+        "free time by due date and priority. With create the events are "
+        "saved."
+    ),
+    request=PlanSerializer,
+    responses={200: OpenApiTypes.OBJECT, 201: OpenApiTypes.OBJECT}
+)
+class PlanTodosView(APIView):
+    """Schedule open todos into the free gaps of the calendar"""
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+
+    def post(self, request):
+        """Propose, and optionally create, events for todos"""
+        serializer = PlanSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        options = serializer.validated_data
+
+        # Not in the past, from the next quarter hour
+        now = timezone.localtime().replace(tzinfo=None)
+        not_before = now.replace(second=0, microsecond=0) + timedelta(
+            minutes=15 - now.minute % 15
+        )
+        events, unplaced = plan(
+            request.user,
+            options['start_date'],
+            options['end_date'],
+            (options['day_start'], options['day_end']),
+            not_before=not_before,
+            todo_ids=options.get('todos'),
+        )
+        if options['create'] and events:
+            events = Event.objects.bulk_create(events)
+
+        data = []
         for event in events:
-            date_str = event.date.strftime('%Y-%m-%d')
-            event_data = {
-                'id': event.id,
-                'title': event.title,
-                'time': event.time,
-                'endTime': event.end_time_formatted,
-                'type': event.event_type,
-                'duration': event.duration,
-            }
-            grouped_events[date_str].append(event_data)
+            event_data = EventListSerializer(event).data
+            event_data['todo'] = event.todo_id
+            data.append(event_data)
+        return Response(
+            {
+                'events': data,
+                'unscheduled': [todo.id for todo in unplaced],
+            },
+            status=(
+                status.HTTP_201_CREATED if options['create']
+                else status.HTTP_200_OK
+            )
+        )
+
+
+@extend_schema(
+    summary="Get planned minutes",
+    description=(
+        "Return the minutes of events planned per event type, per day or "
+        "week, including occurrences of recurring events"
+    ),
+    parameters=[
+        OpenApiParameter(
+            name='bucket',
+            type=OpenApiTypes.STR,
+            description='day (default) or week'
+        ),
+        OpenApiParameter(
+            name='start_date',
+            type=OpenApiTypes.DATE,
+            description=(
+                'First day (YYYY-MM-DD), default the Monday of this week'
+            )
+        ),
+        OpenApiParameter(
+            name='end_date',
+            type=OpenApiTypes.DATE,
+            description='Last day (YYYY-MM-DD), default 6 days after start'
+        ),
+        OpenApiParameter(
+            name='type',
+            type=OpenApiTypes.STR,
+            description='Only count events of this type'
+        ),
+    ],
+    responses={200: OpenApiTypes.OBJECT}
+)
+class PlannedMinutesView(APIView):
+    """Planned event minutes per type, summed from duration_minutes"""
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+    max_days = 366
+
+    TRUNCATE = {
+        'day': TruncDate,
+        'week': TruncWeek,
+    }
+
+    def get(self, request):
+        """Get planned minutes for the authenticated user"""
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in self.TRUNCATE:
+            return Response(
+                {'bucket': ['Must be one of: day, week.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        today = date.today()
+        start_date, end_date = date_range(
+            request.query_params,
+            today - timedelta(days=today.weekday()),
+            6,
+            self.max_days,
+        )
+
+        queryset = Event.objects.with_duration().filter(owner=request.user)
+        event_type = request.query_params.get('type')
+        if event_type:
+            queryset = queryset.filter(event_type=event_type)
+
+        def period_of(day):
+            if bucket == 'week':
+                return day - timedelta(days=day.weekday())
+            return day
+
+        periods = []
+        period = period_of(start_date)
+        while period <= end_date:
+            periods.append(period)
+            period += timedelta(days=7 if bucket == 'week' else 1)
+        index = {period: i for i, period in enumerate(periods)}
+
+        # Single events are summed in the database from the stored
+        # duration column, one row per period and type
+        planned = {}
+        for period, kind, minutes in single_events(
+            queryset, start_date, end_date
+        ).annotate(
+            period=self.TRUNCATE[bucket]('date')
+        ).order_by().values('period', 'event_type').annotate(
+            minutes=Sum('duration_minutes')
+        ).values_list('period', 'event_type', 'minutes'):
+            if hasattr(period, 'date'):
+                period = period.date()
+            totals = planned.setdefault(kind, [0] * len(periods))
+            totals[index[period]] += minutes
+
+        # Occurrences of recurring events are not stored
+        for master, day in occurrences(queryset, start_date, end_date):
+            totals = planned.setdefault(
+                master.event_type, [0] * len(periods)
+            )
+            totals[index[period_of(day)]] += master.duration
+
+        return Response({
+            'bucket': bucket,
+            'periods': periods,
+            'plannedMinutes': planned,
+        }, status=status.HTTP_200_OK)
+
 
-        return Response(dict(grouped_events), status=status.HTTP_200_OK)
+@extend_schema(
+    summary="Export events as iCalendar",
+    description=(
+        "Stream all events as an .ics file, recurring events with their "
+        "recurrence rule"
+    ),
+    responses={(200, 'text/calendar'): OpenApiTypes.STR}
+)
+class EventExportView(APIView):
+    """Stream the user's events as an iCalendar file"""
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+
+    def get(self, request):
+        """Export the authenticated user's events"""
+        response = StreamingHttpResponse(
+            export(Event.objects.with_duration().filter(owner=request.user)),
+            content_type='text/calendar; charset=utf-8',
+        )
+        response['Content-Disposition'] = 'attachment; filename="events.ics"'
+        return response
+
+
+@extend_schema(
+    summary="Import events from iCalendar",
+    description=(
+        "Create the events of an uploaded .ics file. Events are validated "
+        "as when created one by one, the invalid ones are skipped and "
+        "returned in errors."
+    ),
+    request=EventImportSerializer,
+    responses={201: OpenApiTypes.OBJECT}
+)
+class EventImportView(APIView):
+    """Create events from an iCalendar file, read line by line"""
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+    parser_classes = [MultiPartParser]
+    max_events = 5000
+
+    def post(self, request):
+        """Import events for the authenticated user"""
+        serializer = EventImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data['file']
+
+        lines = (line.decode('utf-8', 'replace') for line in upload)
+        try:
+            # A malformed file creates nothing
+            with transaction.atomic():
+                created, errors = import_events(
+                    lines,
+                    {'request': request},
+                    max_events=self.max_events,
+                )
+        except ICalError as error:
+            return Response(
+                {'file': [str(error)]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            {'created': created, 'errors': errors},
+            status=status.HTTP_201_CREATED
+        )
 
 
 @extend_schema(
@@ -198,10 +890,19 @@ class TodayEventsView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     authentication_classes = [TokenAuthentication]
 
+    def get_date_range(self, request):
+        """Return today as the range to list"""
+        today = date.today()
+        return today, today
+
     def get_queryset(self):
         """Get today's events for authenticated user"""
-        today = date.today()
-        return Event.objects.filter(
-            owner=self.request.user,
-            date=today
-        ).order_by('start_time')
+        return expand(
+            Event.objects.with_duration().filter(owner=self.request.user),
+            *self.get_date_range(self.request)
+        )
+
+    @conditional
+    def get(self, request, *args, **kwargs):
+        """List today's events, or 304 when they did not change"""
+        return super().get(request, *args, **kwargs)
@@ -51,6 +51,8 @@ admin.site.register(models.Note)
 admin.site.register(models.Flashcard)
 admin.site.register(models.Deck)
 admin.site.register(models.DailyReviewStats)
+admin.site.register(models.DailyFocusStats)
+admin.site.register(models.CompactedFocusStats)
 admin.site.register(models.Todo)
 admin.site.register(models.Tag)
 admin.site.register(models.Event)
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-19 07:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_focussession'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='focussession',
+            index=models.Index(fields=['owner', 'session_type', 'created_at'], name='focus_owner_type_created_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-19 07:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_focussession_owner_type_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='focussession',
+            name='client_id',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='focussession',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddConstraint(
+            model_name='focussession',
+            constraint=models.UniqueConstraint(fields=('owner', 'client_id'), name='focus_owner_client_id_uniq'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.25 on 2026-10-19 07:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_focussession_client_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatsSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('weekly_focus', 'Weekly focus minutes'), ('daily_reviews', 'Daily flashcard reviews')], max_length=20)),
+                ('period', models.DateField()),
+                ('shard', models.PositiveSmallIntegerField(default=0)),
+                ('data', models.BinaryField(default=bytes)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('metric', 'period', 'shard')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyFocusStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('focus_sessions', models.IntegerField(default=0)),
+                ('focus_minutes', models.BigIntegerField(default=0)),
+                ('break_sessions', models.IntegerField(default=0)),
+                ('break_minutes', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_focus_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
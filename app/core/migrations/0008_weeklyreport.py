@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-19 07:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_dailyfocusstats_statssketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeeklyReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_start', models.DateField()),
+                ('data', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_reports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-week_start'],
+                'unique_together': {('user', 'week_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-19 07:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_weeklyreport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompactedFocusStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('focus_sessions', models.IntegerField(default=0)),
+                ('focus_minutes', models.BigIntegerField(default=0)),
+                ('break_sessions', models.IntegerField(default=0)),
+                ('break_minutes', models.BigIntegerField(default=0)),
+                ('focus_hours', models.JSONField(default=list)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compacted_focus_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
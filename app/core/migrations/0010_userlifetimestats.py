@@ -0,0 +1,95 @@
+# Generated by Django 3.2.25 on 2026-10-19 07:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+CREATE_VIEW = '''
+CREATE MATERIALIZED VIEW core_userlifetimestats AS
+WITH sessions AS (
+    SELECT owner_id AS user_id,
+           count(*) FILTER (WHERE session_type = 'focus') AS focus_sessions,
+           coalesce(sum(duration) FILTER (WHERE session_type = 'focus'), 0)
+               AS focus_minutes,
+           count(*) FILTER (WHERE session_type = 'break') AS break_sessions,
+           coalesce(sum(duration) FILTER (WHERE session_type = 'break'), 0)
+               AS break_minutes
+    FROM core_focussession
+    GROUP BY owner_id
+    UNION ALL
+    SELECT user_id, sum(focus_sessions), sum(focus_minutes),
+           sum(break_sessions), sum(break_minutes)
+    FROM core_compactedfocusstats
+    GROUP BY user_id
+),
+focus AS (
+    SELECT user_id,
+           sum(focus_sessions)::bigint AS focus_sessions,
+           sum(focus_minutes)::bigint AS focus_minutes,
+           sum(break_sessions)::bigint AS break_sessions,
+           sum(break_minutes)::bigint AS break_minutes
+    FROM sessions
+    GROUP BY user_id
+),
+reviews AS (
+    SELECT user_id,
+           sum(flashcards_reviewed)::bigint AS flashcards_reviewed,
+           sum(correct_reviews)::bigint AS correct_reviews
+    FROM core_dailyreviewstats
+    GROUP BY user_id
+)
+SELECT u.id AS user_id,
+       coalesce(f.focus_sessions, 0) AS focus_sessions,
+       coalesce(f.focus_minutes, 0) AS focus_minutes,
+       coalesce(f.break_sessions, 0) AS break_sessions,
+       coalesce(f.break_minutes, 0) AS break_minutes,
+       coalesce(f.focus_minutes / nullif(f.focus_sessions, 0), 0)
+           AS average_session_length,
+       coalesce(r.flashcards_reviewed, 0) AS flashcards_reviewed,
+       coalesce(r.correct_reviews, 0) AS correct_reviews,
+       w.session_watermark,
+       now() AS refreshed_at
+FROM core_user u
+LEFT JOIN focus f ON f.user_id = u.id
+LEFT JOIN reviews r ON r.user_id = u.id
+CROSS JOIN (
+    SELECT coalesce(max(id), 0)::bigint AS session_watermark
+    FROM core_focussession
+) w;
+
+-- REFRESH ... CONCURRENTLY needs a unique index
+CREATE UNIQUE INDEX core_userlifetimestats_user_id
+    ON core_userlifetimestats (user_id);
+'''
+
+DROP_VIEW = 'DROP MATERIALIZED VIEW core_userlifetimestats;'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_compactedfocusstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserLifetimeStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='lifetime_stats', serialize=False, to='core.user')),
+                ('focus_sessions', models.BigIntegerField()),
+                ('focus_minutes', models.BigIntegerField()),
+                ('break_sessions', models.BigIntegerField()),
+                ('break_minutes', models.BigIntegerField()),
+                ('average_session_length', models.BigIntegerField()),
+                ('flashcards_reviewed', models.BigIntegerField()),
+                ('correct_reviews', models.BigIntegerField()),
+                ('session_watermark', models.BigIntegerField()),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'core_userlifetimestats',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(CREATE_VIEW, DROP_VIEW),
+    ]
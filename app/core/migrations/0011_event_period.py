@@ -0,0 +1,35 @@
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+
+
+# Events that end before they start cross midnight, as in Event.duration
+ADD_PERIOD = '''
+ALTER TABLE core_event ADD COLUMN period tsrange
+    GENERATED ALWAYS AS (
+        tsrange(
+            date + start_time,
+            date + end_time + CASE WHEN end_time < start_time
+                THEN interval '1 day' ELSE interval '0' END
+        )
+    ) STORED;
+
+CREATE INDEX core_event_owner_period_gist
+    ON core_event USING gist (owner_id, period);
+'''
+
+DROP_PERIOD = '''
+DROP INDEX core_event_owner_period_gist;
+ALTER TABLE core_event DROP COLUMN period;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_userlifetimestats'),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.RunSQL(ADD_PERIOD, DROP_PERIOD),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-19 07:42
+
+from django.db import migrations, models
+
+
+# Events that end before they start cross midnight, as in Event.duration
+ADD_DURATION = '''
+ALTER TABLE core_event ADD COLUMN duration_minutes integer
+    GENERATED ALWAYS AS (
+        floor(extract(epoch FROM
+            end_time - start_time + CASE WHEN end_time < start_time
+                THEN interval '1 day' ELSE interval '0' END
+        ) / 60)::integer
+    ) STORED;
+'''
+
+DROP_DURATION = 'ALTER TABLE core_event DROP COLUMN duration_minutes;'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_event_recurrence'),
+    ]
+
+    operations = [
+        migrations.RunSQL(ADD_DURATION, DROP_DURATION),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['owner', 'date', 'start_time'], name='event_owner_date_start_idx'),
+        ),
+    ]
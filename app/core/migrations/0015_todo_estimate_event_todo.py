@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-19 07:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_event_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='todo',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='core.todo'),
+        ),
+        migrations.AddField(
+            model_name='todo',
+            name='estimated_minutes',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-19 07:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_todo_estimate_event_todo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventDeletions',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='event_deletions', serialize=False, to='core.user')),
+                ('count', models.BigIntegerField(default=0)),
+                ('deleted_at', models.DateTimeField()),
+            ],
+        ),
+    ]
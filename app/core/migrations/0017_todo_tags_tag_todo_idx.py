@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Index the todo/tag through table by tag first.
+
+    The unique (todo_id, tag_id) index serves a todo's tags; tag filters
+    look todos up by tag. The through table is auto-created, so the
+    index is added in SQL.
+    """
+
+    dependencies = [
+        ('core', '0016_eventdeletions'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX core_todo_tags_tag_todo_idx '
+            'ON core_todo_tags (tag_id, todo_id);',
+            'DROP INDEX core_todo_tags_tag_todo_idx;',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-19 08:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_todo_tags_tag_todo_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('completed', False)), fields=['owner', 'due_date'], name='todo_open_owner_due_idx'),
+        ),
+    ]
@@ -0,0 +1,105 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from stats.sketch import QuantileSketch
+
+
+# As in stats.rankings, frozen here
+SKETCH_SHARDS = 16
+
+
+def rebuild_sketch(StatsSketch, metric, period, values):
+    """Replace a period's sketch with one of (user_id, value) pairs"""
+    sketches = defaultdict(QuantileSketch)
+    for user_id, value in values:
+        if value and value > 0:
+            sketches[user_id % SKETCH_SHARDS].add(value)
+    StatsSketch.objects.filter(metric=metric, period=period).delete()
+    StatsSketch.objects.bulk_create([
+        StatsSketch(
+            metric=metric,
+            period=period,
+            shard=shard,
+            data=sketches[shard].to_bytes(),
+        )
+        for shard in range(SKETCH_SHARDS)
+    ])
+
+
+def backfill_rollups(apps, schema_editor):
+    """Build DailyFocusStats and this week's sketches from stored rows.
+
+    As rebuild_stats_rollups does, so rankings and trends are right on
+    databases that had sessions before the rollups existed.
+    """
+    FocusSession = apps.get_model('core', 'FocusSession')
+    CompactedFocusStats = apps.get_model('core', 'CompactedFocusStats')
+    DailyFocusStats = apps.get_model('core', 'DailyFocusStats')
+    DailyReviewStats = apps.get_model('core', 'DailyReviewStats')
+    StatsSketch = apps.get_model('core', 'StatsSketch')
+
+    rollup = {}
+    totals = FocusSession.objects.annotate(
+        day=TruncDate('created_at')
+    ).order_by().values('owner_id', 'day', 'session_type').annotate(
+        sessions=Count('id'),
+        minutes=Sum('duration'),
+    ).values_list('owner_id', 'day', 'session_type', 'sessions', 'minutes')
+    for user_id, day, session_type, sessions, minutes in totals:
+        stats = rollup.setdefault(
+            (user_id, day), DailyFocusStats(user_id=user_id, date=day)
+        )
+        if session_type == 'focus':
+            stats.focus_sessions = sessions
+            stats.focus_minutes = minutes
+        else:
+            stats.break_sessions = sessions
+            stats.break_minutes = minutes
+
+    # Compacted days are added in, their raw sessions are gone
+    for compacted in CompactedFocusStats.objects.iterator():
+        stats = rollup.setdefault(
+            (compacted.user_id, compacted.date),
+            DailyFocusStats(user_id=compacted.user_id, date=compacted.date)
+        )
+        stats.focus_sessions += compacted.focus_sessions
+        stats.focus_minutes += compacted.focus_minutes
+        stats.break_sessions += compacted.break_sessions
+        stats.break_minutes += compacted.break_minutes
+
+    DailyFocusStats.objects.all().delete()
+    DailyFocusStats.objects.bulk_create(rollup.values(), batch_size=1000)
+
+    today = timezone.now().date()
+    monday = today - timedelta(days=today.weekday())
+    weekly = defaultdict(int)
+    for (user_id, day), stats in rollup.items():
+        if monday <= day < monday + timedelta(days=7):
+            weekly[user_id] += stats.focus_minutes
+    rebuild_sketch(StatsSketch, 'weekly_focus', monday, weekly.items())
+    for offset in range(today.weekday() + 1):
+        day = monday + timedelta(days=offset)
+        rebuild_sketch(
+            StatsSketch,
+            'daily_reviews',
+            day,
+            DailyReviewStats.objects.filter(
+                date=day
+            ).values_list('user_id', 'flashcards_reviewed'),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_todo_open_owner_due_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
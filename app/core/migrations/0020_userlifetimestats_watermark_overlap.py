@@ -0,0 +1,91 @@
+from importlib import import_module
+
+from django.db import migrations
+
+
+# As in stats.analytics, frozen here
+WATERMARK_OVERLAP = 1000
+
+CREATE_VIEW = f'''
+CREATE MATERIALIZED VIEW core_userlifetimestats AS
+WITH watermark AS (
+    -- Ids are handed out before commit, so a session with an id just
+    -- below max(id) can commit after the refresh. The newest ids are
+    -- left out of the view and counted with the sessions stored since.
+    SELECT greatest(coalesce(max(id), 0) - {WATERMARK_OVERLAP}, 0)::bigint
+               AS session_watermark
+    FROM core_focussession
+),
+sessions AS (
+    SELECT owner_id AS user_id,
+           count(*) FILTER (WHERE session_type = 'focus') AS focus_sessions,
+           coalesce(sum(duration) FILTER (WHERE session_type = 'focus'), 0)
+               AS focus_minutes,
+           count(*) FILTER (WHERE session_type = 'break') AS break_sessions,
+           coalesce(sum(duration) FILTER (WHERE session_type = 'break'), 0)
+               AS break_minutes
+    FROM core_focussession, watermark
+    WHERE id <= session_watermark
+    GROUP BY owner_id
+    UNION ALL
+    SELECT user_id, sum(focus_sessions), sum(focus_minutes),
+           sum(break_sessions), sum(break_minutes)
+    FROM core_compactedfocusstats
+    GROUP BY user_id
+),
+focus AS (
+    SELECT user_id,
+           sum(focus_sessions)::bigint AS focus_sessions,
+           sum(focus_minutes)::bigint AS focus_minutes,
+           sum(break_sessions)::bigint AS break_sessions,
+           sum(break_minutes)::bigint AS break_minutes
+    FROM sessions
+    GROUP BY user_id
+),
+reviews AS (
+    SELECT user_id,
+           sum(flashcards_reviewed)::bigint AS flashcards_reviewed,
+           sum(correct_reviews)::bigint AS correct_reviews
+    FROM core_dailyreviewstats
+    GROUP BY user_id
+)
+SELECT u.id AS user_id,
+       coalesce(f.focus_sessions, 0) AS focus_sessions,
+       coalesce(f.focus_minutes, 0) AS focus_minutes,
+       coalesce(f.break_sessions, 0) AS break_sessions,
+       coalesce(f.break_minutes, 0) AS break_minutes,
+       coalesce(f.focus_minutes / nullif(f.focus_sessions, 0), 0)
+           AS average_session_length,
+       coalesce(r.flashcards_reviewed, 0) AS flashcards_reviewed,
+       coalesce(r.correct_reviews, 0) AS correct_reviews,
+       w.session_watermark,
+       now() AS refreshed_at
+FROM core_user u
+LEFT JOIN focus f ON f.user_id = u.id
+LEFT JOIN reviews r ON r.user_id = u.id
+CROSS JOIN watermark w;
+
+-- REFRESH ... CONCURRENTLY needs a unique index
+CREATE UNIQUE INDEX core_userlifetimestats_user_id
+    ON core_userlifetimestats (user_id);
+'''
+
+DROP_VIEW = 'DROP MATERIALIZED VIEW core_userlifetimestats;'
+
+# The view as first created, to migrate back to
+PREVIOUS_VIEW = import_module(
+    'core.migrations.0010_userlifetimestats'
+).CREATE_VIEW
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_backfill_focus_rollups'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [DROP_VIEW, CREATE_VIEW], [DROP_VIEW, PREVIOUS_VIEW]
+        ),
+    ]
@@ -1,6 +1,7 @@
 """
 Database models
 """
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.contrib.auth.models import (
     AbstractBaseUser,
@@ -247,17 +248,71 @@ class Todo(models.Model):
         default='other'
     )
     due_date = models.DateField(blank=True, null=True)
+    # Expected time to finish, used to plan the todo into the calendar
+    estimated_minutes = models.PositiveIntegerField(blank=True, null=True)
     tags = models.ManyToManyField(Tag, blank=True, related_name='todos')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Open todos by due date; completed ones are kept forever
+            # and stay out of the index
+            models.Index(
+                fields=['owner', 'due_date'],
+                name='todo_open_owner_due_idx',
+                condition=models.Q(completed=False),
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class GeneratedColumn(models.Expression):
+    """A column Postgres generates, which the model has no field for.
+
+    Refers to the column through the alias of the queried model's table,
+    so it stays right in subqueries and joins.
+    """
+
+    def __init__(self, column, output_field):
+        super().__init__(output_field=output_field)
+        self.column = column
+        self.alias = None
+
+    def resolve_expression(self, query=None, allow_joins=True, reuse=None,
+                           summarize=False, for_save=False):
+        resolved = self.copy()
+        resolved.alias = query.get_initial_alias()
+        return resolved
+
+    def relabeled_clone(self, change_map):
+        clone = self.copy()
+        clone.alias = change_map.get(self.alias, self.alias)
+        return clone
+
+    def get_group_by_cols(self, alias=None):
+        return [self]
+
+    def as_sql(self, compiler, connection):
+        return '.'.join(
+            compiler.quote_name_unless_alias(name)
+            for name in [self.alias, self.column]
+        ), []
+
+
+class EventQuerySet(models.QuerySet):
+    """Events with the duration_minutes column Postgres generates"""
+
+    def with_duration(self):
+        """Load duration_minutes, for Event.duration and aggregates"""
+        return self.annotate(duration_minutes=GeneratedColumn(
+            'duration_minutes', models.IntegerField()
+        ))
+
+
 class Event(models.Model):
     """Event object for calendar"""
     EVENT_TYPE_CHOICES = [
@@ -267,6 +322,12 @@ class Event(models.Model):
         ('break', 'Break'),
         ('other', 'Other'),
     ]
+    RECURRENCE_CHOICES = [
+        ('', 'None'),
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+    ]
 
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -283,18 +344,82 @@ class Event(models.Model):
         choices=EVENT_TYPE_CHOICES,
         default='other'
     )
+    # Recurrence rule, date is the first occurrence. Occurrences are
+    # expanded when listing, they are not stored.
+    recurrence = models.CharField(
+        max_length=10,
+        choices=RECURRENCE_CHOICES,
+        blank=True,
+        default=''
+    )
+    recurrence_interval = models.PositiveSmallIntegerField(default=1)
+    # Weekdays of weekly rules (0 is Monday), the weekday of date if empty
+    recurrence_days = models.JSONField(default=list, blank=True)
+    recurrence_until = models.DateField(null=True, blank=True)
+    recurrence_count = models.PositiveIntegerField(null=True, blank=True)
+    # Dates of cancelled occurrences
+    recurrence_exceptions = models.JSONField(default=list, blank=True)
+    # Set on a single event replacing the occurrence of a recurring
+    # event on original_date
+    recurrence_parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='overrides'
+    )
+    original_date = models.DateField(null=True, blank=True)
+    # The todo this event was planned for
+    todo = models.ForeignKey(
+        Todo,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='events'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = EventQuerySet.as_manager()
+
     class Meta:
         ordering = ['date', 'start_time']
+        indexes = [
+            # Listing a range orders by date and start time
+            models.Index(
+                fields=['owner', 'date', 'start_time'],
+                name='event_owner_date_start_idx',
+            ),
+            # Trigram indexes back search with ILIKE and similarity
+            GinIndex(
+                fields=['title'],
+                name='event_title_trgm_idx',
+                opclasses=['gin_trgm_ops'],
+            ),
+            GinIndex(
+                fields=['description'],
+                name='event_description_trgm_idx',
+                opclasses=['gin_trgm_ops'],
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.date} {self.start_time}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # The loaded column may be out of date now
+        self.__dict__.pop('duration_minutes', None)
+
     @property
     def duration(self):
-        """Calculate duration in minutes"""
+        """Duration in minutes.
+
+        Read from duration_minutes, which Postgres generates from the
+        times, when the event was loaded with it.
+        """
+        if getattr(self, 'duration_minutes', None) is not None:
+            return self.duration_minutes
         if self.start_time and self.end_time:
             start_datetime = timezone.datetime.combine(
                 timezone.datetime.today().date(),
@@ -313,6 +438,13 @@ class Event(models.Model):
             return int(duration.total_seconds() / 60)
         return 0
 
+    @property
+    def recurring_event_id(self):
+        """Return the id of the recurring event this belongs to, if any"""
+        if self.recurrence:
+            return self.id
+        return self.recurrence_parent_id
+
     @property
     def time(self):
         """Return start time in HH:MM format"""
@@ -324,6 +456,25 @@ class Event(models.Model):
         return self.end_time.strftime('%H:%M')
 
 
+class EventDeletions(models.Model):
+    """Count of a user's deleted events.
+
+    Deleted events leave no row to compare, so conditional GETs of the
+    calendar include this counter in their ETag.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='event_deletions'
+    )
+    count = models.BigIntegerField(default=0)
+    deleted_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user_id} - {self.count} events deleted"
+
+
 class FocusSession(models.Model):
     SESSION_TYPE_CHOICES = (
         ('focus', 'Focus'),
@@ -339,7 +490,156 @@ class FocusSession(models.Model):
         max_length=10,
         choices=SESSION_TYPE_CHOICES
     )
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add, offline clients upload sessions with their own
+    # timestamps (bulk_create would overwrite an auto_now_add value)
+    created_at = models.DateTimeField(default=timezone.now)
+    # Idempotency key generated by offline clients, so retried uploads
+    # do not create duplicate sessions
+    client_id = models.UUIDField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Every stats query filters on these, in this order
+            models.Index(
+                fields=['owner', 'session_type', 'created_at'],
+                name='focus_owner_type_created_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner', 'client_id'],
+                name='focus_owner_client_id_uniq',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.session_type} - {self.duration} mins"
+
+
+class DailyFocusStats(models.Model):
+    """Daily focus session totals for users"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='daily_focus_stats'
+    )
+    date = models.DateField()
+    focus_sessions = models.IntegerField(default=0)
+    focus_minutes = models.BigIntegerField(default=0)
+    break_sessions = models.IntegerField(default=0)
+    break_minutes = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'date')
+        ordering = ['-date']
+
+    def __str__(self):
+        return (f"{self.user.email} - {self.date} - "
+                f"{self.focus_minutes} focus mins")
+
+
+class CompactedFocusStats(models.Model):
+    """Daily totals of FocusSession rows deleted by compact_focus_sessions.
+
+    Holds only the compacted sessions, so stats are these rows plus the
+    remaining raw sessions, with no overlap.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='compacted_focus_stats'
+    )
+    date = models.DateField()
+    focus_sessions = models.IntegerField(default=0)
+    focus_minutes = models.BigIntegerField(default=0)
+    break_sessions = models.IntegerField(default=0)
+    break_minutes = models.BigIntegerField(default=0)
+    # Focus sessions started in each hour of the day, 24 counts
+    focus_hours = models.JSONField(default=list)
+
+    class Meta:
+        unique_together = ('user', 'date')
+        ordering = ['-date']
+
+    def __str__(self):
+        return (f"{self.user.email} - {self.date} - "
+                f"{self.focus_sessions} compacted focus sessions")
+
+
+class UserLifetimeStats(models.Model):
+    """Per-user lifetime totals, a Postgres materialized view.
+
+    Refreshed by the refresh_stats_views command. Focus totals include
+    compacted sessions; sessions with an id above session_watermark are
+    not counted. The watermark trails the highest id at the refresh, so
+    sessions committed after it with a lower id are above it as well.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        related_name='lifetime_stats'
+    )
+    focus_sessions = models.BigIntegerField()
+    focus_minutes = models.BigIntegerField()
+    break_sessions = models.BigIntegerField()
+    break_minutes = models.BigIntegerField()
+    average_session_length = models.BigIntegerField()
+    flashcards_reviewed = models.BigIntegerField()
+    correct_reviews = models.BigIntegerField()
+    session_watermark = models.BigIntegerField()
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = 'core_userlifetimestats'
+
+    def __str__(self):
+        return (f"{self.user_id} - {self.focus_minutes} focus mins "
+                f"as of {self.refreshed_at}")
+
+
+class StatsSketch(models.Model):
+    """Quantile sketch of a per-user metric across all users.
+
+    Each (metric, period) is split into shards by user id so concurrent
+    writers rarely lock the same row, readers merge the shards.
+    """
+    METRIC_CHOICES = [
+        ('weekly_focus', 'Weekly focus minutes'),
+        ('daily_reviews', 'Daily flashcard reviews'),
+    ]
+
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    # Monday of the week for weekly metrics, the day for daily ones
+    period = models.DateField()
+    shard = models.PositiveSmallIntegerField(default=0)
+    data = models.BinaryField(default=bytes)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('metric', 'period', 'shard')
+
+    def __str__(self):
+        return f"{self.metric} - {self.period} - shard {self.shard}"
+
+
+class WeeklyReport(models.Model):
+    """Precomputed weekly productivity report for a user"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='weekly_reports'
+    )
+    week_start = models.DateField()
+    data = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'week_start')
+        ordering = ['-week_start']
+
+    def __str__(self):
+        return f"{self.user.email} - week of {self.week_start}"
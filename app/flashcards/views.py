@@ -25,10 +25,12 @@ from flashcards.serializers import (
     DailyReviewStatsSerializer
 )
 
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta, date
 
 from flashcards.sm2 import anki_algorithm  # Updated import
+from stats.rankings import DAILY_REVIEWS, lock_user, update_sketch
 
 from rest_framework.generics import (
     GenericAPIView,
@@ -209,25 +211,37 @@ class FlashcardReviewView(GenericAPIView):
 
         # Update daily review stats
         today = date.today()
-        daily_stats, created = DailyReviewStats.objects.get_or_create(
-            user=request.user,
-            date=today,
-            defaults={
-                'flashcards_reviewed': 0,
-                'correct_reviews': 0,
-                'incorrect_reviews': 0,
-                'total_review_time_minutes': 0,
-            }
-        )
-
-        # Update the stats
-        daily_stats.flashcards_reviewed += 1
-        if grade > 1:  # Grade 2 (Good) and 3 (Easy) are considered correct
-            daily_stats.correct_reviews += 1
-        else:  # Grade 1 (Again) is considered incorrect
-            daily_stats.incorrect_reviews += 1
+        with transaction.atomic():
+            lock_user(request.user)
+            daily_stats, created = DailyReviewStats.objects.get_or_create(
+                user=request.user,
+                date=today,
+                defaults={
+                    'flashcards_reviewed': 0,
+                    'correct_reviews': 0,
+                    'incorrect_reviews': 0,
+                    'total_review_time_minutes': 0,
+                }
+            )
 
-        daily_stats.save()
+            # Update the stats
+            daily_stats.flashcards_reviewed += 1
+            # Grade 2 (Good) and 3 (Easy) are considered correct
+            if grade > 1:
+                daily_stats.correct_reviews += 1
+            else:  # Grade 1 (Again) is considered incorrect
+                daily_stats.incorrect_reviews += 1
+
+            daily_stats.save()
+
+            # Move the user's count in today's cross-user ranking
+            update_sketch(
+                DAILY_REVIEWS,
+                today,
+                request.user,
+                daily_stats.flashcards_reviewed - 1,
+                daily_stats.flashcards_reviewed,
+            )
 
         # Helper function for human-readable interval
         def format_interval(minutes):
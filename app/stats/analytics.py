@@ -0,0 +1,249 @@
+"""
+Optional columnar mirror of FocusSession and ReviewLog for analytics.
+
+The sync_analytics command appends new rows, by id watermark, to Parquet
+part files under ANALYTICS_STORE_PATH. Reports over all users are run on
+those files with DuckDB, so they never compete with API traffic for the
+database. Needs the optional duckdb package.
+"""
+import fcntl
+import glob
+import os
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from core.models import FocusSession, ReviewLog
+
+
+TABLES = {
+    'focus_sessions': (
+        FocusSession,
+        ['id', 'owner_id', 'session_type', 'duration', 'created_at'],
+    ),
+    'review_logs': (
+        ReviewLog,
+        ['id', 'user_id', 'flashcard_id', 'grade', 'reviewed_at'],
+    ),
+}
+
+# Ids are handed out before commit, so a row can become visible after a
+# higher id was synced. Ids this far behind the watermark are re-checked.
+WATERMARK_OVERLAP = 1000
+BATCH_SIZE = 50000
+
+
+class AnalyticsUnavailable(Exception):
+    """The analytics store is not configured or duckdb is missing"""
+
+
+def store_path():
+    path = getattr(settings, 'ANALYTICS_STORE_PATH', None)
+    if not path:
+        raise AnalyticsUnavailable('ANALYTICS_STORE_PATH is not set.')
+    return path
+
+
+def connect():
+    """Return an in-memory DuckDB connection to query the store with"""
+    store_path()
+    try:
+        import duckdb
+    except ImportError:
+        raise AnalyticsUnavailable('The duckdb package is not installed.')
+    return duckdb.connect()
+
+
+def _parts(table):
+    """Return the glob matching a table's part files, None if empty"""
+    pattern = os.path.join(store_path(), table, '*.parquet')
+    if not glob.glob(pattern):
+        return None
+    return "read_parquet('{}')".format(pattern.replace("'", "''"))
+
+
+@contextmanager
+def _sync_lock():
+    """Keep two syncs from appending the same rows"""
+    os.makedirs(store_path(), exist_ok=True)
+    with open(os.path.join(store_path(), '.sync.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _write_part(con, table, columns, rows):
+    """Write rows to a new part file, atomically"""
+    model = TABLES[table][0]
+    data = {}
+    for i, name in enumerate(columns):
+        values = [row[i] for row in rows]
+        if isinstance(model._meta.get_field(name), models.DateTimeField):
+            # Stored as naive UTC timestamps
+            values = np.array(
+                [timezone.make_naive(v, timezone.utc) for v in values],
+                dtype='datetime64[us]',
+            )
+        data[name] = np.array(values)
+
+    directory = os.path.join(store_path(), table)
+    name = f'part-{rows[0][0]:012d}-{rows[-1][0]:012d}-{uuid.uuid4().hex[:8]}'
+    path = os.path.join(directory, name + '.parquet')
+    con.register('batch', data)
+    try:
+        con.execute(
+            "COPY batch TO '{}' (FORMAT PARQUET)".format(
+                (path + '.tmp').replace("'", "''")
+            )
+        )
+    finally:
+        con.unregister('batch')
+    os.replace(path + '.tmp', path)
+    return len(rows)
+
+
+def sync_table(con, table, batch_size=BATCH_SIZE):
+    """Append the rows of a table added since the last sync"""
+    model, columns = TABLES[table]
+    os.makedirs(os.path.join(store_path(), table), exist_ok=True)
+
+    watermark = 0
+    synced = set()
+    parts = _parts(table)
+    if parts:
+        watermark = con.execute(
+            f'SELECT coalesce(max(id), 0) FROM {parts}'
+        ).fetchone()[0]
+        synced = {
+            row[0] for row in con.execute(
+                f'SELECT id FROM {parts} WHERE id > ?',
+                [watermark - WATERMARK_OVERLAP],
+            ).fetchall()
+        }
+
+    written = 0
+    batch = []
+    rows = model.objects.filter(
+        id__gt=watermark - WATERMARK_OVERLAP
+    ).order_by('id').values_list(*columns)
+    for row in rows.iterator(chunk_size=batch_size):
+        if row[0] in synced:
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            written += _write_part(con, table, columns, batch)
+            batch = []
+    if batch:
+        written += _write_part(con, table, columns, batch)
+    return written
+
+
+def sync(batch_size=BATCH_SIZE):
+    """Append new rows of every mirrored table, return counts per table"""
+    con = connect()
+    try:
+        with _sync_lock():
+            return {
+                table: sync_table(con, table, batch_size)
+                for table in TABLES
+            }
+    finally:
+        con.close()
+
+
+def focus_distribution(days=30):
+    """Distribution of focus minutes per user over the last days"""
+    con = connect()
+    try:
+        parts = _parts('focus_sessions')
+        if not parts:
+            return {'users': 0, 'mean': None, 'percentiles': {}}
+        since = timezone.make_naive(
+            timezone.now() - timezone.timedelta(days=days), timezone.utc
+        )
+        users, mean, p10, p25, p50, p75, p90, p99 = con.execute(f"""
+            WITH totals AS (
+                SELECT owner_id, sum(duration) AS minutes
+                FROM {parts}
+                WHERE session_type = 'focus' AND created_at >= ?
+                GROUP BY owner_id
+            )
+            SELECT count(*), avg(minutes),
+                   quantile_cont(minutes, 0.10),
+                   quantile_cont(minutes, 0.25),
+                   quantile_cont(minutes, 0.50),
+                   quantile_cont(minutes, 0.75),
+                   quantile_cont(minutes, 0.90),
+                   quantile_cont(minutes, 0.99)
+            FROM totals
+        """, [since]).fetchone()
+    finally:
+        con.close()
+
+    if not users:
+        return {'users': 0, 'mean': None, 'percentiles': {}}
+    return {
+        'users': users,
+        'mean': round(mean, 1),
+        'percentiles': {
+            'p10': p10, 'p25': p25, 'p50': p50,
+            'p75': p75, 'p90': p90, 'p99': p99,
+        },
+    }
+
+
+def retention_curve(days=30):
+    """Share of reviewers still reviewing N days after their first review.
+
+    Day N only counts users whose first review is at least N days ago.
+    """
+    con = connect()
+    try:
+        parts = _parts('review_logs')
+        if not parts:
+            return []
+        today = timezone.now().date()
+        rows = con.execute(f"""
+            WITH activity AS (
+                SELECT DISTINCT user_id, CAST(reviewed_at AS DATE) AS day
+                FROM {parts}
+            ),
+            firsts AS (
+                SELECT user_id, min(day) AS first_day
+                FROM activity
+                GROUP BY user_id
+            ),
+            offsets AS (
+                SELECT date_diff('day', f.first_day, a.day) AS offset_days
+                FROM activity a JOIN firsts f USING (user_id)
+            ),
+            eligible AS (
+                SELECT d AS offset_days, (
+                    SELECT count(*) FROM firsts
+                    WHERE first_day + CAST(d AS INTEGER) <= CAST(? AS DATE)
+                ) AS users
+                FROM range(0, ? + 1) AS t(d)
+            )
+            SELECT e.offset_days, e.users, count(o.offset_days)
+            FROM eligible e
+            LEFT JOIN offsets o USING (offset_days)
+            GROUP BY e.offset_days, e.users
+            ORDER BY e.offset_days
+        """, [today, days]).fetchall()
+    finally:
+        con.close()
+
+    return [
+        {
+            'day': offset,
+            'users': eligible,
+            'retained': round(active / eligible, 3) if eligible else None,
+        }
+        for offset, eligible, active in rows
+    ]
@@ -0,0 +1,108 @@
+"""
+Per-user response cache for the stats endpoints.
+
+Every entry is stored under the user's current stats version, so bumping
+the version (on any write to the user's sessions) invalidates all of
+their cached stats at once. Entries older than STATS_CACHE_FRESH_SECONDS
+are still served, while a background thread recomputes them.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+
+VERSION_KEY = 'stats:version:{user_id}'
+ENTRY_KEY = 'stats:{name}:{user_id}'
+REFRESH_LOCK_KEY = 'stats:refresh:{name}:{user_id}:{version}'
+
+
+def _fresh_seconds():
+    return getattr(settings, 'STATS_CACHE_FRESH_SECONDS', 30)
+
+
+def _stale_seconds():
+    return getattr(settings, 'STATS_CACHE_STALE_SECONDS', 60 * 60)
+
+
+def _seed_version(key):
+    """Start a user's version counter from the clock.
+
+    If the counter is evicted, restarting it at 0 could hit entries cached
+    under an old version; a millisecond timestamp is always ahead of it.
+    """
+    cache.add(key, int(time.time() * 1000), timeout=None)
+
+
+def get_version(user_id):
+    """Return the current stats version for a user"""
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        _seed_version(key)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(user_id):
+    """Invalidate every cached stat for a user"""
+    key = VERSION_KEY.format(user_id=user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        _seed_version(key)
+
+
+def _store(key, version, value):
+    cache.set(
+        key,
+        (value, time.time()),
+        timeout=_stale_seconds(),
+        version=version,
+    )
+    return value
+
+
+def _refresh(key, version, compute):
+    try:
+        _store(key, version, compute())
+    finally:
+        # Connections are per thread, close the one this thread opened
+        connections.close_all()
+
+
+def _schedule_refresh(lock_key, key, version, compute):
+    """Recompute an entry in the background, once per stale period"""
+    if not cache.add(lock_key, True, timeout=_fresh_seconds() or 1):
+        return
+    thread = threading.Thread(
+        target=_refresh,
+        args=(key, version, compute),
+        daemon=True,
+    )
+    thread.start()
+
+
+def cached_stats(user, name, compute):
+    """Return the cached result of compute() for a user.
+
+    Misses are computed inline. Stale hits return the cached value and
+    schedule a refresh so the next request sees up-to-date data.
+    """
+    version = get_version(user.id)
+    key = ENTRY_KEY.format(name=name, user_id=user.id)
+    entry = cache.get(key, version=version)
+    if entry is None:
+        return _store(key, version, compute())
+
+    value, computed_at = entry
+    if time.time() - computed_at >= _fresh_seconds():
+        lock_key = REFRESH_LOCK_KEY.format(
+            name=name,
+            user_id=user.id,
+            version=version,
+        )
+        _schedule_refresh(lock_key, key, version, compute)
+    return value
@@ -0,0 +1,117 @@
+"""
+Compaction of old focus sessions into daily aggregates.
+
+Sessions older than FOCUS_SESSION_RETENTION_DAYS are folded into
+CompactedFocusStats and deleted, in batches. A compacted session is counted
+in exactly one place, so stats add the aggregates to the raw sessions.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from core.models import CompactedFocusStats, FocusSession
+from stats.rankings import lock_user
+
+
+# Stats over the last week and month are computed from raw sessions only
+MIN_RETENTION_DAYS = 31
+
+
+def compaction_cutoff(days=None):
+    """Return the time before which sessions are compacted"""
+    if days is None:
+        days = settings.FOCUS_SESSION_RETENTION_DAYS
+    days = max(days, MIN_RETENTION_DAYS)
+    cutoff = timezone.now().date() - timedelta(days=days)
+    return timezone.make_aware(datetime.combine(cutoff, time.min))
+
+
+def compact_batch(user, cutoff, batch_size):
+    """Fold up to batch_size of a user's oldest sessions, return how many"""
+    with transaction.atomic():
+        # Serialized with writers, which add to the rollup under this lock
+        lock_user(user)
+        ids = list(FocusSession.objects.filter(
+            owner=user,
+            created_at__lt=cutoff,
+        ).order_by('created_at', 'id').values_list('id', flat=True)[
+            :batch_size
+        ])
+        if not ids:
+            return 0
+
+        sessions = FocusSession.objects.filter(id__in=ids).annotate(
+            day=TruncDate('created_at'),
+            hour=ExtractHour('created_at'),
+        ).order_by().values('day', 'hour', 'session_type').annotate(
+            sessions=Count('id'),
+            minutes=Sum('duration'),
+        ).values_list('day', 'hour', 'session_type', 'sessions', 'minutes')
+
+        # [focus_sessions, focus_minutes, break_sessions, break_minutes]
+        added = defaultdict(lambda: [0, 0, 0, 0])
+        hours = defaultdict(lambda: [0] * 24)
+        for day, hour, session_type, count, minutes in sessions:
+            offset = 0 if session_type == 'focus' else 2
+            added[day][offset] += count
+            added[day][offset + 1] += minutes
+            if session_type == 'focus':
+                hours[day][hour] += count
+
+        existing = {
+            stats.date: stats
+            for stats in CompactedFocusStats.objects.filter(
+                user=user, date__in=list(added)
+            )
+        }
+        to_create = []
+        for day, (focus_sessions, focus_minutes,
+                  break_sessions, break_minutes) in added.items():
+            stats = existing.get(day)
+            if stats is None:
+                stats = CompactedFocusStats(
+                    user=user, date=day, focus_hours=[0] * 24
+                )
+                to_create.append(stats)
+            stats.focus_sessions += focus_sessions
+            stats.focus_minutes += focus_minutes
+            stats.break_sessions += break_sessions
+            stats.break_minutes += break_minutes
+            stats.focus_hours = [
+                a + b for a, b in zip(stats.focus_hours, hours[day])
+            ]
+
+        CompactedFocusStats.objects.bulk_create(to_create)
+        CompactedFocusStats.objects.bulk_update(
+            existing.values(),
+            ['focus_sessions', 'focus_minutes', 'break_sessions',
+             'break_minutes', 'focus_hours'],
+        )
+        FocusSession.objects.filter(id__in=ids).delete()
+        return len(ids)
+
+
+def compact_user(user, cutoff, batch_size=1000):
+    """Compact all of a user's sessions before cutoff, return how many"""
+    compacted = 0
+    while True:
+        count = compact_batch(user, cutoff, batch_size)
+        compacted += count
+        if count < batch_size:
+            return compacted
+
+
+def compacted_totals(user):
+    """Return lifetime totals of a user's compacted sessions"""
+    totals = CompactedFocusStats.objects.filter(user=user).aggregate(
+        focus_sessions=Sum('focus_sessions'),
+        focus_minutes=Sum('focus_minutes'),
+        break_sessions=Sum('break_sessions'),
+        break_minutes=Sum('break_minutes'),
+    )
+    return {name: value or 0 for name, value in totals.items()}
@@ -0,0 +1,67 @@
+"""
+Per-user lifetime focus totals.
+
+Read from the core_userlifetimestats materialized view, plus the
+sessions above its watermark: those stored since its last refresh and
+the newest ones before it, which may not have been committed yet.
+When the view has not been refreshed for STATS_VIEW_MAX_AGE_SECONDS
+the totals are computed live.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from core.models import FocusSession, UserLifetimeStats
+from stats.history import compacted_totals
+
+
+def session_totals(sessions):
+    """Aggregate a FocusSession queryset into focus and break totals"""
+    totals = sessions.aggregate(
+        focus_sessions=Count('id', filter=Q(session_type='focus')),
+        focus_minutes=Sum('duration', filter=Q(session_type='focus')),
+        break_sessions=Count('id', filter=Q(session_type='break')),
+        break_minutes=Sum('duration', filter=Q(session_type='break')),
+    )
+    return {name: value or 0 for name, value in totals.items()}
+
+
+def live_totals(user):
+    """Compute lifetime totals from sessions and compacted history"""
+    totals = session_totals(FocusSession.objects.filter(owner=user))
+    for name, value in compacted_totals(user).items():
+        totals[name] += value
+    return totals
+
+
+def lifetime_totals(user):
+    """Return a user's lifetime focus and break totals"""
+    stats = UserLifetimeStats.objects.filter(
+        user=user,
+        refreshed_at__gte=timezone.now() - timedelta(
+            seconds=settings.STATS_VIEW_MAX_AGE_SECONDS
+        ),
+    ).first()
+    if stats is None:
+        # Stale view, or a user created after the last refresh
+        return live_totals(user)
+
+    totals = session_totals(FocusSession.objects.filter(
+        owner=user, id__gt=stats.session_watermark
+    ))
+    totals['focus_sessions'] += stats.focus_sessions
+    totals['focus_minutes'] += stats.focus_minutes
+    totals['break_sessions'] += stats.break_sessions
+    totals['break_minutes'] += stats.break_minutes
+    return totals
+
+
+def refresh_views():
+    """Refresh the lifetime stats view without blocking its readers"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'REFRESH MATERIALIZED VIEW CONCURRENTLY core_userlifetimestats'
+        )
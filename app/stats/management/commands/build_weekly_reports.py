@@ -0,0 +1,141 @@
+"""
+Django command to build the weekly productivity reports
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from calendars.recurrence import recurring_in_window
+from core.models import (
+    DailyFocusStats,
+    DailyReviewStats,
+    Event,
+    Todo,
+    WeeklyReport,
+)
+from stats.rankings import week_start
+from stats.reports import load_chunk, window_for
+from stats.summaries import build_reports
+from stats.utils import day_start
+
+
+class Command(BaseCommand):
+    """Build WeeklyReport rows for every user active in the window.
+
+    Meant to run nightly, by default it (re)builds the report of the
+    week yesterday belongs to.
+    """
+    help = 'Build weekly productivity reports for all active users.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--week',
+            help='Any day of the week to report on (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--window-weeks',
+            type=int,
+            default=4,
+            help='Weeks of daily data the correlations are computed over',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes, 1 computes in this process',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Users loaded and computed together',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command"""
+        if options['week']:
+            try:
+                day = datetime.strptime(options['week'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--week must be in YYYY-MM-DD format.')
+        else:
+            day = timezone.now().date() - timedelta(days=1)
+        week = week_start(day)
+        window_start, week_end = window_for(week, options['window_weeks'])
+
+        user_ids = self.active_user_ids(window_start, week_end)
+        size = options['chunk_size']
+        chunks = [
+            user_ids[i:i + size] for i in range(0, len(user_ids), size)
+        ]
+
+        if options['workers'] <= 1:
+            for chunk in chunks:
+                data = load_chunk(chunk, window_start, week_end)
+                self.store(week, build_reports(data))
+        else:
+            self.run_pool(chunks, week, window_start, week_end,
+                          options['workers'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Built {len(user_ids)} reports for the week of {week}.'
+        ))
+
+    def run_pool(self, chunks, week, window_start, week_end, workers):
+        """Load chunks here and compute them in worker processes.
+
+        Workers only run NumPy on the arrays they are sent, they never use
+        the database connection inherited from this process.
+        """
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk in chunks:
+                data = load_chunk(chunk, window_start, week_end)
+                pending.append(pool.submit(build_reports, data))
+                # Bound the number of loaded chunks held in memory
+                if len(pending) >= workers * 2:
+                    self.store(week, pending.popleft().result())
+            while pending:
+                self.store(week, pending.popleft().result())
+
+    def active_user_ids(self, window_start, week_end):
+        """Return ids of users with any activity in the window"""
+        user_ids = set()
+        for queryset in [
+            DailyFocusStats.objects.filter(
+                date__gte=window_start, date__lte=week_end
+            ).values_list('user_id', flat=True),
+            DailyReviewStats.objects.filter(
+                date__gte=window_start, date__lte=week_end
+            ).values_list('user_id', flat=True),
+            Todo.objects.filter(
+                completed=True,
+                updated_at__gte=day_start(window_start),
+                updated_at__lt=day_start(week_end + timedelta(days=1)),
+            ).values_list('owner_id', flat=True),
+            Event.objects.filter(
+                date__gte=window_start, date__lte=week_end
+            ).values_list('owner_id', flat=True),
+            recurring_in_window(
+                Event.objects.all(), window_start, week_end
+            ).values_list('owner_id', flat=True),
+        ]:
+            user_ids.update(queryset.order_by().distinct())
+        return sorted(user_ids)
+
+    def store(self, week, reports):
+        """Replace the stored reports of a chunk"""
+        with transaction.atomic():
+            WeeklyReport.objects.filter(
+                week_start=week,
+                user_id__in=[user_id for user_id, data in reports],
+            ).delete()
+            WeeklyReport.objects.bulk_create([
+                WeeklyReport(user_id=user_id, week_start=week, data=data)
+                for user_id, data in reports
+            ])
@@ -0,0 +1,41 @@
+"""
+Django command to fold old focus sessions into daily aggregates
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core.models import FocusSession
+from stats.history import compact_user, compaction_cutoff
+
+
+class Command(BaseCommand):
+    """Compact FocusSession rows older than FOCUS_SESSION_RETENTION_DAYS.
+
+    Each batch is folded into CompactedFocusStats and deleted in one
+    transaction, so stats totals are the same before and after.
+    """
+    help = 'Fold old focus sessions into daily aggregates and delete them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Sessions compacted and deleted per transaction',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command"""
+        cutoff = compaction_cutoff()
+        users = get_user_model().objects.filter(
+            pk__in=FocusSession.objects.filter(
+                created_at__lt=cutoff
+            ).values('owner')
+        )
+        compacted = 0
+        for user in users.iterator():
+            compacted += compact_user(user, cutoff, options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Compacted {compacted} sessions from before {cutoff.date()}.'
+        ))
@@ -0,0 +1,121 @@
+"""
+Django command to rebuild the daily focus rollup and ranking sketches
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.models import (
+    CompactedFocusStats,
+    DailyFocusStats,
+    DailyReviewStats,
+    FocusSession,
+)
+from stats.rankings import (
+    WEEKLY_FOCUS,
+    DAILY_REVIEWS,
+    lock_user,
+    rebuild_sketch,
+    week_start,
+)
+
+
+class Command(BaseCommand):
+    """Rebuild DailyFocusStats from sessions and recent StatsSketches"""
+    help = (
+        'Rebuild the daily focus rollup from FocusSession and its '
+        'compacted history, and the '
+        'ranking sketches of recent weeks from the daily rollups.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--weeks',
+            type=int,
+            default=1,
+            help='Number of recent weeks of sketches to rebuild',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command"""
+        users = get_user_model().objects.filter(
+            pk__in=FocusSession.objects.values('owner')
+        ) | get_user_model().objects.filter(
+            pk__in=DailyFocusStats.objects.values('user')
+        ) | get_user_model().objects.filter(
+            pk__in=CompactedFocusStats.objects.values('user')
+        )
+        for user in users.distinct().iterator():
+            self.rebuild_rollup(user)
+        self.stdout.write('Rebuilt daily focus rollup.')
+
+        today = timezone.now().date()
+        for week in range(options['weeks']):
+            monday = week_start(today) - timedelta(weeks=week)
+            rebuild_sketch(
+                WEEKLY_FOCUS,
+                monday,
+                DailyFocusStats.objects.filter(
+                    date__gte=monday,
+                    date__lt=monday + timedelta(days=7),
+                ).order_by().values('user').annotate(
+                    total=Sum('focus_minutes')
+                ).values_list('user', 'total'),
+            )
+            for offset in range(7):
+                day = monday + timedelta(days=offset)
+                if day > today:
+                    break
+                rebuild_sketch(
+                    DAILY_REVIEWS,
+                    day,
+                    DailyReviewStats.objects.filter(
+                        date=day
+                    ).values_list('user', 'flashcards_reviewed'),
+                )
+
+        self.stdout.write(self.style.SUCCESS('Rebuilt ranking sketches.'))
+
+    def rebuild_rollup(self, user):
+        """Recompute one user's DailyFocusStats from their sessions.
+
+        Compacted days are added in, their raw sessions are gone.
+        """
+        with transaction.atomic():
+            lock_user(user)
+            totals = FocusSession.objects.filter(owner=user).annotate(
+                day=TruncDate('created_at')
+            ).values('day', 'session_type').annotate(
+                sessions=Count('id'),
+                minutes=Sum('duration'),
+            ).values_list('day', 'session_type', 'sessions', 'minutes')
+
+            rollup = {}
+            for day, session_type, sessions, minutes in totals:
+                stats = rollup.setdefault(
+                    day, DailyFocusStats(user=user, date=day)
+                )
+                if session_type == 'focus':
+                    stats.focus_sessions = sessions
+                    stats.focus_minutes = minutes
+                else:
+                    stats.break_sessions = sessions
+                    stats.break_minutes = minutes
+
+            for compacted in CompactedFocusStats.objects.filter(user=user):
+                stats = rollup.setdefault(
+                    compacted.date,
+                    DailyFocusStats(user=user, date=compacted.date)
+                )
+                stats.focus_sessions += compacted.focus_sessions
+                stats.focus_minutes += compacted.focus_minutes
+                stats.break_sessions += compacted.break_sessions
+                stats.break_minutes += compacted.break_minutes
+
+            DailyFocusStats.objects.filter(user=user).delete()
+            DailyFocusStats.objects.bulk_create(rollup.values())
@@ -0,0 +1,20 @@
+"""
+Django command to refresh the materialized stats views
+"""
+from django.core.management.base import BaseCommand
+
+from stats.lifetime import refresh_views
+
+
+class Command(BaseCommand):
+    """Refresh the lifetime stats view, meant to run on a schedule.
+
+    The refresh is concurrent, so stats keep being served from the old
+    contents while it runs.
+    """
+    help = 'Refresh the materialized per-user lifetime stats view.'
+
+    def handle(self, *args, **options):
+        """Entry point for the command"""
+        refresh_views()
+        self.stdout.write(self.style.SUCCESS('Refreshed stats views.'))
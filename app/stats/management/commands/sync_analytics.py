@@ -0,0 +1,34 @@
+"""
+Django command to append new rows to the columnar analytics store
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from stats import analytics
+
+
+class Command(BaseCommand):
+    """Mirror new FocusSession and ReviewLog rows into the analytics store.
+
+    Meant to run periodically, each run only appends rows past the last
+    synced id.
+    """
+    help = 'Append new focus sessions and review logs to the analytics store.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=analytics.BATCH_SIZE,
+            help='Rows read and written per Parquet part file',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for the command"""
+        try:
+            written = analytics.sync(options['batch_size'])
+        except analytics.AnalyticsUnavailable as exc:
+            raise CommandError(str(exc))
+
+        for table, count in written.items():
+            self.stdout.write(f'{table}: {count} new rows')
+        self.stdout.write(self.style.SUCCESS('Analytics store is up to date.'))
@@ -0,0 +1,178 @@
+"""
+Cross-user rankings backed by quantile sketches.
+
+Write paths record every change to a user's weekly focus minutes and
+daily review count as a move of the user's value between two buckets of
+that period's sketch. Ranking a user then reads one sketch (a handful of
+shard rows) instead of every other user's sessions.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import DailyFocusStats, StatsSketch
+from stats.sketch import QuantileSketch
+
+
+# Rows per (metric, period), users are spread across them by id
+SKETCH_SHARDS = 16
+
+WEEKLY_FOCUS = 'weekly_focus'
+DAILY_REVIEWS = 'daily_reviews'
+
+
+def week_start(day):
+    """Return the Monday of the week a day falls in"""
+    return day - timedelta(days=day.weekday())
+
+
+def lock_user(user):
+    """Serialize stats writes for a user until the transaction ends"""
+    list(
+        get_user_model().objects.select_for_update().filter(
+            pk=user.pk
+        ).values_list('pk', flat=True)
+    )
+
+
+def update_sketch(metric, period, user, old, new):
+    """Move a user's value in a period's sketch from old to new.
+
+    Must run in the transaction that changed the value, after
+    lock_user(), so old is exactly what was recorded last time.
+    """
+    if old == new:
+        return
+    row, created = StatsSketch.objects.select_for_update().get_or_create(
+        metric=metric,
+        period=period,
+        shard=user.pk % SKETCH_SHARDS,
+    )
+    sketch = QuantileSketch.from_bytes(row.data)
+    if old > 0:
+        sketch.remove(old)
+    if new > 0:
+        sketch.add(new)
+    row.data = sketch.to_bytes()
+    row.save(update_fields=['data', 'updated_at'])
+
+
+def record_focus_sessions(user, sessions):
+    """Add newly stored sessions to the daily rollup and weekly sketch.
+
+    Must run in the transaction that stored the sessions, after
+    lock_user().
+    """
+    # [focus_sessions, focus_minutes, break_sessions, break_minutes]
+    added = defaultdict(lambda: [0, 0, 0, 0])
+    for session in sessions:
+        day = timezone.localtime(session.created_at).date()
+        offset = 0 if session.session_type == 'focus' else 2
+        added[day][offset] += 1
+        added[day][offset + 1] += session.duration
+
+    if not added:
+        return
+
+    first_week = week_start(min(added))
+    last_week = week_start(max(added))
+    existing = {
+        stats.date: stats
+        for stats in DailyFocusStats.objects.filter(
+            user=user,
+            date__gte=first_week,
+            date__lt=last_week + timedelta(days=7),
+        )
+    }
+
+    weekly_before = defaultdict(int)
+    for day, stats in existing.items():
+        weekly_before[week_start(day)] += stats.focus_minutes
+
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    weekly_added = defaultdict(int)
+    for day, (focus_sessions, focus_minutes,
+              break_sessions, break_minutes) in added.items():
+        stats = existing.get(day)
+        if stats is None:
+            stats = DailyFocusStats(user=user, date=day)
+            to_create.append(stats)
+        else:
+            # bulk_update() skips auto_now
+            stats.updated_at = now
+            to_update.append(stats)
+        stats.focus_sessions += focus_sessions
+        stats.focus_minutes += focus_minutes
+        stats.break_sessions += break_sessions
+        stats.break_minutes += break_minutes
+        weekly_added[week_start(day)] += focus_minutes
+
+    DailyFocusStats.objects.bulk_create(to_create)
+    DailyFocusStats.objects.bulk_update(to_update, [
+        'focus_sessions',
+        'focus_minutes',
+        'break_sessions',
+        'break_minutes',
+        'updated_at',
+    ])
+
+    for week in sorted(weekly_added):
+        before = weekly_before[week]
+        update_sketch(
+            WEEKLY_FOCUS, week, user, before, before + weekly_added[week]
+        )
+
+
+def rebuild_sketch(metric, period, values):
+    """Replace a period's sketch with one built from (user_id, value) pairs.
+
+    values is only evaluated once the shard rows are locked, so writes
+    that land meanwhile are applied on top of the rebuilt sketch.
+    """
+    with transaction.atomic():
+        for shard in range(SKETCH_SHARDS):
+            StatsSketch.objects.get_or_create(
+                metric=metric,
+                period=period,
+                shard=shard,
+            )
+        rows = list(StatsSketch.objects.select_for_update().filter(
+            metric=metric,
+            period=period,
+        ))
+
+        sketches = defaultdict(QuantileSketch)
+        for user_id, value in values:
+            if value and value > 0:
+                sketches[user_id % SKETCH_SHARDS].add(value)
+
+        for row in rows:
+            row.data = sketches[row.shard].to_bytes()
+        StatsSketch.objects.bulk_update(rows, ['data'])
+
+
+def load_sketch(metric, period):
+    """Return the merged sketch of a period"""
+    sketch = QuantileSketch()
+    for data in StatsSketch.objects.filter(
+        metric=metric,
+        period=period,
+    ).values_list('data', flat=True):
+        sketch.merge(QuantileSketch.from_bytes(data))
+    return sketch
+
+
+def top_percent(sketch, value):
+    """Return the share of users (in %) at or above a value.
+
+    None when the user has nothing to rank for the period.
+    """
+    if value <= 0 or not sketch.count:
+        return None
+    above = sketch.count_above(value)
+    return round(min(100.0, 100 * (above + 1) / sketch.count), 1)
@@ -0,0 +1,103 @@
+"""
+Weekly cross-domain productivity reports.
+
+Reports are built by the build_weekly_reports command. Users are handled
+in chunks: the parent process loads a chunk's columns from the daily
+focus rollup, DailyReviewStats, Todo and Event into users x days
+matrices, and worker processes compute every user's summary and
+correlations at once with stats.summaries. Workers never touch the
+database.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+from calendars.recurrence import occurrences, single_events
+from core.models import DailyFocusStats, DailyReviewStats, Event, Todo
+from stats.utils import day_start
+
+
+def load_chunk(user_ids, window_start, week_end):
+    """Load daily series for users as (users x days) matrices.
+
+    Days run from window_start to week_end inclusive.
+    """
+    days = (week_end - window_start).days + 1
+    rows = {user_id: row for row, user_id in enumerate(user_ids)}
+    shape = (len(user_ids), days)
+    focus = np.zeros(shape)
+    reviewed = np.zeros(shape)
+    correct = np.zeros(shape)
+    todos = np.zeros(shape)
+    planned = np.zeros(shape)
+
+    def index(records):
+        """Turn records starting with (user_id, date) into matrix indices"""
+        return (
+            np.array([rows[record[0]] for record in records], dtype=int),
+            np.array([(record[1] - window_start).days for record in records],
+                     dtype=int),
+        )
+
+    focus_rows = list(DailyFocusStats.objects.filter(
+        user_id__in=user_ids,
+        date__gte=window_start,
+        date__lte=week_end,
+    ).values_list('user_id', 'date', 'focus_minutes'))
+    if focus_rows:
+        focus[index(focus_rows)] = [row[2] for row in focus_rows]
+
+    review_rows = list(DailyReviewStats.objects.filter(
+        user_id__in=user_ids,
+        date__gte=window_start,
+        date__lte=week_end,
+    ).values_list('user_id', 'date', 'flashcards_reviewed',
+                  'correct_reviews'))
+    if review_rows:
+        at = index(review_rows)
+        reviewed[at] = [row[2] for row in review_rows]
+        correct[at] = [row[3] for row in review_rows]
+
+    # Todo has no completion timestamp, a completed todo's last update
+    # is the closest thing to it
+    todo_rows = list(Todo.objects.filter(
+        owner_id__in=user_ids,
+        completed=True,
+        updated_at__gte=day_start(window_start),
+        updated_at__lt=day_start(week_end + timedelta(days=1)),
+    ).annotate(
+        day=TruncDate('updated_at')
+    ).order_by().values('owner_id', 'day').annotate(
+        completed=Count('id')
+    ).values_list('owner_id', 'day', 'completed'))
+    if todo_rows:
+        todos[index(todo_rows)] = [row[2] for row in todo_rows]
+
+    # Occurrences of recurring events count as planned time too, only
+    # their masters are loaded as models
+    events = Event.objects.with_duration().filter(owner_id__in=user_ids)
+    event_rows = list(single_events(
+        events, window_start, week_end
+    ).values_list('owner_id', 'date', 'duration_minutes'))
+    event_rows.extend(
+        (master.owner_id, day, master.duration)
+        for master, day in occurrences(events, window_start, week_end)
+    )
+    if event_rows:
+        np.add.at(planned, index(event_rows), [row[2] for row in event_rows])
+
+    return {
+        'user_ids': list(user_ids),
+        'focus': focus,
+        'reviewed': reviewed,
+        'correct': correct,
+        'todos': todos,
+        'planned': planned,
+    }
+
+
+def window_for(week, window_weeks):
+    """Return the first and last day of the data a report reads"""
+    return week - timedelta(weeks=window_weeks - 1), week + timedelta(days=6)
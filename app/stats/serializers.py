@@ -1,5 +1,12 @@
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
-from core.models import FocusSession
+from core.models import FocusSession, WeeklyReport
+from stats.history import compaction_cutoff
+
+# Allowance for offline clients whose clocks run slightly ahead
+CLIENT_CLOCK_SKEW = timedelta(minutes=5)
 
 
 class FocusSessionSerializer(serializers.ModelSerializer):
@@ -11,6 +18,28 @@ class FocusSessionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'owner', 'created_at']  # Fixed: was 'user'
 
 
+class BulkFocusSessionSerializer(serializers.ModelSerializer):
+    """Serializer for sessions queued by offline clients"""
+    client_id = serializers.UUIDField()
+    created_at = serializers.DateTimeField()
+
+    class Meta:
+        model = FocusSession
+        fields = ['client_id', 'session_type', 'duration', 'created_at']
+
+    def validate_created_at(self, value):
+        if value > timezone.now() + CLIENT_CLOCK_SKEW:
+            raise serializers.ValidationError(
+                "Session cannot be in the future."
+            )
+        # Its day may already be compacted, where retries are not detected
+        if value < compaction_cutoff():
+            raise serializers.ValidationError(
+                "Session is older than the stored session history."
+            )
+        return value
+
+
 class UserStatsSerializer(serializers.Serializer):
     totalSessions = serializers.IntegerField()
     totalFocusTime = serializers.IntegerField()
@@ -34,6 +63,45 @@ class HourlyDataSerializer(serializers.Serializer):
     sessions = serializers.IntegerField()
 
 
+class HeatmapSerializer(serializers.Serializer):
+    startDate = serializers.DateField()
+    endDate = serializers.DateField()
+    focusMinutes = serializers.ListField(child=serializers.IntegerField())
+    reviews = serializers.ListField(child=serializers.IntegerField())
+
+
+class PercentileSerializer(serializers.Serializer):
+    weekStart = serializers.DateField()
+    weeklyFocusTime = serializers.IntegerField()
+    focusTopPercent = serializers.FloatField(allow_null=True)
+    focusUsers = serializers.IntegerField()
+    todayReviews = serializers.IntegerField()
+    reviewsTopPercent = serializers.FloatField(allow_null=True)
+    reviewsUsers = serializers.IntegerField()
+
+
+class TrendsSerializer(serializers.Serializer):
+    bucket = serializers.ChoiceField(choices=['week', 'month', 'year'])
+    periods = serializers.ListField(child=serializers.DateField())
+    focusMinutes = serializers.ListField(child=serializers.IntegerField())
+    sessions = serializers.ListField(child=serializers.IntegerField())
+
+
+class AnalyticsReportSerializer(serializers.Serializer):
+    report = serializers.ChoiceField(
+        choices=['focus-distribution', 'retention']
+    )
+    days = serializers.IntegerField()
+    data = serializers.JSONField()
+
+
+class WeeklyReportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WeeklyReport
+        fields = ['week_start', 'data', 'created_at']
+        read_only_fields = fields
+
+
 class SessionDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = FocusSession
@@ -0,0 +1,89 @@
+"""
+Mergeable quantile sketch for per-user metrics.
+
+Values are counted in logarithmic buckets (as in DDSketch), so every
+quantile is within RELATIVE_ACCURACY of the true value, and sketches
+merge by adding bucket counts. Unlike t-digest or KLL, counts can also
+be decremented, which lets a user's running weekly total move from one
+bucket to another as it grows.
+"""
+import math
+import struct
+
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+# (bucket index, count) pairs, little endian
+BUCKET_STRUCT = struct.Struct('<HI')
+
+
+class QuantileSketch:
+    """Counts of positive values in log-spaced buckets"""
+
+    def __init__(self, buckets=None):
+        self.buckets = dict(buckets or {})
+
+    @staticmethod
+    def bucket(value):
+        """Return the bucket index of a value (values must be >= 1)"""
+        if value < 1:
+            raise ValueError('Only values >= 1 can be added to a sketch')
+        return math.ceil(math.log(value) / LOG_GAMMA)
+
+    @staticmethod
+    def bucket_value(index):
+        """Return the value representing a bucket"""
+        return 2 * GAMMA ** index / (GAMMA + 1)
+
+    @property
+    def count(self):
+        """Number of values in the sketch"""
+        return sum(self.buckets.values())
+
+    def add(self, value, count=1):
+        index = self.bucket(value)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def remove(self, value, count=1):
+        index = self.bucket(value)
+        remaining = self.buckets.get(index, 0) - count
+        if remaining > 0:
+            self.buckets[index] = remaining
+        else:
+            self.buckets.pop(index, None)
+
+    def merge(self, other):
+        """Add the counts of another sketch into this one"""
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        return self
+
+    def count_above(self, value):
+        """Number of values in buckets above the one holding value"""
+        index = self.bucket(value)
+        return sum(c for i, c in self.buckets.items() if i > index)
+
+    def quantile(self, q):
+        """Return the approximate q-quantile (0 <= q <= 1)"""
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return self.bucket_value(index)
+        return self.bucket_value(max(self.buckets))
+
+    def to_bytes(self):
+        return b''.join(
+            BUCKET_STRUCT.pack(index, self.buckets[index])
+            for index in sorted(self.buckets)
+        )
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(BUCKET_STRUCT.iter_unpack(bytes(data)))
@@ -0,0 +1,88 @@
+"""
+NumPy summaries and correlations of the weekly reports.
+
+build_reports() runs in the worker processes of build_weekly_reports.
+This module must not import Django, so a worker started with the spawn
+start method imports it without setting up Django.
+"""
+import numpy as np
+
+
+# Correlations need a few days where both series have data
+MIN_CORRELATION_DAYS = 3
+
+
+def correlate(x, y, mask):
+    """Row-wise Pearson correlation over the days where mask is set"""
+    count = mask.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.where(mask, x, 0).sum(axis=1) / count
+        mean_y = np.where(mask, y, 0).sum(axis=1) / count
+        dx = np.where(mask, x - mean_x[:, None], 0)
+        dy = np.where(mask, y - mean_y[:, None], 0)
+        r = (dx * dy).sum(axis=1) / np.sqrt(
+            (dx ** 2).sum(axis=1) * (dy ** 2).sum(axis=1)
+        )
+    r[(count < MIN_CORRELATION_DAYS) | ~np.isfinite(r)] = np.nan
+    return r
+
+
+def _rounded(value, digits=1):
+    """Return a float for JSON, None for NaN"""
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def build_reports(chunk):
+    """Compute the reports of a chunk loaded by load_chunk().
+
+    The last seven days of the matrices are the report week, correlations
+    use every day of the window.
+    """
+    focus = chunk['focus']
+    reviewed = chunk['reviewed']
+    correct = chunk['correct']
+    todos = chunk['todos']
+    planned = chunk['planned']
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        accuracy = np.where(reviewed > 0, correct / reviewed * 100, np.nan)
+        week_reviewed = reviewed[:, -7:].sum(axis=1)
+        week_accuracy = np.where(
+            week_reviewed > 0,
+            correct[:, -7:].sum(axis=1) / week_reviewed * 100,
+            np.nan,
+        )
+        week_focus = focus[:, -7:].sum(axis=1)
+        week_planned = planned[:, -7:].sum(axis=1)
+        planned_done = np.where(
+            week_planned > 0, week_focus / week_planned * 100, np.nan
+        )
+
+    every_day = np.ones(focus.shape, dtype=bool)
+    focus_accuracy = correlate(focus, accuracy, reviewed > 0)
+    focus_todos = correlate(focus, todos, every_day)
+    focus_planned = correlate(focus, planned, every_day)
+
+    reports = []
+    for row, user_id in enumerate(chunk['user_ids']):
+        reports.append((user_id, {
+            'focusMinutes': int(week_focus[row]),
+            'reviews': int(week_reviewed[row]),
+            'accuracy': _rounded(week_accuracy[row]),
+            'todosCompleted': int(todos[row, -7:].sum()),
+            'plannedMinutes': int(week_planned[row]),
+            # Focus time as a share of planned calendar time
+            'plannedFocusPercent': _rounded(planned_done[row]),
+            'daily': {
+                'focusMinutes': focus[row, -7:].astype(int).tolist(),
+                'accuracy': [_rounded(v) for v in accuracy[row, -7:]],
+                'todosCompleted': todos[row, -7:].astype(int).tolist(),
+                'plannedMinutes': planned[row, -7:].astype(int).tolist(),
+            },
+            'correlations': {
+                'focusAccuracy': _rounded(focus_accuracy[row], 2),
+                'focusTodos': _rounded(focus_todos[row], 2),
+                'focusPlanned': _rounded(focus_planned[row], 2),
+            },
+        }))
+    return reports
@@ -0,0 +1,185 @@
+"""
+Tests for the columnar analytics store.
+"""
+import importlib.util
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Deck, Flashcard, FocusSession, ReviewLog
+from stats import analytics
+
+
+HAS_DUCKDB = importlib.util.find_spec('duckdb') is not None
+
+
+def analytics_url(report):
+    """Return the URL of an analytics report"""
+    return reverse('analytics-report', args=[report])
+
+
+def create_user(email='user@example.com', **params):
+    """Create and return a sample user"""
+    return get_user_model().objects.create_user(email, 'testpass123', **params)
+
+
+def create_review(user, when):
+    """Create a review log for user at the given time"""
+    deck, _ = Deck.objects.get_or_create(owner=user, name='Deck')
+    flashcard = Flashcard.objects.create(
+        owner=user, deck=deck, question='Q', answer='A'
+    )
+    log = ReviewLog.objects.create(flashcard=flashcard, user=user, grade=4)
+    ReviewLog.objects.filter(id=log.id).update(reviewed_at=when)
+
+
+@skipUnless(HAS_DUCKDB, 'Requires duckdb')
+class AnalyticsStoreTests(TestCase):
+    """Test syncing and querying the analytics store"""
+
+    def setUp(self):
+        self.store = tempfile.TemporaryDirectory()
+        self.settings = override_settings(
+            ANALYTICS_STORE_PATH=self.store.name
+        )
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.store.cleanup()
+
+    def test_sync_appends_new_rows_only(self):
+        """Test a second sync only appends rows added since the first"""
+        user = create_user()
+        for minutes in [25, 50]:
+            FocusSession.objects.create(
+                owner=user, duration=minutes, session_type='focus'
+            )
+
+        self.assertEqual(analytics.sync()['focus_sessions'], 2)
+        FocusSession.objects.create(
+            owner=user, duration=30, session_type='focus'
+        )
+        self.assertEqual(analytics.sync()['focus_sessions'], 1)
+        self.assertEqual(analytics.sync()['focus_sessions'], 0)
+
+        distribution = analytics.focus_distribution(days=30)
+        self.assertEqual(distribution['users'], 1)
+        self.assertEqual(distribution['mean'], 105)
+
+    def test_sync_picks_up_rows_committed_late(self):
+        """Test rows below the watermark that were not synced are added"""
+        user = create_user()
+        late = FocusSession.objects.create(
+            owner=user, duration=10, session_type='focus'
+        )
+        FocusSession.objects.create(
+            owner=user, duration=20, session_type='focus'
+        )
+        # As if the lower id had not committed at the first sync
+        late_id = late.id
+        late.delete()
+        analytics.sync()
+        FocusSession.objects.create(
+            id=late_id, owner=user, duration=10, session_type='focus'
+        )
+
+        self.assertEqual(analytics.sync()['focus_sessions'], 1)
+        self.assertEqual(analytics.focus_distribution(days=30)['mean'], 30)
+
+    def test_focus_distribution_across_users(self):
+        """Test focus percentiles ignore breaks and old sessions"""
+        for i in range(4):
+            user = create_user(f'user{i}@example.com')
+            FocusSession.objects.create(
+                owner=user, duration=(i + 1) * 10, session_type='focus'
+            )
+            FocusSession.objects.create(
+                owner=user, duration=100, session_type='break'
+            )
+        old = FocusSession.objects.create(
+            owner=user, duration=1000, session_type='focus'
+        )
+        FocusSession.objects.filter(id=old.id).update(
+            created_at=timezone.now() - timedelta(days=60)
+        )
+        call_command('sync_analytics', stdout=StringIO())
+
+        distribution = analytics.focus_distribution(days=30)
+
+        self.assertEqual(distribution['users'], 4)
+        self.assertEqual(distribution['percentiles']['p50'], 25)
+
+    def test_retention_curve(self):
+        """Test the share of users reviewing again after their first day"""
+        now = timezone.now()
+        returning = create_user('returning@example.com')
+        create_review(returning, now - timedelta(days=2))
+        create_review(returning, now - timedelta(days=1))
+        one_off = create_user('oneoff@example.com')
+        create_review(one_off, now - timedelta(days=2))
+        newcomer = create_user('new@example.com')
+        create_review(newcomer, now)
+        analytics.sync()
+
+        curve = analytics.retention_curve(days=2)
+
+        self.assertEqual([point['day'] for point in curve], [0, 1, 2])
+        self.assertEqual(curve[0]['users'], 3)
+        self.assertEqual(curve[0]['retained'], 1.0)
+        # The newcomer cannot have come back yet
+        self.assertEqual(curve[1]['users'], 2)
+        self.assertEqual(curve[1]['retained'], 0.5)
+        self.assertEqual(curve[2]['retained'], 0.0)
+
+    def test_report_endpoint_for_admins(self):
+        """Test admins can read reports and other users cannot"""
+        admin = get_user_model().objects.create_superuser(
+            'admin@example.com', 'testpass123'
+        )
+        client = APIClient()
+        client.force_authenticate(user=create_user())
+        res = client.get(analytics_url('retention'))
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        client.force_authenticate(user=admin)
+        res = client.get(analytics_url('retention'), {'days': 7})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['days'], 7)
+        self.assertEqual(res.data['data'], [])
+
+        res = client.get(analytics_url('unknown'))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(ANALYTICS_STORE_PATH=None)
+class AnalyticsUnavailableTests(TestCase):
+    """Test the analytics store being switched off"""
+
+    def test_report_endpoint_unavailable(self):
+        """Test reports return 503 when no store is configured"""
+        client = APIClient()
+        client.force_authenticate(
+            user=get_user_model().objects.create_superuser(
+                'admin@example.com', 'testpass123'
+            )
+        )
+
+        res = client.get(analytics_url('focus-distribution'))
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_sync_command_fails(self):
+        """Test the sync command reports the store is not configured"""
+        with self.assertRaises(CommandError):
+            call_command('sync_analytics', stdout=StringIO())
@@ -0,0 +1,473 @@
+"""
+Test stats management commands.
+"""
+from datetime import date, datetime, time, timedelta
+from importlib import import_module
+from io import StringIO
+import subprocess
+import sys
+from unittest import mock
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import (
+    CompactedFocusStats,
+    DailyFocusStats,
+    DailyReviewStats,
+    Event,
+    FocusSession,
+    Todo,
+    UserLifetimeStats,
+    WeeklyReport,
+)
+from stats.rankings import (
+    WEEKLY_FOCUS,
+    DAILY_REVIEWS,
+    load_sketch,
+    week_start,
+)
+from stats.reports import load_chunk, window_for
+from stats.analytics import WATERMARK_OVERLAP
+from stats.lifetime import lifetime_totals, live_totals
+from stats.views import HourlyDataView, UserStatsView
+
+
+def create_user(email):
+    """Create and return a sample user"""
+    return get_user_model().objects.create_user(email, 'testpass123')
+
+
+class RebuildStatsRollupsTests(TestCase):
+    """Test rebuilding the focus rollup and ranking sketches"""
+
+    def test_rebuild_from_existing_rows(self):
+        """Test rollups and sketches are rebuilt from stored data"""
+        today = timezone.now().date()
+        users = [create_user(f'user{i}@example.com') for i in range(3)]
+        for i, user in enumerate(users):
+            # Written directly, so neither rollup nor sketch knows them
+            FocusSession.objects.create(
+                owner=user, duration=(i + 1) * 30, session_type='focus'
+            )
+            FocusSession.objects.create(
+                owner=user, duration=5, session_type='break'
+            )
+            DailyReviewStats.objects.create(
+                user=user, date=today, flashcards_reviewed=i + 1
+            )
+
+        call_command('rebuild_stats_rollups', stdout=StringIO())
+
+        stats = DailyFocusStats.objects.get(user=users[2])
+        self.assertEqual(stats.focus_sessions, 1)
+        self.assertEqual(stats.focus_minutes, 90)
+        self.assertEqual(stats.break_sessions, 1)
+        self.assertEqual(stats.break_minutes, 5)
+
+        focus_sketch = load_sketch(WEEKLY_FOCUS, week_start(today))
+        self.assertEqual(focus_sketch.count, 3)
+        self.assertEqual(focus_sketch.count_above(30), 2)
+        reviews_sketch = load_sketch(DAILY_REVIEWS, today)
+        self.assertEqual(reviews_sketch.count, 3)
+
+    def test_rebuild_is_idempotent(self):
+        """Test running the rebuild twice does not double count"""
+        user = create_user('user@example.com')
+        FocusSession.objects.create(
+            owner=user, duration=25, session_type='focus'
+        )
+
+        call_command('rebuild_stats_rollups', stdout=StringIO())
+        call_command('rebuild_stats_rollups', stdout=StringIO())
+
+        stats = DailyFocusStats.objects.get(user=user)
+        self.assertEqual(stats.focus_minutes, 25)
+        sketch = load_sketch(WEEKLY_FOCUS, week_start(timezone.now().date()))
+        self.assertEqual(sketch.count, 1)
+
+    def test_rebuild_sums_whole_week(self):
+        """Test a user's days in a week are ranked as one total"""
+        last_monday = week_start(timezone.now().date()) - timedelta(days=7)
+        user = create_user('user@example.com')
+        for offset in range(2):
+            session = FocusSession.objects.create(
+                owner=user, duration=25, session_type='focus'
+            )
+            FocusSession.objects.filter(id=session.id).update(
+                created_at=timezone.make_aware(datetime.combine(
+                    last_monday + timedelta(days=offset), time(12)
+                ))
+            )
+
+        call_command('rebuild_stats_rollups', weeks=2, stdout=StringIO())
+
+        sketch = load_sketch(WEEKLY_FOCUS, last_monday)
+        self.assertEqual(sketch.count, 1)
+        self.assertEqual(sketch.count_above(25), 1)
+
+
+class BackfillRollupsMigrationTests(TestCase):
+    """Test the migration filling the rollups of existing databases"""
+
+    def test_backfill_from_existing_rows(self):
+        """Test the rollup and this week's sketches are built"""
+        today = timezone.now().date()
+        user = create_user('user@example.com')
+        FocusSession.objects.create(
+            owner=user, duration=25, session_type='focus'
+        )
+        CompactedFocusStats.objects.create(
+            user=user, date=today - timedelta(days=800),
+            focus_sessions=2, focus_minutes=50,
+        )
+        DailyReviewStats.objects.create(
+            user=user, date=today, flashcards_reviewed=4
+        )
+        migration = import_module(
+            'core.migrations.0019_backfill_focus_rollups'
+        )
+
+        migration.backfill_rollups(apps, None)
+
+        self.assertEqual(
+            list(DailyFocusStats.objects.order_by('date').values_list(
+                'date', 'focus_sessions', 'focus_minutes'
+            )),
+            [(today - timedelta(days=800), 2, 50), (today, 1, 25)],
+        )
+        self.assertEqual(load_sketch(WEEKLY_FOCUS, week_start(today)).count, 1)
+        self.assertEqual(load_sketch(DAILY_REVIEWS, today).count, 1)
+
+
+@override_settings(FOCUS_SESSION_RETENTION_DAYS=365)
+class CompactFocusSessionsTests(TestCase):
+    """Test folding old sessions into daily aggregates"""
+
+    def setUp(self):
+        self.user = create_user('user@example.com')
+        now = timezone.now()
+        self.old_day = now - timedelta(days=400)
+        for days_ago, duration, session_type in [
+            (401, 25, 'focus'),
+            (400, 25, 'focus'),
+            (400, 50, 'focus'),
+            (400, 5, 'break'),
+            (0, 30, 'focus'),
+        ]:
+            session = FocusSession.objects.create(
+                owner=self.user, duration=duration, session_type=session_type
+            )
+            FocusSession.objects.filter(id=session.id).update(
+                created_at=now - timedelta(days=days_ago)
+            )
+        call_command('rebuild_stats_rollups', stdout=StringIO())
+
+    def test_compaction_keeps_stats(self):
+        """Test stats are the same after old sessions are compacted"""
+        stats_before = UserStatsView().compute_stats(self.user)
+        hourly_before = HourlyDataView().compute_stats(self.user)
+
+        call_command('compact_focus_sessions', batch_size=2,
+                     stdout=StringIO())
+
+        self.assertEqual(FocusSession.objects.count(), 1)
+        compacted = CompactedFocusStats.objects.get(
+            user=self.user, date=self.old_day.date()
+        )
+        self.assertEqual(compacted.focus_sessions, 2)
+        self.assertEqual(compacted.focus_minutes, 75)
+        self.assertEqual(compacted.break_minutes, 5)
+        self.assertEqual(compacted.focus_hours[self.old_day.hour], 2)
+        stats_after = UserStatsView().compute_stats(self.user)
+        self.assertEqual(stats_after, stats_before)
+        self.assertEqual(stats_after['totalFocusTime'], 130)
+        self.assertEqual(stats_after['longestStreak'], 2)
+        self.assertEqual(
+            HourlyDataView().compute_stats(self.user), hourly_before
+        )
+
+    def test_rebuild_keeps_compacted_days(self):
+        """Test rebuilding the rollup counts compacted sessions"""
+        call_command('compact_focus_sessions', stdout=StringIO())
+        call_command('rebuild_stats_rollups', stdout=StringIO())
+
+        stats = DailyFocusStats.objects.get(
+            user=self.user, date=self.old_day.date()
+        )
+        self.assertEqual(stats.focus_sessions, 2)
+        self.assertEqual(stats.focus_minutes, 75)
+        self.assertEqual(stats.break_sessions, 1)
+
+    def test_compaction_is_idempotent(self):
+        """Test compacting again does not double count"""
+        call_command('compact_focus_sessions', stdout=StringIO())
+        call_command('compact_focus_sessions', stdout=StringIO())
+
+        self.assertEqual(
+            UserStatsView().compute_stats(self.user)['totalFocusTime'], 130
+        )
+
+
+class RefreshStatsViewsTests(TestCase):
+    """Test lifetime stats read from the materialized view"""
+
+    def setUp(self):
+        self.user = create_user('user@example.com')
+        FocusSession.objects.create(
+            owner=self.user, duration=25, session_type='focus'
+        )
+        FocusSession.objects.create(
+            owner=self.user, duration=5, session_type='break'
+        )
+        CompactedFocusStats.objects.create(
+            user=self.user,
+            date=date(2020, 1, 1),
+            focus_sessions=2,
+            focus_minutes=50,
+            focus_hours=[0] * 24,
+        )
+        # The view leaves out the newest ids, which may be uncommitted,
+        # so ids are skipped to bring these sessions below its watermark
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT setval(pg_get_serial_sequence('core_focussession', "
+                "'id'), max(id) + %s) FROM core_focussession",
+                [WATERMARK_OVERLAP],
+            )
+        FocusSession.objects.create(
+            owner=create_user('other@example.com'),
+            duration=25,
+            session_type='focus',
+        )
+
+    def test_totals_from_view(self):
+        """Test the view holds lifetime totals including compacted ones"""
+        call_command('refresh_stats_views', stdout=StringIO())
+
+        stats = UserLifetimeStats.objects.get(user=self.user)
+        self.assertEqual(stats.focus_sessions, 3)
+        self.assertEqual(stats.focus_minutes, 75)
+        self.assertEqual(stats.average_session_length, 25)
+        self.assertEqual(stats.break_minutes, 5)
+        self.assertEqual(lifetime_totals(self.user), live_totals(self.user))
+
+    def test_sessions_after_refresh_added(self):
+        """Test sessions stored after the refresh are counted"""
+        call_command('refresh_stats_views', stdout=StringIO())
+        FocusSession.objects.create(
+            owner=self.user, duration=40, session_type='focus'
+        )
+
+        totals = lifetime_totals(self.user)
+
+        self.assertEqual(totals['focus_sessions'], 4)
+        self.assertEqual(totals['focus_minutes'], 115)
+
+    def test_session_committed_late_added(self):
+        """Test a session committed after the refresh with a lower id"""
+        late = FocusSession.objects.create(
+            owner=self.user, duration=40, session_type='focus'
+        )
+        late.delete()
+        FocusSession.objects.create(
+            owner=self.user, duration=5, session_type='break'
+        )
+        call_command('refresh_stats_views', stdout=StringIO())
+        # Its id was handed out before the refresh, its commit came after
+        FocusSession.objects.create(
+            id=late.id, owner=self.user, duration=40, session_type='focus'
+        )
+
+        totals = lifetime_totals(self.user)
+
+        self.assertEqual(totals, live_totals(self.user))
+        self.assertEqual(totals['focus_minutes'], 115)
+        self.assertEqual(totals['break_sessions'], 2)
+
+    def test_stale_view_falls_back_to_live(self):
+        """Test totals are computed live once the view is too old"""
+        call_command('refresh_stats_views', stdout=StringIO())
+        # Changed behind the view's back, without a new session id
+        FocusSession.objects.filter(owner=self.user).update(duration=10)
+
+        self.assertEqual(lifetime_totals(self.user)['focus_minutes'], 75)
+        with override_settings(STATS_VIEW_MAX_AGE_SECONDS=-1):
+            self.assertEqual(
+                lifetime_totals(self.user)['focus_minutes'], 60
+            )
+
+    def test_user_missing_from_view(self):
+        """Test users created after the refresh get live totals"""
+        call_command('refresh_stats_views', stdout=StringIO())
+        user = create_user('new@example.com')
+        FocusSession.objects.create(
+            owner=user, duration=30, session_type='focus'
+        )
+
+        self.assertEqual(lifetime_totals(user)['focus_minutes'], 30)
+        self.assertEqual(
+            UserStatsView().compute_stats(user)['totalFocusTime'], 30
+        )
+
+
+class BuildWeeklyReportsTests(TestCase):
+    """Test building the weekly productivity reports"""
+
+    def setUp(self):
+        self.user = create_user('user@example.com')
+        self.monday = date(2025, 6, 2)
+        # More focus goes with more planned time and better accuracy
+        for offset, minutes in enumerate([30, 60, 90, 120]):
+            day = self.monday + timedelta(days=offset)
+            DailyFocusStats.objects.create(
+                user=self.user,
+                date=day,
+                focus_sessions=1,
+                focus_minutes=minutes,
+            )
+            DailyReviewStats.objects.create(
+                user=self.user,
+                date=day,
+                flashcards_reviewed=10,
+                correct_reviews=offset + 5,
+            )
+            Event.objects.create(
+                owner=self.user,
+                title='Study',
+                date=day,
+                start_time=time(9, 0),
+                end_time=time(9 + offset + 1, 0),
+            )
+        todo = Todo.objects.create(
+            owner=self.user, title='Done', completed=True
+        )
+        Todo.objects.filter(id=todo.id).update(
+            updated_at=timezone.make_aware(
+                datetime.combine(self.monday, time(12))
+            )
+        )
+
+    def test_build_reports(self):
+        """Test summaries and correlations of a week"""
+        call_command(
+            'build_weekly_reports',
+            week='2025-06-04',
+            workers=1,
+            stdout=StringIO(),
+        )
+
+        report = WeeklyReport.objects.get(user=self.user)
+        self.assertEqual(report.week_start, self.monday)
+        self.assertEqual(report.data['focusMinutes'], 300)
+        self.assertEqual(report.data['reviews'], 40)
+        self.assertEqual(report.data['accuracy'], 65.0)
+        self.assertEqual(report.data['todosCompleted'], 1)
+        self.assertEqual(report.data['plannedMinutes'], 600)
+        self.assertEqual(report.data['plannedFocusPercent'], 50.0)
+        self.assertEqual(
+            report.data['daily']['focusMinutes'],
+            [30, 60, 90, 120, 0, 0, 0],
+        )
+        self.assertEqual(
+            report.data['daily']['accuracy'],
+            [50.0, 60.0, 70.0, 80.0, None, None, None],
+        )
+        self.assertEqual(report.data['correlations']['focusAccuracy'], 1.0)
+        self.assertGreater(report.data['correlations']['focusPlanned'], 0.9)
+
+    def test_build_reports_in_worker_processes(self):
+        """Test the process pool gives the same reports"""
+        other_user = create_user('other@example.com')
+        DailyFocusStats.objects.create(
+            user=other_user,
+            date=self.monday,
+            focus_sessions=1,
+            focus_minutes=25,
+        )
+
+        call_command(
+            'build_weekly_reports',
+            week='2025-06-02',
+            workers=2,
+            chunk_size=1,
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(WeeklyReport.objects.count(), 2)
+        report = WeeklyReport.objects.get(user=other_user)
+        self.assertEqual(report.data['focusMinutes'], 25)
+        self.assertIsNone(report.data['accuracy'])
+        self.assertIsNone(report.data['correlations']['focusTodos'])
+
+    def test_worker_module_does_not_import_django(self):
+        """Test workers can import build_reports without Django"""
+        result = subprocess.run(
+            [
+                sys.executable, '-c',
+                'import sys, stats.summaries; '
+                'sys.exit(any(name.startswith("django") '
+                'for name in sys.modules))',
+            ],
+            cwd=settings.BASE_DIR,
+        )
+
+        self.assertEqual(result.returncode, 0)
+
+    def test_recurring_events_count_as_planned(self):
+        """Test occurrences of recurring events add planned minutes"""
+        Event.objects.create(
+            owner=self.user,
+            title='Daily review',
+            date=date(2025, 5, 1),
+            start_time=time(20, 0),
+            end_time=time(20, 30),
+            recurrence='daily',
+        )
+
+        call_command(
+            'build_weekly_reports',
+            week='2025-06-02',
+            workers=1,
+            stdout=StringIO(),
+        )
+
+        report = WeeklyReport.objects.get(user=self.user)
+        self.assertEqual(report.data['plannedMinutes'], 600 + 7 * 30)
+
+    def test_only_recurring_events_load_models(self):
+        """Test single events are read as rows, masters as models"""
+        Event.objects.create(
+            owner=self.user,
+            title='Daily review',
+            date=date(2025, 5, 1),
+            start_time=time(20, 0),
+            end_time=time(20, 30),
+            recurrence='daily',
+        )
+        window_start, week_end = window_for(self.monday, 1)
+
+        with mock.patch.object(
+            Event, 'from_db', wraps=Event.from_db
+        ) as from_db:
+            chunk = load_chunk([self.user.id], window_start, week_end)
+
+        self.assertEqual(from_db.call_count, 1)
+        self.assertEqual(chunk['planned'].sum(), 600 + 7 * 30)
+
+    def test_rebuilding_replaces_report(self):
+        """Test running the command again replaces the week's report"""
+        for _ in range(2):
+            call_command(
+                'build_weekly_reports',
+                week='2025-06-02',
+                workers=1,
+                stdout=StringIO(),
+            )
+
+        self.assertEqual(WeeklyReport.objects.count(), 1)
@@ -0,0 +1,78 @@
+"""
+Tests for the quantile sketch.
+"""
+import random
+
+from django.test import SimpleTestCase
+
+from stats.sketch import QuantileSketch, RELATIVE_ACCURACY
+
+
+class QuantileSketchTests(SimpleTestCase):
+    """Test the quantile sketch"""
+
+    def test_quantiles_within_relative_accuracy(self):
+        """Test quantiles are within the relative accuracy bound"""
+        rng = random.Random(42)
+        values = sorted(rng.randint(1, 3000) for _ in range(5000))
+        sketch = QuantileSketch()
+        for value in values:
+            sketch.add(value)
+
+        for q in (0.01, 0.25, 0.5, 0.75, 0.9, 0.99):
+            expected = values[int(q * (len(values) - 1))]
+            self.assertAlmostEqual(
+                sketch.quantile(q),
+                expected,
+                delta=expected * RELATIVE_ACCURACY,
+            )
+
+    def test_remove_moves_value(self):
+        """Test a value can be moved to another bucket"""
+        sketch = QuantileSketch()
+        sketch.add(50)
+        sketch.add(100)
+
+        sketch.remove(50)
+        sketch.add(500)
+
+        self.assertEqual(sketch.count, 2)
+        self.assertEqual(sketch.count_above(100), 1)
+        self.assertEqual(sketch.count_above(500), 0)
+
+    def test_merge_matches_single_sketch(self):
+        """Test merging shards gives the same sketch as one stream"""
+        combined = QuantileSketch()
+        shards = [QuantileSketch() for _ in range(4)]
+        for value in range(1, 1000):
+            combined.add(value)
+            shards[value % 4].add(value)
+
+        merged = QuantileSketch()
+        for shard in shards:
+            merged.merge(shard)
+
+        self.assertEqual(merged.buckets, combined.buckets)
+
+    def test_bytes_round_trip(self):
+        """Test a sketch survives serialization"""
+        sketch = QuantileSketch()
+        for value in (1, 2, 2, 60, 10080, 10 ** 6):
+            sketch.add(value)
+
+        restored = QuantileSketch.from_bytes(sketch.to_bytes())
+
+        self.assertEqual(restored.buckets, sketch.buckets)
+        self.assertEqual(len(sketch.to_bytes()), 6 * len(sketch.buckets))
+
+    def test_empty_sketch(self):
+        """Test an empty sketch has no quantiles"""
+        sketch = QuantileSketch.from_bytes(b'')
+
+        self.assertEqual(sketch.count, 0)
+        self.assertIsNone(sketch.quantile(0.5))
+
+    def test_rejects_values_below_one(self):
+        """Test only positive values are accepted"""
+        with self.assertRaises(ValueError):
+            QuantileSketch().add(0)
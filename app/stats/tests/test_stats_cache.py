@@ -0,0 +1,107 @@
+"""
+Tests for the stats response cache.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import FocusSession
+
+
+CREATE_SESSION_URL = reverse('create-session')
+USER_STATS_URL = reverse('user-stats')
+WEEKLY_DATA_URL = reverse('weekly-data')
+HOURLY_DATA_URL = reverse('hourly-data')
+
+
+def create_user(**params):
+    """Create and return a sample user"""
+    defaults = {
+        'email': 'user@example.com',
+        'password': 'testpass123',
+        'name': 'Test User',
+    }
+    defaults.update(params)
+    return get_user_model().objects.create_user(**defaults)
+
+
+class StatsCacheTests(TestCase):
+    """Test caching of the stats endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(user=self.user)
+
+    def test_stats_served_from_cache(self):
+        """Test repeated requests do not recompute the stats"""
+        self.client.get(USER_STATS_URL)
+        # Written behind the API's back, so the cache is not invalidated
+        FocusSession.objects.create(
+            owner=self.user, duration=25, session_type='focus'
+        )
+
+        res = self.client.get(USER_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['totalFocusTime'], 0)
+
+    def test_create_session_invalidates_cache(self):
+        """Test creating a session invalidates all cached stats"""
+        self.client.get(USER_STATS_URL)
+        self.client.get(WEEKLY_DATA_URL)
+        self.client.get(HOURLY_DATA_URL)
+
+        payload = {'session_type': 'focus', 'duration': 25}
+        res = self.client.post(CREATE_SESSION_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        stats = self.client.get(USER_STATS_URL).data
+        weekly = self.client.get(WEEKLY_DATA_URL).data
+        hourly = self.client.get(HOURLY_DATA_URL).data
+
+        self.assertEqual(stats['totalFocusTime'], 25)
+        self.assertEqual(sum(day['focusTime'] for day in weekly), 25)
+        self.assertEqual(sum(hour['sessions'] for hour in hourly), 1)
+
+    def test_cache_is_per_user(self):
+        """Test one user's cached stats are not served to another"""
+        other_user = create_user(email='other@example.com')
+        FocusSession.objects.create(
+            owner=other_user, duration=50, session_type='focus'
+        )
+        self.client.get(USER_STATS_URL)
+
+        self.client.force_authenticate(user=other_user)
+        res = self.client.get(USER_STATS_URL)
+
+        self.assertEqual(res.data['totalFocusTime'], 50)
+
+    @override_settings(STATS_CACHE_FRESH_SECONDS=0)
+    @patch('stats.cache.threading.Thread')
+    def test_stale_entry_served_while_refreshing(self, patched_thread):
+        """Test stale stats are returned and refreshed in the background"""
+        self.client.get(USER_STATS_URL)
+        FocusSession.objects.create(
+            owner=self.user, duration=25, session_type='focus'
+        )
+
+        res = self.client.get(USER_STATS_URL)
+
+        self.assertEqual(res.data['totalFocusTime'], 0)
+        patched_thread.assert_called_once()
+        patched_thread.return_value.start.assert_called_once()
+
+        # Run the refresh inline and check the next request sees it
+        refresh = patched_thread.call_args.kwargs
+        with patch('stats.cache.connections.close_all'):
+            refresh['target'](*refresh['args'])
+        res = self.client.get(USER_STATS_URL)
+
+        self.assertEqual(res.data['totalFocusTime'], 25)
@@ -1,16 +1,40 @@
 from django.urls import path
 from .views import (
     CreateFocusSessionView,
+    BulkCreateFocusSessionView,
     UserStatsView,
     WeeklyDataView,
     HourlyDataView,
+    HeatmapView,
+    PercentileView,
+    TrendsView,
+    WeeklyReportView,
+    AnalyticsReportView,
     SessionListView,
 )
 
 urlpatterns = [
     path('session/', CreateFocusSessionView.as_view(), name='create-session'),
+    path(
+        'sessions/bulk/',
+        BulkCreateFocusSessionView.as_view(),
+        name='bulk-create-sessions'
+    ),
     path('sessions/', SessionListView.as_view(), name='session-list'),
     path('user-stats/', UserStatsView.as_view(), name='user-stats'),
     path('weekly-data/', WeeklyDataView.as_view(), name='weekly-data'),
     path('hourly-data/', HourlyDataView.as_view(), name='hourly-data'),
+    path('heatmap/', HeatmapView.as_view(), name='heatmap'),
+    path('percentile/', PercentileView.as_view(), name='percentile'),
+    path('trends/', TrendsView.as_view(), name='trends'),
+    path(
+        'weekly-report/',
+        WeeklyReportView.as_view(),
+        name='weekly-report'
+    ),
+    path(
+        'analytics/<str:report>/',
+        AnalyticsReportView.as_view(),
+        name='analytics-report'
+    ),
 ]
@@ -0,0 +1,16 @@
+"""
+Helpers shared by the stats views, reports and commands.
+"""
+from datetime import datetime, time
+
+from django.utils import timezone
+
+
+def day_start(day):
+    """Return the aware datetime at which a calendar day starts.
+
+    Filtering on [day_start(d), day_start(d + 1)) instead of
+    created_at__date keeps the column bare, so the
+    (owner, session_type, created_at) index can be used.
+    """
+    return timezone.make_aware(datetime.combine(day, time.min))
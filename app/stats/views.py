@@ -1,17 +1,53 @@
 from rest_framework import generics, permissions
-from core.models import FocusSession
+from core.models import (
+    FocusSession,
+    CompactedFocusStats,
+    DailyReviewStats,
+    DailyFocusStats,
+    WeeklyReport,
+)
 from .serializers import (
     FocusSessionSerializer,
+    BulkFocusSessionSerializer,
     UserStatsSerializer,
     WeeklyDataSerializer,
     HourlyDataSerializer,
+    HeatmapSerializer,
+    PercentileSerializer,
+    TrendsSerializer,
+    WeeklyReportSerializer,
+    AnalyticsReportSerializer,
     SessionDetailSerializer,
 )
 from rest_framework.response import Response
+from rest_framework import status
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date, datetime, timedelta
+from django.db import transaction
 from django.db.models import Sum
+from django.db.models.functions import (
+    TruncDate,
+    TruncWeek,
+    TruncMonth,
+    TruncYear,
+)
 from rest_framework.authentication import TokenAuthentication
+from rest_framework.views import APIView
+from drf_spectacular.utils import extend_schema
+
+from stats import analytics
+from stats.cache import cached_stats, bump_version
+from stats.lifetime import lifetime_totals
+from stats.rankings import (
+    WEEKLY_FOCUS,
+    DAILY_REVIEWS,
+    lock_user,
+    record_focus_sessions,
+    load_sketch,
+    top_percent,
+    week_start,
+)
+from stats.utils import day_start
 
 
 class CreateFocusSessionView(generics.CreateAPIView):
@@ -20,7 +56,74 @@ class CreateFocusSessionView(generics.CreateAPIView):
     authentication_classes = [TokenAuthentication]
 
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)  # Fixed: was 'user'
+        user = self.request.user
+        with transaction.atomic():
+            lock_user(user)
+            session = serializer.save(owner=user)  # Fixed: was 'user'
+            record_focus_sessions(user, [session])
+        bump_version(user.id)
+
+
+class BulkCreateFocusSessionView(generics.GenericAPIView):
+    """Upload sessions queued by an offline client.
+
+    Each session carries a client generated client_id, sessions that were
+    already uploaded are skipped so retries are safe.
+    """
+    serializer_class = BulkFocusSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+    max_sessions = 500
+
+    def post(self, request):
+        if not isinstance(request.data, list):
+            return Response(
+                {'detail': 'Upload a list of sessions.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(request.data) > self.max_sessions:
+            return Response(
+                {'detail': f'Upload at most {self.max_sessions} sessions.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        # Keep the first occurrence of a key repeated within the upload
+        sessions = {}
+        for data in serializer.validated_data:
+            sessions.setdefault(data['client_id'], FocusSession(
+                owner=request.user,
+                **data
+            ))
+
+        with transaction.atomic():
+            # Uploads from the same user are serialized from here on, so
+            # the sessions not stored yet are exactly the ones inserted
+            lock_user(request.user)
+            existing = set(FocusSession.objects.filter(
+                owner=request.user,
+                client_id__in=sessions.keys()
+            ).values_list('client_id', flat=True))
+            new_sessions = [
+                session for client_id, session in sessions.items()
+                if client_id not in existing
+            ]
+            FocusSession.objects.bulk_create(
+                new_sessions,
+                ignore_conflicts=True
+            )
+            record_focus_sessions(request.user, new_sessions)
+
+        created = len(new_sessions)
+        if created:
+            bump_version(request.user.id)
+
+        return Response(
+            {'created': created, 'duplicates': len(request.data) - created},
+            status=status.HTTP_201_CREATED
+        )
 
 
 class UserStatsView(generics.GenericAPIView):
@@ -31,29 +134,40 @@ class UserStatsView(generics.GenericAPIView):
 
     def get(self, request):
         user = request.user
+        stats = cached_stats(
+            user, 'user-stats', lambda: self.compute_stats(user)
+        )
+        return Response(stats)
+
+    def compute_stats(self, user):
+        """Compute the stats payload for a user"""
         sessions = FocusSession.objects.filter(
             owner=user
         )  # Fixed: was 'user'
 
-        # make total sessions only the focus sessions
-        total_sessions = sessions.exclude(session_type='break').count()
-        total_focus_time = sessions.filter(
-            session_type='focus'
-        ).aggregate(total=Sum('duration'))['total'] or 0
+        # Lifetime numbers come from the materialized view, including
+        # compacted sessions; only today and recent windows are live
+        lifetime = lifetime_totals(user)
 
-        total_break_time = sessions.filter(
-            session_type='break'
-        ).aggregate(total=Sum('duration'))['total'] or 0
+        # make total sessions only the focus sessions
+        total_sessions = lifetime['focus_sessions']
+        total_focus_time = lifetime['focus_minutes']
+        total_break_time = lifetime['break_minutes']
 
         today = timezone.now().date()
         today_focus_time = sessions.filter(
             session_type='focus',  # Fixed: was 'sessions_type'
-            created_at__date=today
+            created_at__gte=day_start(today),
+            created_at__lt=day_start(today + timedelta(days=1)),
         ).aggregate(total=Sum('duration'))['total'] or 0
 
         focus_dates = sessions.filter(session_type='focus') \
             .values_list('created_at', flat=True)
-        focus_days = list({dt.date() for dt in focus_dates})
+        focus_days = {dt.date() for dt in focus_dates}
+        focus_days.update(CompactedFocusStats.objects.filter(
+            user=user, focus_sessions__gt=0
+        ).values_list('date', flat=True))
+        focus_days = list(focus_days)
         # remove duplicates
 
         current_streak, longest_streak = self.calculate_streaks(
@@ -61,9 +175,7 @@ class UserStatsView(generics.GenericAPIView):
         )
 
         # Get count of focus sessions only for average calculation
-        focus_sessions_count = sessions.filter(
-            session_type='focus'
-        ).count()
+        focus_sessions_count = lifetime['focus_sessions']
 
         # Count average of focus session rather than both
         average_session_length = (
@@ -86,7 +198,7 @@ class UserStatsView(generics.GenericAPIView):
             ).count(),
             "totalBreakTime": total_break_time,
         }
-        return Response(stats)
+        return stats
 
     def calculate_streaks(self, dates):
         if not dates:
@@ -127,7 +239,13 @@ class WeeklyDataView(generics.GenericAPIView):
 
     def get(self, request):
         user = request.user
+        weekly_data = cached_stats(
+            user, 'weekly-data', lambda: self.compute_stats(user)
+        )
+        return Response(weekly_data)
 
+    def compute_stats(self, user):
+        """Compute focus sessions per day of the current week"""
         # Get the current week (Monday to Sunday)
         today = timezone.now().date()
         monday = today - timedelta(days=today.weekday())
@@ -142,7 +260,8 @@ class WeeklyDataView(generics.GenericAPIView):
             day_sessions = FocusSession.objects.filter(
                 owner=user,
                 session_type='focus',
-                created_at__date=day_date
+                created_at__gte=day_start(day_date),
+                created_at__lt=day_start(day_date + timedelta(days=1)),
             )
 
             sessions_count = day_sessions.count()
@@ -156,7 +275,7 @@ class WeeklyDataView(generics.GenericAPIView):
                 'focusTime': focus_time
             })
 
-        return Response(weekly_data)
+        return weekly_data
 
 
 class HourlyDataView(generics.GenericAPIView):
@@ -166,7 +285,13 @@ class HourlyDataView(generics.GenericAPIView):
 
     def get(self, request):
         user = request.user
+        hourly_data = cached_stats(
+            user, 'hourly-data', lambda: self.compute_stats(user)
+        )
+        return Response(hourly_data)
 
+    def compute_stats(self, user):
+        """Compute focus sessions per hour of the day"""
         # Get all focus sessions for the user
         sessions = FocusSession.objects.filter(
             owner=user,
@@ -182,11 +307,18 @@ class HourlyDataView(generics.GenericAPIView):
             hour_counts[hour] = 0
 
         # Count sessions by hour
-        for session in sessions:
-            hour = session.created_at.hour
+        for created_at in sessions.values_list('created_at', flat=True):
+            hour = created_at.hour
             if hour in hour_counts:
                 hour_counts[hour] += 1
 
+        # Plus the compacted sessions, counted by hour when compacted
+        for focus_hours in CompactedFocusStats.objects.filter(
+            user=user
+        ).values_list('focus_hours', flat=True):
+            for hour, count in enumerate(focus_hours):
+                hour_counts[hour] += count
+
         # Format the response for all 24 hours
         for hour in range(0, 24):  # Changed from range(6, 23) to range(0, 24)
             hourly_data.append({
@@ -194,7 +326,270 @@ class HourlyDataView(generics.GenericAPIView):
                 'sessions': hour_counts[hour]
             })
 
-        return Response(hourly_data)
+        return hourly_data
+
+
+class HeatmapView(generics.GenericAPIView):
+    """Daily focus minutes and flashcard reviews for the last year"""
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+    serializer_class = HeatmapSerializer
+
+    def get(self, request):
+        user = request.user
+
+        days = request.query_params.get('days', 365)
+        try:
+            days = max(1, min(int(days), 365))  # Limit to 1 year max
+        except (ValueError, TypeError):
+            days = 365
+
+        end_date = timezone.now().date()
+        start_date = end_date - timedelta(days=days - 1)
+
+        # One grouped query per source, merged by day offset below
+        focus_by_day = FocusSession.objects.filter(
+            owner=user,
+            session_type='focus',
+            created_at__gte=day_start(start_date),
+            created_at__lt=day_start(end_date + timedelta(days=1)),
+        ).annotate(
+            day=TruncDate('created_at')
+        ).values('day').annotate(
+            total=Sum('duration')
+        ).values_list('day', 'total')
+
+        reviews_by_day = DailyReviewStats.objects.filter(
+            user=user,
+            date__gte=start_date,
+            date__lte=end_date,
+        ).values_list('date', 'flashcards_reviewed')
+
+        compacted_by_day = CompactedFocusStats.objects.filter(
+            user=user,
+            date__gte=start_date,
+            date__lte=end_date,
+        ).values_list('date', 'focus_minutes')
+
+        focus_minutes = [0] * days
+        reviews = [0] * days
+        for day, total in focus_by_day:
+            focus_minutes[(day - start_date).days] += total
+        for day, total in compacted_by_day:
+            focus_minutes[(day - start_date).days] += total
+        for day, count in reviews_by_day:
+            reviews[(day - start_date).days] = count
+
+        # Parallel arrays indexed by days since startDate
+        return Response({
+            'startDate': start_date,
+            'endDate': end_date,
+            'focusMinutes': focus_minutes,
+            'reviews': reviews,
+        })
+
+
+class PercentileView(generics.GenericAPIView):
+    """Where the user ranks among all users this week and today"""
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+    serializer_class = PercentileSerializer
+
+    def get(self, request):
+        user = request.user
+        today = timezone.now().date()
+        monday = week_start(today)
+
+        weekly_focus_time = DailyFocusStats.objects.filter(
+            user=user,
+            date__gte=monday,
+            date__lte=today,
+        ).aggregate(total=Sum('focus_minutes'))['total'] or 0
+
+        # Review stats are keyed on the server's date, as in flashcards
+        review_day = date.today()
+        today_reviews = DailyReviewStats.objects.filter(
+            user=user,
+            date=review_day,
+        ).values_list('flashcards_reviewed', flat=True).first() or 0
+
+        focus_sketch = load_sketch(WEEKLY_FOCUS, monday)
+        reviews_sketch = load_sketch(DAILY_REVIEWS, review_day)
+
+        return Response({
+            'weekStart': monday,
+            'weeklyFocusTime': weekly_focus_time,
+            'focusTopPercent': top_percent(focus_sketch, weekly_focus_time),
+            'focusUsers': focus_sketch.count,
+            'todayReviews': today_reviews,
+            'reviewsTopPercent': top_percent(reviews_sketch, today_reviews),
+            'reviewsUsers': reviews_sketch.count,
+        })
+
+
+def next_period(day, bucket):
+    """Return the start of the bucket after the one starting on day"""
+    if bucket == 'week':
+        return day + timedelta(days=7)
+    if bucket == 'month':
+        if day.month == 12:
+            return day.replace(year=day.year + 1, month=1)
+        return day.replace(month=day.month + 1)
+    return day.replace(year=day.year + 1)
+
+
+class TrendsView(generics.GenericAPIView):
+    """Focus minutes and sessions per week, month or year"""
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+    serializer_class = TrendsSerializer
+
+    TRUNCATE = {
+        'week': TruncWeek,
+        'month': TruncMonth,
+        'year': TruncYear,
+    }
+    max_periods = 1000
+
+    def get(self, request):
+        user = request.user
+
+        bucket = request.query_params.get('bucket', 'week')
+        if bucket not in self.TRUNCATE:
+            return Response(
+                {'bucket': ['Must be one of: week, month, year.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        end_date = timezone.now().date()
+        start_date = end_date - timedelta(days=364)
+        try:
+            if request.query_params.get('end_date'):
+                end_date = datetime.strptime(
+                    request.query_params['end_date'], '%Y-%m-%d'
+                ).date()
+            if request.query_params.get('start_date'):
+                start_date = datetime.strptime(
+                    request.query_params['start_date'], '%Y-%m-%d'
+                ).date()
+        except ValueError:
+            return Response(
+                {'detail': 'Dates must be in YYYY-MM-DD format.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if start_date > end_date:
+            return Response(
+                {'detail': 'start_date must not be after end_date.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if bucket == 'week':
+            period = week_start(start_date)
+        elif bucket == 'month':
+            period = start_date.replace(day=1)
+        else:
+            period = start_date.replace(month=1, day=1)
+
+        periods = []
+        while period <= end_date:
+            periods.append(period)
+            if len(periods) > self.max_periods:
+                return Response(
+                    {'detail': f'Range spans more than {self.max_periods} '
+                               f'{bucket}s, use a larger bucket.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            try:
+                period = next_period(period, bucket)
+            except (ValueError, OverflowError):
+                break  # Past the last representable date
+
+        # Grouped in the database over the daily rollup, at most one
+        # row per user per day whatever the range
+        totals = {
+            period: (minutes, sessions)
+            for period, minutes, sessions in DailyFocusStats.objects.filter(
+                user=user,
+                date__gte=start_date,
+                date__lte=end_date,
+            ).annotate(
+                period=self.TRUNCATE[bucket]('date')
+            ).order_by().values('period').annotate(
+                minutes=Sum('focus_minutes'),
+                sessions=Sum('focus_sessions'),
+            ).values_list('period', 'minutes', 'sessions')
+        }
+        focus_minutes = [totals.get(p, (0, 0))[0] for p in periods]
+        sessions = [totals.get(p, (0, 0))[1] for p in periods]
+
+        return Response({
+            'bucket': bucket,
+            'periods': periods,
+            'focusMinutes': focus_minutes,
+            'sessions': sessions,
+        })
+
+
+class WeeklyReportView(generics.GenericAPIView):
+    """Latest weekly report built by build_weekly_reports"""
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+    serializer_class = WeeklyReportSerializer
+
+    def get(self, request):
+        reports = WeeklyReport.objects.filter(user=request.user)
+
+        # Optional report for the week a given day falls in
+        week = request.query_params.get('week')
+        if week:
+            try:
+                day = datetime.strptime(week, '%Y-%m-%d').date()
+                reports = reports.filter(week_start=week_start(day))
+            except ValueError:
+                pass  # Invalid date format, ignore filter
+
+        report = reports.order_by('-week_start').first()
+        if report is None:
+            return Response(
+                {'detail': 'Not found.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(self.get_serializer(report).data)
+
+
+@extend_schema(responses={200: AnalyticsReportSerializer})
+class AnalyticsReportView(APIView):
+    """Reports over all users, run on the columnar analytics store"""
+    permission_classes = [permissions.IsAdminUser]
+    authentication_classes = [TokenAuthentication]
+
+    REPORTS = {
+        'focus-distribution': analytics.focus_distribution,
+        'retention': analytics.retention_curve,
+    }
+    max_days = 365
+
+    def get(self, request, report):
+        if report not in self.REPORTS:
+            return Response(
+                {'detail': 'Not found.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            days = 30  # Invalid number, use default
+        days = min(max(days, 1), self.max_days)
+
+        try:
+            data = self.REPORTS[report](days)
+        except analytics.AnalyticsUnavailable as exc:
+            return Response(
+                {'detail': str(exc)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        return Response({'report': report, 'days': days, 'data': data})
 
 
 class SessionListView(generics.ListAPIView):
@@ -217,10 +612,12 @@ class SessionListView(generics.ListAPIView):
         date = self.request.query_params.get('date')
         if date:
             try:
-                from datetime import datetime
                 date_obj = datetime.strptime(date, '%Y-%m-%d').date()
-                queryset = queryset.filter(created_at__date=date_obj)
-            except ValueError:
+                queryset = queryset.filter(
+                    created_at__gte=day_start(date_obj),
+                    created_at__lt=day_start(date_obj + timedelta(days=1)),
+                )
+            except (ValueError, OverflowError):
                 pass  # Invalid date format, ignore filter
 
         # Optional filtering by date range
@@ -229,23 +626,23 @@ class SessionListView(generics.ListAPIView):
 
         if start_date:
             try:
-                from datetime import datetime
                 start_date_obj = datetime.strptime(
                     start_date,
                     '%Y-%m-%d'
                     ).date()
                 queryset = queryset.filter(
-                    created_at__date__gte=start_date_obj
+                    created_at__gte=day_start(start_date_obj)
                 )
             except ValueError:
                 pass
 
         if end_date:
             try:
-                from datetime import datetime
                 end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(created_at__date__lte=end_date_obj)
-            except ValueError:
+                queryset = queryset.filter(
+                    created_at__lt=day_start(end_date_obj + timedelta(days=1))
+                )
+            except (ValueError, OverflowError):
                 pass
 
         return queryset.order_by('-created_at')
@@ -5,6 +5,37 @@ from rest_framework import serializers
 from core.models import Todo, Tag
 
 
+def resolve_tags(user, names):
+    """Return the user's tags with these names, creating missing ones.
+
+    Names are normalized as in TagSerializer. Takes at most three
+    queries, whatever the number of names.
+    """
+    names = list(dict.fromkeys(
+        name.lower().strip() for name in names if name.strip()
+    ))
+    if not names:
+        return []
+
+    tags = {
+        tag.name: tag
+        for tag in Tag.objects.filter(owner=user, name__in=names)
+    }
+    missing = [name for name in names if name not in tags]
+    if missing:
+        Tag.objects.bulk_create(
+            [Tag(owner=user, name=name) for name in missing],
+            ignore_conflicts=True
+        )
+        # Ids are not returned with ignore_conflicts, and a concurrent
+        # request may have created some of the tags
+        tags.update(
+            (tag.name, tag)
+            for tag in Tag.objects.filter(owner=user, name__in=missing)
+        )
+    return [tags[name] for name in names]
+
+
 class TagSerializer(serializers.ModelSerializer):
     """Serializer for Tag objects"""
 
@@ -34,14 +65,23 @@ class TagSerializer(serializers.ModelSerializer):
 
 
 class TodoListSerializer(serializers.ModelSerializer):
-    """Simplified serializer for listing todos"""
-    tags = serializers.StringRelatedField(many=True, read_only=True)
+    """Simplified serializer for listing todos.
+
+    Serializes the rows of TodoListCreateView, which carry the tag
+    names aggregated into tag_names.
+    """
+    tags = serializers.ListField(
+        child=serializers.CharField(),
+        source='tag_names',
+        read_only=True
+    )
 
     class Meta:
         model = Todo
         fields = [
             'id', 'title', 'description', 'completed', 'priority',
-            'category', 'due_date', 'tags', 'created_at'
+            'category', 'due_date', 'estimated_minutes', 'tags',
+            'created_at'
         ]
 
 
@@ -65,6 +105,7 @@ class TodoDetailSerializer(serializers.ModelSerializer):
             'priority',
             'category',
             'due_date',
+            'estimated_minutes',
             'tags',
             'tag_names',
             'created_at',
@@ -107,17 +148,7 @@ class TodoDetailSerializer(serializers.ModelSerializer):
             todo.tags.clear()
             return
 
-        tag_objects = []
-        for tag_name in tag_names:
-            tag_name = tag_name.lower().strip()
-            if tag_name:  # Only process non-empty tag names
-                tag, created = Tag.objects.get_or_create(
-                    owner=user,
-                    name=tag_name
-                )
-                tag_objects.append(tag)
-
-        todo.tags.set(tag_objects)
+        todo.tags.set(resolve_tags(user, tag_names))
 
 
 class TodoCreateSerializer(serializers.ModelSerializer):
@@ -137,6 +168,7 @@ class TodoCreateSerializer(serializers.ModelSerializer):
             'priority',
             'category',
             'due_date',
+            'estimated_minutes',
             'tag_names'
         ]
 
@@ -150,15 +182,53 @@ class TodoCreateSerializer(serializers.ModelSerializer):
 
         # Handle tags
         if tag_names:
-            tag_objects = []
-            for tag_name in tag_names:
-                tag_name = tag_name.lower().strip()
-                if tag_name:
-                    tag, created = Tag.objects.get_or_create(
-                        owner=user,
-                        name=tag_name
-                    )
-                    tag_objects.append(tag)
-            todo.tags.set(tag_objects)
+            todo.tags.set(resolve_tags(user, tag_names))
 
         return todo
+
+
+class BulkTodoSerializer(serializers.Serializer):
+    """An action applied to many todos at once"""
+    ACTION_CHOICES = [
+        ('complete', 'Complete'),
+        ('uncomplete', 'Uncomplete'),
+        ('delete', 'Delete'),
+        ('set_priority', 'Set priority'),
+        ('set_category', 'Set category'),
+        ('add_tags', 'Add tags'),
+        ('remove_tags', 'Remove tags'),
+    ]
+    # The field each action needs
+    ACTION_FIELDS = {
+        'set_priority': 'priority',
+        'set_category': 'category',
+        'add_tags': 'tag_names',
+        'remove_tags': 'tag_names',
+    }
+
+    action = serializers.ChoiceField(choices=ACTION_CHOICES)
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=1000
+    )
+    priority = serializers.ChoiceField(
+        choices=Todo.PRIORITY_CHOICES, required=False
+    )
+    category = serializers.ChoiceField(
+        choices=Todo.CATEGORY_CHOICES, required=False
+    )
+    tag_names = serializers.ListField(
+        child=serializers.CharField(max_length=50),
+        required=False,
+        allow_empty=False
+    )
+
+    def validate(self, attrs):
+        """Validate that the action's field is given"""
+        field = self.ACTION_FIELDS.get(attrs['action'])
+        if field is not None and field not in attrs:
+            raise serializers.ValidationError({
+                field: [f"This field is required for {attrs['action']}."]
+            })
+        return attrs
@@ -1,16 +1,23 @@
 """
 Tests for the Todo API.
 """
+from datetime import date, timedelta
+
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Todo
+from core.models import Tag, Todo
+from todos.views import agenda_todos, todo_rows
 
 
 TODOS_URL = reverse('todos:todo-list-create')
+AGENDA_URL = reverse('todos:todo-agenda')
+BULK_URL = reverse('todos:todo-bulk')
 
 
 def detail_url(todo_id):
@@ -118,6 +125,46 @@ class PrivateTodoApiTests(TestCase):
         self.assertIn('urgent', tag_names)
         self.assertIn('meeting', tag_names)
 
+    def test_tags_resolved_in_batch(self):
+        """Test tag names cost the same queries whatever their number"""
+        Tag.objects.create(owner=self.user, name='work')
+
+        def count_queries(tag_names):
+            with CaptureQueriesContext(connection) as context:
+                res = self.client.post(TODOS_URL, {
+                    'title': 'Tagged Todo',
+                    'tag_names': tag_names,
+                }, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            return len(context.captured_queries)
+
+        few = count_queries(['Work', 'one'])
+        many = count_queries(
+            ['work', ' Two ', 'two'] + [f'tag{i}' for i in range(10)]
+        )
+
+        self.assertEqual(few, many)
+        todo = Todo.objects.get(title='Tagged Todo', tags__name='tag9')
+        self.assertEqual(todo.tags.count(), 12)
+        self.assertEqual(
+            Tag.objects.filter(owner=self.user, name='work').count(), 1
+        )
+
+    def test_update_tags_in_batch(self):
+        """Test replacing the tags of a todo takes a fixed number of queries"""
+        todo = create_todo(user=self.user)
+        todo.tags.add(Tag.objects.create(owner=self.user, name='old'))
+
+        # Todo and its tags, update, tags (select, insert, select),
+        # set() (select, insert) and the response's tags
+        with self.assertNumQueries(9):
+            res = self.client.patch(detail_url(todo.id), {
+                'tag_names': ['old'] + [f'new{i}' for i in range(10)],
+            }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(todo.tags.count(), 11)
+
     def test_update_todo(self):
         """Test updating a todo"""
         todo = create_todo(user=self.user)
@@ -167,3 +214,264 @@ class PrivateTodoApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(len(res.data), 1)
         self.assertEqual(res.data[0]['title'], 'High Priority')
+
+    def test_list_in_one_query(self):
+        """Test todos are listed with their tag names in one query"""
+        for i in range(3):
+            todo = create_todo(user=self.user, title=f'Todo {i}')
+            todo.tags.set([
+                Tag.objects.get_or_create(owner=self.user, name=name)[0]
+                for name in ['zeta', 'alpha']
+            ])
+        create_todo(user=self.user, title='Untagged')
+
+        with self.assertNumQueries(1):
+            res = self.client.get(TODOS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['title'], 'Untagged')
+        self.assertEqual(res.data[0]['tags'], [])
+        self.assertEqual(res.data[1]['tags'], ['alpha', 'zeta'])
+
+    def test_filter_todos_by_tags(self):
+        """Test filtering by a tag still lists all tags of a todo"""
+        tagged = create_todo(user=self.user, title='Tagged')
+        tagged.tags.set([
+            Tag.objects.create(owner=self.user, name='work'),
+            Tag.objects.create(owner=self.user, name='urgent'),
+        ])
+        create_todo(user=self.user, title='Untagged')
+
+        res = self.client.get(TODOS_URL, {'tags': 'work'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['tags'], ['urgent', 'work'])
+
+    def test_filter_todos_by_any_and_all_tags(self):
+        """Test tags_any matches one of the tags and tags_all every one"""
+        work, urgent, home = (
+            Tag.objects.create(owner=self.user, name=name)
+            for name in ['work', 'urgent', 'home']
+        )
+        both = create_todo(user=self.user, title='Both')
+        both.tags.set([work, urgent])
+        work_only = create_todo(user=self.user, title='Work only')
+        work_only.tags.set([work, home])
+        create_todo(user=self.user, title='Untagged')
+        other_user = create_user(email='other@example.com')
+        create_todo(user=other_user).tags.set([
+            Tag.objects.create(owner=other_user, name='work'),
+            Tag.objects.create(owner=other_user, name='urgent'),
+        ])
+
+        def titles(params):
+            with CaptureQueriesContext(connection) as context:
+                res = self.client.get(TODOS_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertNotIn('DISTINCT', context.captured_queries[0]['sql'])
+            return sorted(todo['title'] for todo in res.data)
+
+        self.assertEqual(
+            titles({'tags_any': 'urgent, HOME'}), ['Both', 'Work only']
+        )
+        self.assertEqual(titles({'tags': 'urgent'}), ['Both'])
+        self.assertEqual(titles({'tags_all': 'work,urgent'}), ['Both'])
+        self.assertEqual(titles({'tags_all': 'work,work'}), [
+            'Both', 'Work only'
+        ])
+        self.assertEqual(
+            titles({'tags_all': 'work', 'tags_any': 'home'}), ['Work only']
+        )
+
+    def test_agenda(self):
+        """Test open todos are split into overdue, today and this week"""
+        today = date.today()
+        week_end = today + timedelta(days=6 - today.weekday())
+        create_todo(
+            user=self.user, title='Late', due_date=today - timedelta(days=3)
+        )
+        create_todo(user=self.user, title='Now', due_date=today)
+        create_todo(user=self.user, title='Sunday', due_date=week_end)
+        create_todo(
+            user=self.user, title='Done', due_date=today, completed=True
+        )
+        create_todo(
+            user=self.user, title='Next week',
+            due_date=week_end + timedelta(days=1),
+        )
+        create_todo(user=self.user, title='Someday')
+        other_user = create_user(email='other@example.com')
+        create_todo(user=other_user, due_date=today)
+
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(AGENDA_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(context.captured_queries), 1)
+        titles = {
+            bucket: [todo['title'] for todo in todos]
+            for bucket, todos in res.data.items()
+        }
+        if week_end == today:
+            self.assertEqual(titles, {
+                'overdue': ['Late'], 'today': ['Now', 'Sunday'],
+                'this_week': [],
+            })
+        else:
+            self.assertEqual(titles, {
+                'overdue': ['Late'], 'today': ['Now'],
+                'this_week': ['Sunday'],
+            })
+
+    def test_agenda_uses_open_todos_index(self):
+        """Test open todos by due date are read from the partial index"""
+        today = date.today()
+        Todo.objects.bulk_create([
+            Todo(
+                owner=self.user, title=f'Done {i}', completed=True,
+                due_date=today - timedelta(days=i % 365),
+            )
+            for i in range(5000)
+        ])
+        create_todo(user=self.user, due_date=today)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_todo')
+        week_end = today + timedelta(days=6 - today.weekday())
+
+        # The query the view runs
+        plan = todo_rows(agenda_todos(self.user, week_end)).explain()
+
+        self.assertIn('todo_open_owner_due_idx', plan)
+
+    def test_bulk_complete_and_uncomplete(self):
+        """Test completing todos in one statement, skipping done ones"""
+        todos = [create_todo(user=self.user) for _ in range(3)]
+        done = create_todo(user=self.user, completed=True)
+        other = create_todo(user=create_user(email='other@example.com'))
+        ids = [todo.id for todo in todos] + [done.id, other.id]
+
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.post(
+                BULK_URL, {'action': 'complete', 'ids': ids}, format='json'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'action': 'complete', 'count': 3})
+        self.assertEqual(len([
+            query for query in context.captured_queries
+            if query['sql'].startswith('UPDATE')
+        ]), 1)
+        self.assertEqual(Todo.objects.filter(
+            owner=self.user, completed=True
+        ).count(), 4)
+        other.refresh_from_db()
+        self.assertFalse(other.completed)
+        updated = Todo.objects.get(id=todos[0].id)
+        self.assertGreater(updated.updated_at, todos[0].updated_at)
+
+        res = self.client.post(
+            BULK_URL, {'action': 'uncomplete', 'ids': ids}, format='json'
+        )
+
+        self.assertEqual(res.data['count'], 4)
+        self.assertFalse(
+            Todo.objects.filter(owner=self.user, completed=True).exists()
+        )
+
+    def test_bulk_delete(self):
+        """Test deleting only the user's listed todos"""
+        todos = [create_todo(user=self.user) for _ in range(3)]
+        other = create_todo(user=create_user(email='other@example.com'))
+
+        res = self.client.post(BULK_URL, {
+            'action': 'delete', 'ids': [todos[0].id, todos[1].id, other.id]
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 2)
+        self.assertEqual(
+            list(Todo.objects.filter(owner=self.user)), [todos[2]]
+        )
+        self.assertTrue(Todo.objects.filter(id=other.id).exists())
+
+    def test_bulk_set_priority_and_category(self):
+        """Test setting the priority and the category of todos"""
+        todos = [create_todo(user=self.user) for _ in range(2)]
+        ids = [todo.id for todo in todos]
+
+        res = self.client.post(BULK_URL, {
+            'action': 'set_priority', 'ids': ids, 'priority': 'high'
+        }, format='json')
+        self.assertEqual(res.data['count'], 2)
+        res = self.client.post(BULK_URL, {
+            'action': 'set_category', 'ids': ids, 'category': 'health'
+        }, format='json')
+        self.assertEqual(res.data['count'], 2)
+
+        self.assertEqual(set(Todo.objects.filter(id__in=ids).values_list(
+            'priority', 'category'
+        )), {('high', 'health')})
+
+    def test_bulk_add_and_remove_tags(self):
+        """Test tagging todos without duplicate links, then untagging"""
+        work = Tag.objects.create(owner=self.user, name='work')
+        tagged_todo = create_todo(user=self.user)
+        tagged_todo.tags.add(work)
+        todo = create_todo(user=self.user)
+        ids = [tagged_todo.id, todo.id]
+
+        res = self.client.post(BULK_URL, {
+            'action': 'add_tags', 'ids': ids, 'tag_names': ['Work', 'home']
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 2)
+        for item in [tagged_todo, todo]:
+            self.assertEqual(
+                sorted(item.tags.values_list('name', flat=True)),
+                ['home', 'work']
+            )
+
+        # Nothing left to add
+        res = self.client.post(BULK_URL, {
+            'action': 'add_tags', 'ids': ids, 'tag_names': ['work']
+        }, format='json')
+
+        self.assertEqual(res.data['count'], 0)
+
+        res = self.client.post(BULK_URL, {
+            'action': 'remove_tags', 'ids': [todo.id], 'tag_names': ['WORK']
+        }, format='json')
+
+        self.assertEqual(res.data['count'], 1)
+        self.assertEqual(list(todo.tags.values_list('name', flat=True)), [
+            'home'
+        ])
+        self.assertEqual(tagged_todo.tags.count(), 2)
+
+        # Counted once for both of its tags
+        res = self.client.post(BULK_URL, {
+            'action': 'remove_tags', 'ids': ids,
+            'tag_names': ['work', 'home'],
+        }, format='json')
+
+        self.assertEqual(res.data['count'], 2)
+        self.assertFalse(Todo.tags.through.objects.filter(
+            todo_id__in=ids
+        ).exists())
+
+    def test_bulk_requires_action_field(self):
+        """Test actions that set a value require it"""
+        todo = create_todo(user=self.user)
+
+        res = self.client.post(BULK_URL, {
+            'action': 'set_priority', 'ids': [todo.id]
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('priority', res.data)
+        res = self.client.post(
+            BULK_URL, {'action': 'archive', 'ids': [todo.id]}, format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
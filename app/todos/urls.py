@@ -5,6 +5,8 @@ from django.urls import path
 from todos.views import (
     TodoListCreateView,
     TodoDetailView,
+    TodoAgendaView,
+    BulkTodoView,
     TagListCreateView,
     TagDetailView,
 )
@@ -15,6 +17,8 @@ urlpatterns = [
     # Todo endpoints
     path('', TodoListCreateView.as_view(), name='todo-list-create'),
     path('<int:pk>/', TodoDetailView.as_view(), name='todo-detail'),
+    path('agenda/', TodoAgendaView.as_view(), name='todo-agenda'),
+    path('bulk/', BulkTodoView.as_view(), name='todo-bulk'),
 
     # Tag endpoints
     path('tags/', TagListCreateView.as_view(), name='tag-list-create'),
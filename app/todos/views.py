@@ -5,17 +5,76 @@ from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.response import Response
-from django.db.models import Q
+from rest_framework.views import APIView
+from django.db import transaction
+from django.utils import timezone
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import CharField, Count, Exists, OuterRef, Q, Value
+from django.db.models.functions import Coalesce
+from datetime import date, timedelta
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.types import OpenApiTypes
 
 from core.models import Todo, Tag
 from todos.serializers import (
     TodoListSerializer,
     TodoDetailSerializer,
     TodoCreateSerializer,
-    TagSerializer
+    TagSerializer,
+    BulkTodoSerializer,
+    resolve_tags,
 )
 
 
+def tag_names(value):
+    """Split a comma separated tags parameter into tag names"""
+    if not value:
+        return []
+    return list({
+        name.lower().strip() for name in value.split(',') if name.strip()
+    })
+
+
+def tagged(user, names):
+    """Return the todo/tag links of a user's tags with these names.
+
+    Tags are found by (owner, name), then links by (tag_id, todo_id).
+    """
+    return Todo.tags.through.objects.filter(
+        tag__owner=user, tag__name__in=names
+    )
+
+
+def todo_rows(queryset):
+    """Return TodoListSerializer rows of a queryset, tag names aggregated"""
+    return queryset.annotate(
+        tag_names=Coalesce(
+            ArrayAgg(
+                'tags__name',
+                filter=Q(tags__isnull=False),
+                ordering='tags__name',
+            ),
+            Value([]),
+            output_field=ArrayField(CharField()),
+        )
+    ).values(
+        'id', 'title', 'description', 'completed', 'priority',
+        'category', 'due_date', 'estimated_minutes', 'tag_names',
+        'created_at'
+    )
+
+
+def agenda_todos(user, week_end):
+    """Return a user's open todos due until week_end, by due date"""
+    # completed=False matches the partial index condition
+    return Todo.objects.filter(
+        owner=user,
+        completed=False,
+        due_date__lte=week_end,
+    ).order_by('due_date', 'created_at')
+
+
 class TodoListCreateView(generics.ListCreateAPIView):
     """List and create todos for authenticated user"""
     permission_classes = [IsAuthenticated]
@@ -23,9 +82,7 @@ class TodoListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         """Get todos for authenticated user with optional filtering"""
-        queryset = Todo.objects.filter(
-            owner=self.request.user
-            ).prefetch_related('tags')
+        queryset = Todo.objects.filter(owner=self.request.user)
 
         # Filter by completion status
         completed = self.request.query_params.get('completed')
@@ -43,11 +100,23 @@ class TodoListCreateView(generics.ListCreateAPIView):
         if category:
             queryset = queryset.filter(category=category)
 
-        # Filter by tags
-        tags = self.request.query_params.get('tags')
-        if tags:
-            tag_list = [tag.strip() for tag in tags.split(',')]
-            queryset = queryset.filter(tags__name__in=tag_list).distinct()
+        # Filter by tags, any of them (tags is the older name of tags_any)
+        # or all of them. Subqueries, a join would also limit the
+        # aggregated tags and need DISTINCT.
+        params = self.request.query_params
+        user = self.request.user
+        tags_any = tag_names(params.get('tags_any') or params.get('tags'))
+        if tags_any:
+            queryset = queryset.filter(Exists(
+                tagged(user, tags_any).filter(todo_id=OuterRef('pk'))
+            ))
+        tags_all = tag_names(params.get('tags_all'))
+        if tags_all:
+            queryset = queryset.filter(id__in=tagged(
+                user, tags_all
+            ).values('todo_id').annotate(
+                matched=Count('tag_id')
+            ).filter(matched=len(tags_all)).values('todo_id'))
 
         # Search in title and description
         search = self.request.query_params.get('search')
@@ -64,6 +133,17 @@ class TodoListCreateView(generics.ListCreateAPIView):
             return TodoListSerializer
         return TodoCreateSerializer
 
+    def list(self, request, *args, **kwargs):
+        """List todos in one query, with their tag names aggregated.
+
+        Rows are serialized from values(), so no Todo or Tag instances
+        are built.
+        """
+        serializer = self.get_serializer(
+            todo_rows(self.get_queryset()), many=True
+        )
+        return Response(serializer.data)
+
     def create(self, request, *args, **kwargs):
         """Create todo and return detailed response"""
         serializer = self.get_serializer(data=request.data)
@@ -81,6 +161,112 @@ class TodoListCreateView(generics.ListCreateAPIView):
         )
 
 
+@extend_schema(
+    summary="Get the todo agenda",
+    description=(
+        "Open todos that are overdue, due today and due later this week "
+        "(until Sunday), each by due date"
+    ),
+    responses={200: OpenApiTypes.OBJECT}
+)
+class TodoAgendaView(APIView):
+    """Open todos by due date, read through the open todos index"""
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+
+    def get(self, request):
+        """Get the agenda of the authenticated user"""
+        today = date.today()
+        week_end = today + timedelta(days=6 - today.weekday())
+
+        rows = todo_rows(agenda_todos(request.user, week_end))
+
+        agenda = {'overdue': [], 'today': [], 'this_week': []}
+        for row in TodoListSerializer(rows, many=True).data:
+            due_date = date.fromisoformat(row['due_date'])
+            if due_date < today:
+                agenda['overdue'].append(row)
+            elif due_date == today:
+                agenda['today'].append(row)
+            else:
+                agenda['this_week'].append(row)
+        return Response(agenda)
+
+
+@extend_schema(
+    summary="Apply an action to many todos",
+    description=(
+        "Complete, uncomplete, delete, set the priority or category of, "
+        "or add or remove tags on the listed todos. Ids of other users' "
+        "todos are ignored. Returns the number of todos changed."
+    ),
+    request=BulkTodoSerializer,
+    responses={200: OpenApiTypes.OBJECT}
+)
+class BulkTodoView(APIView):
+    """Apply one action to many todos, each as a single statement"""
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+
+    def post(self, request):
+        """Apply an action to todos of the authenticated user"""
+        serializer = BulkTodoSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        action = data['action']
+        todos = Todo.objects.filter(owner=request.user, id__in=data['ids'])
+        # update() does not set auto_now fields, and reports read the
+        # completion day of a todo from updated_at
+        now = timezone.now()
+
+        with transaction.atomic():
+            if action == 'complete':
+                count = todos.filter(completed=False).update(
+                    completed=True, updated_at=now
+                )
+            elif action == 'uncomplete':
+                count = todos.filter(completed=True).update(
+                    completed=False, updated_at=now
+                )
+            elif action == 'set_priority':
+                count = todos.exclude(priority=data['priority']).update(
+                    priority=data['priority'], updated_at=now
+                )
+            elif action == 'set_category':
+                count = todos.exclude(category=data['category']).update(
+                    category=data['category'], updated_at=now
+                )
+            elif action == 'delete':
+                _, deleted = todos.delete()
+                count = deleted.get(Todo._meta.label, 0)
+            elif action == 'add_tags':
+                tags = resolve_tags(request.user, data['tag_names'])
+                todo_ids = list(todos.values_list('id', flat=True))
+                linked = set(Todo.tags.through.objects.filter(
+                    todo_id__in=todo_ids, tag__in=tags
+                ).values_list('todo_id', 'tag_id'))
+                links = [
+                    Todo.tags.through(todo_id=todo_id, tag_id=tag.id)
+                    for todo_id in todo_ids
+                    for tag in tags
+                    if (todo_id, tag.id) not in linked
+                ]
+                Todo.tags.through.objects.bulk_create(
+                    links, ignore_conflicts=True
+                )
+                # Todos that already had all the tags are unchanged
+                count = len({link.todo_id for link in links})
+            else:
+                links = tagged(request.user, [
+                    name.lower().strip() for name in data['tag_names']
+                ]).filter(todo__in=todos)
+                # Todos that lost a tag, not links removed
+                count = links.values('todo_id').distinct().count()
+                links.delete()
+
+        return Response({'action': action, 'count': count})
+
+
 class TodoDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, and delete todos"""
     serializer_class = TodoDetailSerializer